@@ -1,18 +1,36 @@
+import redis
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session, load_only
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.config import get_settings
+from app.core.database import SessionLocal, get_db
+from app.core.metrics import stage
 from app.models.schemas import (
-    JobCreate, JobResponse,
+    JobCreate, JobResponse, JobSummary, JobView,
     ProfileResponse,
     RecommendRequest, RecommendResponse,
+    BatchRecommendRequest,
+    CandidatesResponse,
+    KeywordSearchHit,
     FeedbackCreate, FeedbackResponse,
 )
 from app.services import recommender
+from app.services.location import FilterError
 
+settings = get_settings()
 router = APIRouter()
 
+
+def _render(content: BaseModel | list[BaseModel], compact: bool = False) -> ORJSONResponse:
+    # Modelos já validados no serviço: orjson direto, sem a 2ª validação do response_model
+    with stage("serialize"):
+        if isinstance(content, list):
+            return ORJSONResponse([item.model_dump(exclude_none=compact) for item in content])
+        return ORJSONResponse(content.model_dump(exclude_none=compact))
+
 # job openings 
 @router.post("/jobs", response_model=JobResponse, tags=["vagas"])
 def create_job(job_data: JobCreate, db: Session = Depends(get_db)):
@@ -20,6 +38,19 @@ def create_job(job_data: JobCreate, db: Session = Depends(get_db)):
     return job
 
 
+# Declarada antes de /jobs/{job_id} para "search" não cair no parâmetro
+@router.get("/jobs/search", response_model=list[KeywordSearchHit], tags=["vagas"])
+def search_jobs(
+    q: str,
+    limit: int = 20,
+    area: Optional[str] = None,
+    seniority: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Busca por palavras-chave (sintaxe websearch: "frase exata", -termo, or)."""
+    return recommender.search_jobs_by_keyword(db, q, min(limit, 100), area, seniority)
+
+
 @router.get("/jobs/{job_id}", response_model=JobResponse, tags=["vagas"])
 def get_job(job_id: int, db: Session = Depends(get_db)):
     from app.models.db_models import Job
@@ -29,36 +60,63 @@ def get_job(job_id: int, db: Session = Depends(get_db)):
     return job
 
 
-@router.get("/jobs", response_model=list[JobResponse], tags=["vagas"])
+@router.get("/jobs/{job_id}/candidates", response_model=CandidatesResponse, tags=["vagas"])
+def get_job_candidates(
+    job_id: int,
+    n_results: int = 10,
+    match_preferences: bool = True,
+    db: Session = Depends(get_db),
+):
+    try:
+        return recommender.find_candidates(db, job_id, min(n_results, 100), match_preferences)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/jobs", response_model=list[JobResponse | JobSummary], tags=["vagas"])
 def list_jobs(
     skip: int = 0,
     limit: int = 20,
     area: Optional[str] = None,
     seniority: Optional[str] = None,
+    view: JobView = "full",
     db: Session = Depends(get_db),
 ):
     from app.models.db_models import Job
+    compact = view == "compact"
+    schema = JobSummary if compact else JobResponse
     query = db.query(Job)
+    if compact:
+        query = query.options(load_only(*recommender.COMPACT_JOB_COLUMNS))
     if area:
         query = query.filter(Job.area == area)
     if seniority:
         query = query.filter(Job.seniority == seniority)
-    return query.offset(skip).limit(limit).all()
+    jobs = query.offset(skip).limit(limit).all()
+    return _render([schema.model_validate(job) for job in jobs], compact)
 
 
 # perfil / curriculo
 
+def _require_profile(db: Session, session_id: str | None) -> None:
+    # Reenvio para sessão inexistente é 404, antes de gastar o parse do currículo
+    if session_id and recommender.get_profile(db, session_id) is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+
+
 @router.post("/profile/text", response_model=ProfileResponse, tags=["perfil"])
 def upload_resume_text(
     text: str = Form(...),
     desired_area: Optional[str] = Form(None),
     desired_seniority: Optional[str] = Form(None),
+    # Reenvio do currículo de uma sessão existente (regrava o perfil)
+    session_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
 ):
-    
+    _require_profile(db, session_id)
     try:
         profile = recommender.create_profile_from_text(
-            db, text, desired_area, desired_seniority
+            db, text, desired_area, desired_seniority, session_id
         )
         return profile
     except Exception as e:
@@ -70,6 +128,7 @@ async def upload_resume_pdf(
     file: UploadFile = File(...),
     desired_area: Optional[str] = Form(None),
     desired_seniority: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
 ):
     
@@ -79,10 +138,11 @@ async def upload_resume_pdf(
     file_bytes = await file.read()
     if len(file_bytes) > 10 * 1024 * 1024:  # 10MB
         raise HTTPException(status_code=413, detail="Arquivo muito grande (máx. 10MB).")
+    _require_profile(db, session_id)
 
     try:
         profile = recommender.create_profile_from_pdf(
-            db, file_bytes, desired_area, desired_seniority
+            db, file_bytes, desired_area, desired_seniority, session_id
         )
         return profile
     except Exception as e:
@@ -106,23 +166,92 @@ def get_profile(session_id: str, db: Session = Depends(get_db)):
 def get_recommendations(request: RecommendRequest, db: Session = Depends(get_db)):
     
     try:
-        return recommender.recommend_jobs(
+        response = recommender.recommend_jobs(
             db=db,
             session_id=request.session_id,
             n_results=request.n_results,
             filter_area=request.filter_area,
             filter_seniority=request.filter_seniority,
             filter_location=request.filter_location,
+            filter_salary_min=request.filter_salary_min,
+            filter_salary_max=request.filter_salary_max,
+            filter_skills=request.filter_skills,
+            filter_remote=request.filter_remote,
+            filter_radius_km=request.filter_radius_km,
+            hybrid=request.hybrid,
+            skill_boost=request.skill_boost,
+            rerank=request.rerank,
+            rerank_budget_ms=request.rerank_budget_ms,
+            diversify=request.diversify,
+            mmr_lambda=request.mmr_lambda,
+            diversity_overfetch=request.diversity_overfetch,
+            max_per_company=request.max_per_company,
+            paginate=request.paginate,
+            compact=request.view == "compact",
         )
+    except FilterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {e}")
+    return _render(response, request.view == "compact")
+
+@router.get("/recommend/page", response_model=RecommendResponse, tags=["recomendações"])
+def get_recommendations_page(cursor: str, view: JobView = "full", db: Session = Depends(get_db)):
+    """Página seguinte a partir do next_cursor de POST /recommend (paginate=true)."""
+    try:
+        response = recommender.recommend_page(db, cursor, compact=view == "compact")
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _render(response, view == "compact")
+
+@router.post("/recommend/batch", tags=["recomendações"])
+def get_batch_recommendations(request: BatchRecommendRequest):
+    """Recomendações para várias sessões, em NDJSON (uma resposta por linha, por blocos)."""
+    items = [item.model_dump() for item in request.items]
+
+    # Cada bloco é escrito assim que ranqueado; o corpo é gerado depois que a
+    # rota retorna, então a sessão do banco é aberta e fechada pelo próprio gerador
+    def ndjson():
+        db = SessionLocal()
+        try:
+            for response in recommender.recommend_jobs_batch(
+                db=db,
+                items=items,
+                n_results=request.n_results,
+                filter_area=request.filter_area,
+                filter_seniority=request.filter_seniority,
+                filter_location=request.filter_location,
+            ):
+                yield response.model_dump_json() + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 #Feedback 
 @router.post("/feedback", response_model=FeedbackResponse, tags=["feedback"])
 def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)):
+    msg = "Obrigado! Vaga marcada como relevante." if feedback.rating == 1 \
+        else "Entendido! Usaremos isso para melhorar suas recomendações."
     try:
+        if settings.feedback_write_behind:
+            from app.services.feedback_stream import enqueue_feedback
+            try:
+                event_id = enqueue_feedback(
+                    db=db,
+                    session_id=feedback.session_id,
+                    job_id=feedback.job_id,
+                    rating=feedback.rating,
+                    rank_position=feedback.rank_position,
+                    similarity_score=feedback.similarity_score,
+                )
+                return FeedbackResponse(event_id=event_id, message=msg)
+            except redis.RedisError as exc:
+                # Sem o stream, grava direto no banco em vez de perder o feedback
+                print(f"[Feedback] Stream indisponível ({exc!r}); gravando de forma síncrona")
+
         saved = recommender.save_feedback(
             db=db,
             session_id=feedback.session_id,
@@ -131,13 +260,18 @@ def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)):
             rank_position=feedback.rank_position,
             similarity_score=feedback.similarity_score,
         )
-        msg = "Obrigado! Vaga marcada como relevante." if feedback.rating == 1 \
-            else "Entendido! Usaremos isso para melhorar suas recomendações."
         return FeedbackResponse(id=saved.id, message=msg)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 # metrics
+@router.get("/metrics/cache", tags=["métricas"])
+def get_cache_metrics():
+    """Hit rate do cache de recomendações."""
+    from app.services.result_cache import cache_stats
+    return cache_stats()
+
+
 @router.get("/metrics/{session_id}", tags=["métricas"])
 def get_metrics(session_id: str, k: int = 10, db: Session = Depends(get_db)):
     """Retorna Precision@K para um perfil com feedback coletado."""
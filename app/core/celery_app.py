@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -17,3 +18,34 @@ celery_app.conf.update(
     timezone="America/Sao_Paulo",
     enable_utc=True,
 )
+
+celery_app.conf.beat_schedule = {
+    # Refresh noturno: só re-embeda vagas alteradas desde o último watermark
+    "reindex-changed-jobs": {
+        "task": "app.services.tasks.reindex_changed_jobs_task",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    # Depois do reindex: top-N por sessão, servido pelo /recommend sem filtros
+    "precompute-recommendations": {
+        "task": "app.services.tasks.precompute_recommendations_task",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "refresh-facet-stats": {
+        "task": "app.services.tasks.refresh_facet_stats_task",
+        "schedule": settings.filter_stats_refresh_seconds,
+    },
+}
+
+# Sem write-behind não há stream para drenar (a task ainda pode ser chamada à mão)
+if settings.feedback_write_behind:
+    celery_app.conf.beat_schedule["flush-feedback-stream"] = {
+        "task": "app.services.tasks.flush_feedback_task",
+        "schedule": settings.feedback_flush_interval_seconds,
+    }
+
+# Índice quantizado só é construído se a busca vai lê-lo
+if settings.quantized_index_enabled:
+    celery_app.conf.beat_schedule["build-quantized-index"] = {
+        "task": "app.services.tasks.build_quantized_index_task",
+        "schedule": crontab(hour=3, minute=30),
+    }
@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Callable, TypeVar
+
+import chromadb
+import httpx
+import requests
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Só falhas de transporte justificam reconectar; where inválido, dimensão
+# errada etc. sobem direto (repetir não adianta e derrubaria o cache de counts)
+TRANSPORT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    httpx.TransportError,
+)
+
+
+class ChromaClientManager:
+    """Cliente Chroma compartilhado pelo processo.
+
+    Mantém um único HttpClient (sessão HTTP com keep-alive), os handles de
+    coleção já resolvidos e um cache do count() por coleção. O count é
+    invalidado nos upserts feitos por este processo e expira após
+    `chroma_count_ttl_seconds` para enxergar escritas de outros workers.
+    """
+
+    def __init__(self, host: str, port: int, count_ttl: float):
+        self.host = host
+        self.port = port
+        self.count_ttl = count_ttl
+        self._lock = threading.Lock()
+        self._client: chromadb.HttpClient | None = None
+        self._collections: dict[str, chromadb.Collection] = {}
+        self._counts: dict[str, tuple[float, int]] = {}
+
+    def client(self) -> chromadb.HttpClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = chromadb.HttpClient(host=self.host, port=self.port)
+        return self._client
+
+    def collection(self, name: str, metadata: dict | None = None) -> chromadb.Collection:
+        handle = self._collections.get(name)
+        if handle is None:
+            handle = self.client().get_or_create_collection(name=name, metadata=metadata)
+            self._collections[name] = handle
+        return handle
+
+    def run(self, name: str, metadata: dict | None,
+            fn: Callable[[chromadb.Collection], T]) -> T:
+        """Executa `fn` na coleção; em falha de conexão, reconecta e tenta uma vez mais."""
+        try:
+            return fn(self.collection(name, metadata))
+        except TRANSPORT_ERRORS as exc:
+            print(f"[Chroma] Falha em '{name}' ({exc!r}); reconectando...")
+            self.reset()
+            return fn(self.collection(name, metadata))
+
+    def count(self, name: str, metadata: dict | None = None) -> int:
+        cached = self._counts.get(name)
+        if cached and time.monotonic() - cached[0] < self.count_ttl:
+            return cached[1]
+        total = self.run(name, metadata, lambda c: c.count())
+        self._counts[name] = (time.monotonic(), total)
+        return total
+
+    def invalidate_count(self, name: str | None = None) -> None:
+        if name is None:
+            self._counts.clear()
+        else:
+            self._counts.pop(name, None)
+
+    def forget(self, name: str) -> None:
+        self._collections.pop(name, None)
+        self._counts.pop(name, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._client = None
+            self._collections.clear()
+            self._counts.clear()
+
+
+chroma_manager = ChromaClientManager(
+    host=settings.chroma_host,
+    port=settings.chroma_port,
+    count_ttl=settings.chroma_count_ttl_seconds,
+)
@@ -10,14 +10,125 @@ class Settings(BaseSettings):
 
     chroma_host: str = "localhost"
     chroma_port: int = 8001
+    # Validade do count() em cache (upserts locais invalidam na hora)
+    chroma_count_ttl_seconds: float = 60.0
 
     embedding_model: str = "paraphrase-multilingual-mpnet-base-v2"
+    # Cache em processo do alias da coleção ativa (segundos)
+    index_alias_ttl_seconds: float = 5.0
 
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     debug: bool = True
 
     default_n_results: int = 10
+    # /recommend/batch: itens por bloco (busca e hidratação em lote, entregue antes do próximo)
+    batch_recommend_chunk_size: int = 50
+
+    # Cache de respostas do /recommend no Redis
+    reco_cache_enabled: bool = True
+    reco_cache_ttl_seconds: int = 900
+    reco_cache_max_entry_bytes: int = 256 * 1024
+
+    # Cache da projeção do perfil por sessão (LRU local + Redis)
+    profile_cache_size: int = 10_000
+    profile_cache_ttl_seconds: float = 300.0
+    profile_cache_redis_ttl_seconds: int = 86_400
+
+    # Feedback write-behind: /feedback só anexa ao stream; o Celery grava em lote
+    feedback_write_behind: bool = False
+    feedback_stream_key: str = "feedback:events"
+    feedback_stream_maxlen: int = 1_000_000
+    feedback_flush_batch_size: int = 1000
+    feedback_flush_interval_seconds: float = 5.0
+    feedback_claim_idle_ms: int = 60_000
+
+    # Top-N pré-computado à noite por sessão (sorted sets no Redis)
+    precompute_enabled: bool = True
+    precompute_top_n: int = 50
+    precompute_profile_block: int = 512
+    precompute_memory_mb: int = 512
+    precompute_ttl_seconds: int = 2 * 86_400
+
+    # Sharding da coleção de vagas: "none", "area" (uma coleção por área) ou "hash"
+    # Trocar o layout exige rodar data/rebalance_shards.py antes de servir
+    shard_mode: str = "none"
+    shard_areas: list[str] = [
+        "engenharia", "dados", "design", "produto", "marketing", "vendas", "rh", "financeiro",
+    ]
+    shard_count: int = 8
+    shard_fanout_workers: int = 8
+
+    # Índice compacto para buscas sem filtro: códigos int8/float16 na RAM e
+    # float32 em disco (memmap) para o rescoring; reconstruído pelo Celery beat
+    quantized_index_enabled: bool = False
+    quantized_index_dir: str = "data/quantized"
+    quantized_mode: str = "int8"
+    quantized_rescore_factor: int = 4
+    quantized_max_age_hours: float = 36.0
+
+    # Artefatos de projeção PCA (data/fit_projection.py)
+    projection_dir: str = "data/projections"
+
+    # Gazetteer local (city,state,country,lat,lon) para lat/lon e geohash das vagas
+    gazetteer_path: str = "data/gazetteer.csv"
+
+    # Planejador de busca filtrada (ANN com where / over-fetch / força bruta)
+    # Contagens por faceta: recalculadas pelo beat e lidas do Redis (cache local curto)
+    filter_stats_refresh_seconds: float = 600.0
+    filter_stats_ttl_seconds: float = 60.0
+    filter_exact_max_candidates: int = 2000
+    filter_exact_page_size: int = 5000
+    # Teto de linhas do fallback textual sem Postgres (lexical)
+    filter_exact_scan_limit: int = 20_000
+    filter_ann_min_selectivity: float = 0.2
+    filter_max_overfetch: int = 1000
+
+    # Busca textual (tsvector + GIN no Postgres) e modo híbrido com RRF
+    fulltext_language: str = "portuguese"
+    hybrid_candidates: int = 100
+    hybrid_rrf_k: int = 60
+    hybrid_post_filter_overfetch: int = 4
+    hybrid_workers: int = 8
+
+    # Índice de bitsets de habilidades (em memória) e boost opcional por Jaccard
+    skill_index_refresh_seconds: float = 60.0
+    skill_boost_weight: float = 0.1
+    skill_boost_overfetch: int = 3
+
+    # Rerank com cross-encoder (CPU): over-fetch, cache de pares e orçamento por request
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_max_length: int = 256
+    rerank_overfetch: int = 3
+    rerank_max_candidates: int = 50
+    rerank_budget_ms: float = 200.0
+    rerank_initial_ms_per_pair: float = 10.0
+    rerank_cache_ttl_seconds: int = 7 * 86_400
+    # Carrega o cross-encoder no startup da API (o 1º request com rerank não paga o load)
+    rerank_warmup: bool = False
+
+    # Diversificação MMR: teto de candidatas buscadas (n_results * over-fetch)
+    diversity_max_candidates: int = 200
+
+    # Personalização por feedback (Rocchio incremental por sessão)
+    personalization_enabled: bool = True
+    rocchio_alpha: float = 1.0
+    rocchio_beta: float = 0.75
+    rocchio_gamma: float = 0.15
+    personalization_max_excluded: int = 200
+
+    # Paginação por cursor: profundidade ranqueada na 1ª chamada e validade no Redis
+    pagination_depth: int = 500
+    pagination_ttl_seconds: int = 1800
+
+    # Respostas acima deste tamanho saem com gzip (se o cliente aceitar)
+    gzip_minimum_size: int = 1024
+    gzip_compresslevel: int = 5
+
+    # Matching reverso: vaga nova -> top-k perfis (Celery), guardado no Redis
+    candidate_matching_enabled: bool = True
+    candidate_top_k: int = 50
+    candidate_ttl_seconds: int = 7 * 86_400
 
     class Config:
         env_file = ".env"
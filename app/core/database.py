@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
@@ -20,3 +20,78 @@ def get_db():
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        _ensure_search_vector()
+        # create_all não altera tabelas existentes: colunas novas entram por ALTER idempotente
+        _ensure_reindex_columns()
+        _ensure_feedback_event_id()
+        _ensure_feedback_eval_columns()
+        _ensure_profile_query_embedding()
+        _ensure_profile_feedback_columns()
+
+
+def _ensure_search_vector():
+    # tsvector gerado (título/skills com peso A, descrição C) + GIN para /jobs/search.
+    # Fica fora do modelo ORM: SQLite (testes) não conhece o tipo. Trocar
+    # FULLTEXT_LANGUAGE exige DROP COLUMN search_vector antes de subir a API.
+    language = settings.fulltext_language.replace("'", "")
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('{language}', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('{language}', coalesce(skills::text, '')), 'A') ||
+                setweight(to_tsvector('{language}', coalesce(description, '')), 'C')
+            ) STORED
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_search_vector ON jobs USING gin (search_vector)"
+        ))
+
+
+def _migrate(*statements: str):
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def _ensure_reindex_columns():
+    # Hash/modelo do texto embedado e o índice do watermark do reindex incremental
+    _migrate(
+        "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS embedding_hash VARCHAR(64)",
+        "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(255)",
+        "CREATE INDEX IF NOT EXISTS ix_jobs_updated_at ON jobs (updated_at)",
+    )
+
+
+def _ensure_feedback_event_id():
+    # Chave de idempotência do write-behind (ON CONFLICT (event_id) precisa do UNIQUE)
+    _migrate(
+        "ALTER TABLE user_feedbacks ADD COLUMN IF NOT EXISTS event_id VARCHAR(64) UNIQUE",
+    )
+
+
+def _ensure_feedback_eval_columns():
+    # Modelo que gerou o ranking avaliado e o índice da janela de avaliação
+    _migrate(
+        "ALTER TABLE user_feedbacks ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(255)",
+        "CREATE INDEX IF NOT EXISTS ix_user_feedbacks_created_at ON user_feedbacks (created_at)",
+    )
+
+
+def _ensure_profile_query_embedding():
+    # Vetor de consulta guardado por perfil (lote sem re-embed a cada chamada)
+    _migrate(
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS query_embedding BYTEA",
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS query_embedding_model VARCHAR(255)",
+    )
+
+
+def _ensure_profile_feedback_columns():
+    # Estado do Rocchio incremental por perfil
+    _migrate(
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS adapted_embedding BYTEA",
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS adapted_embedding_model VARCHAR(255)",
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS feedback_sums BYTEA",
+        "ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS feedback_ratings JSON",
+    )
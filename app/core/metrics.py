@@ -0,0 +1,98 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+
+settings = get_settings()
+
+# De um encode de consulta (ms) a uma reindexação inteira (minutos)
+_STAGE_BUCKETS = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "reco_stage_seconds", "Duração por estágio (parse, embed, busca vetorial, banco, ...)",
+    ["stage"], buckets=_STAGE_BUCKETS,
+)
+CACHE_EVENTS = Counter(
+    "reco_cache_events_total", "Consultas aos caches por resultado", ["cache", "result"],
+)
+BATCH_SIZE = Histogram(
+    "reco_batch_size", "Itens por lote", ["operation"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096),
+)
+QUEUE_DEPTH = Gauge(
+    "reco_queue_depth", "Mensagens pendentes por fila (lido no scrape)", ["queue"],
+    multiprocess_mode="mostrecent",
+)
+
+# Tempos do request corrente, somados por estágio, para o header Server-Timing.
+# O dict é compartilhado com a thread do endpoint síncrono (contexto copiado).
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Cronometra o bloco: histograma do Prometheus + Server-Timing do request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def record_cache(cache: str, result: str, count: int = 1) -> None:
+    if count:
+        CACHE_EVENTS.labels(cache, result).inc(count)
+
+
+def observe_batch(operation: str, size: int) -> None:
+    BATCH_SIZE.labels(operation).observe(size)
+
+
+def server_timing(timings: dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={1000 * seconds:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(entries)
+
+
+def refresh_queue_depths() -> None:
+    # Fila padrão do Celery (lista no broker) e eventos de feedback ainda não gravados
+    try:
+        r = get_redis()
+        QUEUE_DEPTH.labels("celery").set(r.llen("celery"))
+        QUEUE_DEPTH.labels("feedback").set(r.xlen(settings.feedback_stream_key))
+    except redis.RedisError as exc:
+        print(f"[Metrics] Profundidade das filas indisponível: {exc!r}")
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Formato de exposição do Prometheus; com PROMETHEUS_MULTIPROC_DIR agrega os processos."""
+    refresh_queue_depths()
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,13 @@
+from functools import lru_cache
+
+import redis
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache()
+def get_redis() -> redis.Redis:
+    # Pool de conexões compartilhado pelo processo (mesma instância do broker Celery)
+    return redis.Redis.from_url(settings.redis_url, socket_timeout=1.0)
@@ -1,10 +1,16 @@
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 
 from app.api.routes import router
 from app.core.config import get_settings
-from app.core.database import init_db
+from app.core.database import SessionLocal, init_db
+from app.core.metrics import observe_stage, render_metrics, server_timing, start_request
+from app.services.reranker import warm_cross_encoder
+from app.services.skill_index import skill_index
 
 settings = get_settings()
 
@@ -14,6 +20,19 @@ async def lifespan(app: FastAPI):
     print("[App] Inicializando banco de dados...")
     init_db()
     print("[App] Banco de dados pronto.")
+    db = SessionLocal()
+    try:
+        # Carga inicial dos bitsets; depois só o incremental por watermark
+        skill_index.refresh(db, force=True)
+    except Exception as exc:
+        print(f"[App] Índice de habilidades ficará para o primeiro request: {exc!r}")
+    finally:
+        db.close()
+    if settings.rerank_warmup:
+        try:
+            warm_cross_encoder()
+        except Exception as exc:
+            print(f"[App] Cross-encoder ficará para o primeiro rerank: {exc!r}")
     yield
     print("[App] Encerrando aplicação.")
 
@@ -23,6 +42,7 @@ app = FastAPI(
     description="Sistema de recomendação de vagas de emprego com NLP e embeddings semânticos.",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -32,10 +52,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.gzip_minimum_size,
+    compresslevel=settings.gzip_compresslevel,
+)
 
 app.include_router(router, prefix="/api/v1")
 
 
+@app.middleware("http")
+async def server_timing_header(request: Request, call_next):
+    # Estágios cronometrados durante o request viram Server-Timing (DevTools/proxy)
+    timings = start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing(timings, total)
+    # Template da rota (não o path cru) para não explodir a cardinalidade
+    route = request.scope.get("route")
+    if route is not None and route.path != "/internal/metrics":
+        observe_stage(f"request:{route.path}", total)
+    return response
+
+
+@app.get("/internal/metrics", include_in_schema=False)
+def prometheus_metrics():
+    payload, content_type = render_metrics()
+    return Response(payload, media_type=content_type)
+
+
 @app.get("/", tags=["saúde"])
 def root():
     return {
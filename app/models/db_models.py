@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import (
+    Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, LargeBinary,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -22,8 +24,10 @@ class Job(Base):
     url = Column(String(500), nullable=True)
     skills = Column(JSON, nullable=True)             # lista extraída automaticamente
     embedding_id = Column(String(255), nullable=True) # ID no ChromaDB
+    embedding_hash = Column(String(64), nullable=True)     # sha256 do texto embedado
+    embedding_model = Column(String(255), nullable=True)   # modelo usado no embedding
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
 
     feedbacks = relationship("UserFeedback", back_populates="job")
 
@@ -41,6 +45,14 @@ class UserProfile(Base):
     desired_area = Column(String(100), nullable=True)
     desired_seniority = Column(String(100), nullable=True)
     query_text = Column(Text, nullable=True)         # texto montado para embedding
+    query_embedding = Column(LargeBinary, nullable=True)        # float32 do query_text
+    query_embedding_model = Column(String(255), nullable=True)  # modelo que gerou o vetor
+    # Rocchio incremental: vetor adaptado pelo feedback, somas dos vetores
+    # curtidos/rejeitados (float32, 2 x dim) e última nota por vaga
+    adapted_embedding = Column(LargeBinary, nullable=True)
+    adapted_embedding_model = Column(String(255), nullable=True)
+    feedback_sums = Column(LargeBinary, nullable=True)
+    feedback_ratings = Column(JSON, nullable=True)             # {"<job_id>": 1 | -1 | 0}
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     feedbacks = relationship("UserFeedback", back_populates="profile")
@@ -55,7 +67,18 @@ class UserFeedback(Base):
     rating = Column(Integer, nullable=False)  # 1 = relevante, -1 = não relevante
     rank_position = Column(Integer, nullable=True)   # posição em que apareceu
     similarity_score = Column(Float, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    event_id = Column(String(64), unique=True, nullable=True)  # idempotência (write-behind)
+    embedding_model = Column(String(255), nullable=True)       # modelo que gerou o ranking
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     profile = relationship("UserProfile", back_populates="feedbacks")
     job = relationship("Job", back_populates="feedbacks")
+
+
+class IndexState(Base):
+    """Estado chave/valor do índice vetorial (watermarks, aliases)."""
+    __tablename__ = "index_state"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
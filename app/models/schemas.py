@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
+from app.services.location import MAX_RADIUS_KM
+
 
 # jobs openinga
 class JobBase(BaseModel):
@@ -30,6 +32,27 @@ class JobResponse(JobBase):
         from_attributes = True
 
 
+class JobSummary(BaseModel):
+    """view=compact: sem descrição/requisitos (o grosso do payload)."""
+    id: int
+    title: str
+    company: str
+    location: Optional[str] = None
+    seniority: Optional[str] = None
+    area: Optional[str] = None
+    salary_min: Optional[float] = None
+    salary_max: Optional[float] = None
+    url: Optional[str] = None
+    skills: Optional[list[str]] = None
+
+    class Config:
+        from_attributes = True
+
+
+# full = JobResponse completo; compact = JobSummary e campos nulos omitidos
+JobView = Literal["full", "compact"]
+
+
 # user profile / resume
 class ProfileCreate(BaseModel):
     raw_text: Optional[str] = None
@@ -58,12 +81,56 @@ class RecommendRequest(BaseModel):
     filter_area: Optional[str] = None
     filter_seniority: Optional[str] = None
     filter_location: Optional[str] = None
+    # Faixa salarial desejada: casa com vagas cuja faixa se sobrepõe a ela
+    filter_salary_min: Optional[float] = Field(default=None, ge=0)
+    filter_salary_max: Optional[float] = Field(default=None, ge=0)
+    # Todas as habilidades listadas são exigidas
+    filter_skills: Optional[list[str]] = Field(default=None, max_length=10)
+    filter_remote: Optional[bool] = None
+    # Raio em km ao redor de filter_location (coordenadas vindas do gazetteer)
+    filter_radius_km: Optional[float] = Field(default=None, gt=0, le=MAX_RADIUS_KM)
+    # Funde a busca densa com a textual (habilidades do perfil) via RRF
+    hybrid: bool = False
+    # Reordena por similaridade + SKILL_BOOST_WEIGHT * Jaccard das habilidades
+    skill_boost: bool = False
+    # Segundo estágio com cross-encoder, limitado por um orçamento de latência
+    rerank: bool = False
+    rerank_budget_ms: Optional[float] = Field(default=None, gt=0, le=5000)
+    # MMR: λ = 1 só relevância, λ = 0 só diversidade; over-fetch = candidatas por resultado
+    diversify: bool = False
+    mmr_lambda: float = Field(default=0.7, ge=0, le=1)
+    diversity_overfetch: int = Field(default=4, ge=1, le=20)
+    max_per_company: Optional[int] = Field(default=None, ge=1)
+    # Devolve next_cursor; as páginas seguintes vêm de GET /recommend/page
+    paginate: bool = False
+    view: JobView = "full"
+
+
+class BatchRecommendItem(BaseModel):
+    session_id: str
+    # Filtros por item sobrescrevem os compartilhados do lote
+    filter_area: Optional[str] = None
+    filter_seniority: Optional[str] = None
+    filter_location: Optional[str] = None
+
+
+class BatchRecommendRequest(BaseModel):
+    items: list[BatchRecommendItem] = Field(..., min_length=1, max_length=1000)
+    n_results: int = Field(default=10, ge=1, le=50)
+    filter_area: Optional[str] = None
+    filter_seniority: Optional[str] = None
+    filter_location: Optional[str] = None
 
 
 class RecommendedJob(BaseModel):
-    job: JobResponse
-    similarity_score: float
+    job: JobResponse | JobSummary
+    similarity_score: float          # 0.0 se a vaga veio só da busca textual (híbrido)
     rank: int
+    fusion_score: Optional[float] = None
+    rerank_score: Optional[float] = None        # None: fora do prefixo reordenado
+    skill_jaccard: Optional[float] = None      # Jaccard perfil x vaga
+    matched_skills: Optional[list[str]] = None
+    missing_skills: Optional[list[str]] = None  # pedidas pela vaga, ausentes no perfil
 
 
 class RecommendResponse(BaseModel):
@@ -71,6 +138,33 @@ class RecommendResponse(BaseModel):
     profile_summary: str
     recommendations: list[RecommendedJob]
     total_jobs_searched: int
+    timings_ms: Optional[dict[str, float]] = None   # tempo por estágio
+    rerank: Optional[dict] = None                   # candidatos, reordenados, cache, orçamento
+    next_cursor: Optional[str] = None
+
+
+class KeywordSearchHit(BaseModel):
+    job: JobResponse
+    score: float
+    rank: int
+
+
+class BatchRecommendError(BaseModel):
+    session_id: str
+    error: str
+
+
+class CandidateMatch(BaseModel):
+    session_id: str
+    profile_summary: str
+    similarity_score: float
+    rank: int
+
+
+class CandidatesResponse(BaseModel):
+    job_id: int
+    candidates: list[CandidateMatch]
+    total_profiles_searched: int
 
 
 # Feedback 
@@ -83,5 +177,6 @@ class FeedbackCreate(BaseModel):
 
 
 class FeedbackResponse(BaseModel):
-    id: int
+    id: Optional[int] = None          # None no modo write-behind (ainda não gravado)
+    event_id: Optional[str] = None
     message: str
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def mmr(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_: float = 0.7,
+    groups: np.ndarray | None = None,
+    max_per_group: int | None = None,
+) -> list[int]:
+    """Maximal marginal relevance guloso sobre a matriz de similaridade das candidatas.
+
+    score(i) = λ·relevância(i) − (1−λ)·max_{j∈S} cos(i, j). Cada passo é O(n)
+    em NumPy; `groups` (ex.: empresa) com `max_per_group` limita repetições.
+    Retorna os índices escolhidos, em ordem.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms > 0, norms, 1.0)
+    similarity = unit @ unit.T
+
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    counts = np.zeros(int(groups.max()) + 1 if groups is not None and n else 0, dtype=np.int32)
+    chosen: list[int] = []
+    for _ in range(k):
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break  # todas as restantes estouraram o limite por grupo
+        chosen.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+        if groups is not None and max_per_group:
+            counts[groups[best]] += 1
+            if counts[groups[best]] >= max_per_group:
+                available &= groups != groups[best]
+    return chosen
+
+
+def diversify(
+    candidates: list[dict],
+    vectors: dict[int, np.ndarray],
+    k: int,
+    lambda_: float = 0.7,
+    companies: list[str | None] | None = None,
+    max_per_company: int | None = None,
+    by_rank: bool = False,
+) -> list[dict]:
+    """Aplica MMR às candidatas.
+
+    Relevância = cosseno do bi-encoder com a consulta; com `by_rank`, vem da
+    posição na lista recebida (1.0 no topo até ~0), para ordens produzidas por
+    RRF, boost ou rerank, cujos scores não estão na escala do cosseno.
+    """
+    if not candidates:
+        return candidates
+    dimension = next((len(v) for v in vectors.values()), 1)
+    # Sem vetor (não indexada ainda): vetor nulo, não penaliza nem é penalizada
+    matrix = np.stack([
+        vectors.get(c["job_id"], np.zeros(dimension, dtype=np.float32)) for c in candidates
+    ])
+    if by_rank:
+        relevance = 1 - np.arange(len(candidates), dtype=np.float32) / len(candidates)
+    else:
+        # similarity_score = (1 + cos) / 2  ->  cos
+        relevance = 2 * np.array([c["similarity_score"] for c in candidates],
+                                 dtype=np.float32) - 1
+    groups = None
+    if companies is not None and max_per_company:
+        _, groups = np.unique([(c or "").strip().lower() for c in companies], return_inverse=True)
+    order = mmr(relevance, matrix, k, lambda_, groups, max_per_company)
+    return [candidates[i] for i in order]
@@ -1,51 +1,176 @@
 import hashlib
+import heapq
+import time
+from datetime import datetime
 import chromadb
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from sqlalchemy.orm.attributes import flag_modified
+from app.core.chroma import chroma_manager
 from app.core.config import get_settings
+from app.core.metrics import observe_batch, stage
+from app.services.result_cache import bump_index_version
+from app.services.filter_planner import ANN, EXACT, plan_search, skill_key, salary_bounds
+from app.services.location import (
+    FilterError, geo_center, haversine_km, location_clauses, location_metadata,
+)
+from app.services.projection import apply_projection, load_projection
+from app.services.quantized_index import get_quantized_index
+from app.services.sharding import (
+    all_shards, fan_out, merge_topk, shard_index, shard_key, shard_keys, shards_for_area,
+    sharding_enabled,
+)
+from app.services.index_registry import (
+    JOBS_COLLECTION,
+    collection_metadata,
+    embedding_space,
+    get_active_index,
+    get_shadow_index,
+    has_current_metadata,
+    profile_index,
+)
 
 settings = get_settings()
 
-_model: SentenceTransformer | None = None
+_models: dict[str, SentenceTransformer] = {}
 
 
-def get_model() -> SentenceTransformer:
-    global _model
-    if _model is None:
-        print(f"[Embedder] Carregando modelo: {settings.embedding_model}")
-        _model = SentenceTransformer(settings.embedding_model)
+def get_model(model_name: str | None = None) -> SentenceTransformer:
+    model_name = model_name or get_active_index()["model"]
+    if model_name not in _models:
+        print(f"[Embedder] Carregando modelo: {model_name}")
+        _models[model_name] = SentenceTransformer(model_name)
         print("[Embedder] Modelo carregado com sucesso.")
-    return _model
+    return _models[model_name]
 
 def get_chroma_client() -> chromadb.HttpClient:
-    return chromadb.HttpClient(
-        host=settings.chroma_host,
-        port=settings.chroma_port,
-    )
+    return chroma_manager.client()
 
 
-def get_jobs_collection() -> chromadb.Collection:
-    client = get_chroma_client()
-    return client.get_or_create_collection(
-        name="jobs",
-        metadata={"hnsw:space": "cosine"},  # similaridade por cosseno
+def get_jobs_collection(
+    name: str = JOBS_COLLECTION,
+    metadata: dict | None = None,
+) -> chromadb.Collection:
+    return chroma_manager.collection(
+        name,
+        metadata=metadata or {"hnsw:space": "cosine"},  # similaridade por cosseno
     )
 
-def embed_text(text: str) -> list[float]:
-    model = get_model()
-    return model.encode(text, normalize_embeddings=True).tolist()
 
+def get_index_collection(index: dict) -> chromadb.Collection:
+    return get_jobs_collection(index["collection"], metadata=collection_metadata(index))
 
-def embed_batch(texts: list[str], batch_size: int = 32) -> list[list[float]]:
-    model = get_model()
-    embeddings = model.encode(
-        texts,
-        batch_size=batch_size,
-        normalize_embeddings=True,
-        show_progress_bar=True,
-    )
+
+def _run_on_index(index: dict, fn):
+    return chroma_manager.run(index["collection"], collection_metadata(index), fn)
+
+
+def _upsert(index: dict, **kwargs) -> None:
+    with stage("vector_upsert"):
+        _upsert_rows(index, **kwargs)
+    bump_index_version()
+
+
+def _upsert_rows(index: dict, **kwargs) -> None:
+    if not sharding_enabled():
+        _run_on_index(index, lambda c: c.upsert(**kwargs))
+        chroma_manager.invalidate_count(index["collection"])
+        return
+
+    groups = _group_by_shard(kwargs["metadatas"])
+    for key, rows in groups.items():
+        part = {name: [values[i] for i in rows] for name, values in kwargs.items()}
+        _run_on_index(shard_index(index, key), lambda c: c.upsert(**part))
+    # Vaga que mudou de área não pode continuar no shard antigo (por hash, o shard não muda)
+    if settings.shard_mode == "area":
+        _delete_from_previous_shards(index, kwargs["ids"], groups)
+    for shard in all_shards(index):
+        chroma_manager.invalidate_count(shard["collection"])
+
+
+def _delete_from_previous_shards(index: dict, ids: list[str],
+                                 groups: dict[str, list[int]]) -> None:
+    target = {ids[i]: key for key, rows in groups.items() for i in rows}
+    keys = shard_keys()
+    # Uma leitura só de ids em paralelo; o delete vai apenas ao shard onde a vaga estava
+    found = fan_out(lambda shard: _run_on_index(shard, lambda c: c.get(ids=ids, include=[])),
+                    [shard_index(index, key) for key in keys])
+    for key, result in zip(keys, found):
+        stale = [embedding_id for embedding_id in result["ids"] if target[embedding_id] != key]
+        if stale:
+            _run_on_index(shard_index(index, key), lambda c: c.delete(ids=stale))
+
+
+def _group_by_shard(metadatas: list[dict]) -> dict[str, list[int]]:
+    groups: dict[str, list[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        groups.setdefault(shard_key(metadata.get("area"), metadata["job_id"]), []).append(i)
+    return groups
+
+
+def _collection_count(index: dict) -> int:
+    return chroma_manager.count(index["collection"], collection_metadata(index))
+
+
+def count_indexed_jobs(index: dict | None = None) -> int:
+    index = index or get_active_index()
+    return sum(_collection_count(shard) for shard in all_shards(index))
+
+
+def _write_targets() -> list[dict]:
+    # Durante um shadow reindex, escritas vão para a coleção ativa e para a sombra
+    targets = [get_active_index()]
+    shadow = get_shadow_index()
+    if shadow and shadow["collection"] != targets[0]["collection"]:
+        targets.append(shadow)
+    return targets
+
+def embed_text(text: str, model_name: str | None = None,
+               projection: str | None = None) -> list[float]:
+    model = get_model(model_name)
+    with stage("embed"):
+        embedding = model.encode(text, normalize_embeddings=True)
+    if projection:
+        # PCA do índice (ver app/services/projection.py): mesma projeção na escrita e na consulta
+        embedding = apply_projection(embedding, load_projection(projection))[0]
+    return embedding.tolist()
+
+
+def embed_batch(texts: list[str], batch_size: int = 32,
+                model_name: str | None = None,
+                projection: str | None = None,
+                show_progress_bar: bool = False) -> list[list[float]]:
+    # Barra do tqdm só nos lotes de CLI/Celery; no request ela sujaria o log da API
+    model = get_model(model_name)
+    observe_batch("embed", len(texts))
+    with stage("embed"):
+        embeddings = model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=show_progress_bar,
+        )
+    if projection:
+        embeddings = apply_projection(embeddings, load_projection(projection))
     return embeddings.tolist()
 
 
+def job_to_dict(job) -> dict:
+    """Campos da vaga (modelo ORM) usados no texto do embedding e nos metadados."""
+    return {
+        "title": job.title,
+        "company": job.company,
+        "location": job.location,
+        "area": job.area,
+        "seniority": job.seniority,
+        "skills": job.skills,
+        "requirements": job.requirements,
+        "description": job.description,
+        "salary_min": job.salary_min,
+        "salary_max": job.salary_max,
+    }
+
+
 def job_to_embedding_text(job: dict) -> str:
 
     parts = []
@@ -65,34 +190,97 @@ def job_to_embedding_text(job: dict) -> str:
     return "\n".join(parts)
 
 
+def vector_to_bytes(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def bytes_to_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def ensure_query_embeddings(db, profiles: list) -> dict[int, list[float]]:
+    """Vetores de consulta por perfil; os ausentes (ou de outro modelo) num único encode.
+
+    Só faz flush: o commit fica com o chamador, depois de ler o que precisa dos
+    perfis (um commit aqui expiraria os objetos e forçaria um SELECT por perfil).
+    """
+    active = get_active_index()
+    space = embedding_space(active)
+    vectors, missing = {}, []
+    for profile in profiles:
+        if profile.query_embedding and profile.query_embedding_model == space:
+            vectors[profile.id] = bytes_to_vector(profile.query_embedding).tolist()
+        elif profile.query_text:
+            missing.append(profile)
+
+    if missing:
+        encoded = embed_batch([p.query_text for p in missing], model_name=active["model"],
+                              projection=active.get("projection"))
+        for profile, vector in zip(missing, encoded):
+            vectors[profile.id] = vector
+            profile.query_embedding = vector_to_bytes(vector)
+            profile.query_embedding_model = space
+        db.flush()
+    return vectors
+
+
+def embedding_text_hash(job: dict) -> str:
+    return hashlib.sha256(job_to_embedding_text(job).encode("utf-8")).hexdigest()
+
+
+def mark_job_indexed(job, job_data: dict, embedding_id: str) -> None:
+    """Registra no modelo ORM o que foi embedado (id, hash do texto, modelo)."""
+    job.embedding_id = embedding_id
+    job.embedding_hash = embedding_text_hash(job_data)
+    job.embedding_model = embedding_space(get_active_index())
+    # Indexar não é edição: regrava o updated_at atual para o onupdate não disparar,
+    # senão a vaga fica acima do próximo watermark e é reembedada de novo
+    if "updated_at" in job.__dict__:
+        flag_modified(job, "updated_at")
+
+
 # ── Indexação de vagas ────────────────────────────────────────────────────────
 
+def _job_metadata(job_id: int, job: dict) -> dict:
+    salary_low, salary_high = salary_bounds(job.get("salary_min"), job.get("salary_max"))
+    metadata = {
+        "job_id": str(job_id),
+        "title": job.get("title", ""),
+        "company": job.get("company", ""),
+        "area": job.get("area", "") or "",
+        "seniority": job.get("seniority", "") or "",
+        "location": job.get("location", "") or "",
+        "salary_min": salary_low,
+        "salary_max": salary_high,
+        # Momento da escrita: vagas posteriores ao build do índice compacto são buscadas à parte
+        "indexed_at": time.time(),
+        **location_metadata(job.get("location")),
+    }
+    skills = job.get("skills") if isinstance(job.get("skills"), list) else []
+    for skill in skills:
+        if isinstance(skill, str) and skill.strip():
+            metadata[skill_key(skill)] = True
+    return metadata
+
+
 def index_job(job_id: int, job: dict) -> str:
 
-    collection = get_jobs_collection()
     text = job_to_embedding_text(job)
-    embedding = embed_text(text)
     embedding_id = f"job_{job_id}"
 
-    collection.upsert(
-        ids=[embedding_id],
-        embeddings=[embedding],
-        metadatas=[{
-            "job_id": str(job_id),
-            "title": job.get("title", ""),
-            "company": job.get("company", ""),
-            "area": job.get("area", "") or "",
-            "seniority": job.get("seniority", "") or "",
-            "location": job.get("location", "") or "",
-        }],
-        documents=[text],
-    )
+    for index in _write_targets():
+        _upsert(
+            index,
+            ids=[embedding_id],
+            embeddings=[embed_text(text, index["model"], index.get("projection"))],
+            metadatas=[_job_metadata(job_id, job)],
+            documents=[text],
+        )
     return embedding_id
 
 
-def index_jobs_batch(jobs: list[tuple[int, dict]]) -> list[str]:
+def index_jobs_batch(jobs: list[tuple[int, dict]], index: dict | None = None) -> list[str]:
 
-    collection = get_jobs_collection()
     ids, texts, metadatas = [], [], []
 
     for job_id, job in jobs:
@@ -100,67 +288,129 @@ def index_jobs_batch(jobs: list[tuple[int, dict]]) -> list[str]:
         embedding_id = f"job_{job_id}"
         ids.append(embedding_id)
         texts.append(text)
-        metadatas.append({
-            "job_id": str(job_id),
-            "title": job.get("title", ""),
-            "company": job.get("company", ""),
-            "area": job.get("area", "") or "",
-            "seniority": job.get("seniority", "") or "",
-            "location": job.get("location", "") or "",
-        })
-    
-    embeddings = embed_batch(texts) # Gera embeddings em lote
+        metadatas.append(_job_metadata(job_id, job))
 
-    collection.upsert(
-        ids=ids,
-        embeddings=embeddings,
-        metadatas=metadatas,
-        documents=texts,
-    )
+    for target in ([index] if index else _write_targets()):
+        embeddings = embed_batch(texts, model_name=target["model"],  # Gera embeddings em lote
+                                 projection=target.get("projection"), show_progress_bar=True)
+        _upsert(
+            target,
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=texts,
+        )
     print(f"[Embedder] {len(ids)} vagas indexadas com sucesso.")
     return ids
 
-def search_similar_jobs( 
-    query_text: str,
-    n_results: int = 10,
+
+def update_job_metadata(jobs: list[tuple[int, dict]], index: dict) -> None:
+    """Regrava só os metadados das vagas (Chroma `update`): vetores e documentos ficam."""
+    ids = [f"job_{job_id}" for job_id, _ in jobs]
+    # Vetor não muda: indexed_at fica o da última escrita do embedding
+    metadatas = [
+        {k: v for k, v in _job_metadata(job_id, job).items() if k != "indexed_at"}
+        for job_id, job in jobs
+    ]
+    with stage("vector_upsert"):
+        if not sharding_enabled():
+            _run_on_index(index, lambda c: c.update(ids=ids, metadatas=metadatas))
+            return
+        for key, rows in _group_by_shard(metadatas).items():
+            part_ids = [ids[i] for i in rows]
+            part_metadatas = [metadatas[i] for i in rows]
+            _run_on_index(shard_index(index, key),
+                          lambda c: c.update(ids=part_ids, metadatas=part_metadatas))
+
+def _build_where(
     filter_area: str = None,
     filter_seniority: str = None,
     filter_location: str = None,
-) -> list[dict]:
-    
-    collection = get_jobs_collection()
-    query_embedding = embed_text(query_text)
-
+    filter_salary_min: float = None,
+    filter_salary_max: float = None,
+    filter_skills: list[str] = None,
+    filter_remote: bool = None,
+    filter_radius_km: float = None,
+    faceted: bool = True,
+) -> dict | None:
+    if not faceted and (filter_salary_min is not None or filter_salary_max is not None
+                        or filter_skills or filter_remote is not None or filter_radius_km):
+        raise FilterError(
+            "Filtros de salário, habilidades, remoto e raio exigem os metadados novos; "
+            "rode o backfill_job_metadata_task (data/index_alias.py backfill-metadata)."
+        )
     where_clauses = []
     if filter_area:
         where_clauses.append({"area": {"$eq": filter_area}})
     if filter_seniority:
         where_clauses.append({"seniority": {"$eq": filter_seniority}})
-    if filter_location:
+    if faceted:
+        # Localização normalizada: igualdade em cidade/UF/país ou células de geohash
+        where_clauses.extend(location_clauses(filter_location, filter_radius_km, filter_remote))
+    elif filter_location:
+        # Coleção sem city/state/country (antes do backfill): substring no texto original
         where_clauses.append({"location": {"$contains": filter_location}})
+    # Faixas se sobrepõem; salary_max == 0 marca vaga sem salário informado
+    if filter_salary_min is not None:
+        where_clauses.append({"salary_max": {"$gte": float(filter_salary_min)}})
+    if filter_salary_max is not None:
+        where_clauses.append({"salary_min": {"$lte": float(filter_salary_max)}})
+        where_clauses.append({"salary_max": {"$gt": 0.0}})
+    for skill in filter_skills or []:
+        where_clauses.append({skill_key(skill): {"$eq": True}})
 
-    where = None
     if len(where_clauses) == 1:
-        where = where_clauses[0]
-    elif len(where_clauses) > 1:
-        where = {"$and": where_clauses}
+        return where_clauses[0]
+    if len(where_clauses) > 1:
+        return {"$and": where_clauses}
+    return None
+
+
+def _area_from_where(where: dict | None) -> str | None:
+    clauses = where.get("$and", [where]) if where else []
+    for clause in clauses:
+        condition = clause.get("area")
+        if isinstance(condition, dict) and "$eq" in condition:
+            return condition["$eq"]
+    return None
 
-    query_kwargs = {
-        "query_embeddings": [query_embedding],
-        "n_results": min(n_results, collection.count() or 1),
-        "include": ["metadatas", "distances", "documents"],
-    }
-    if where:
-        query_kwargs["where"] = where
 
-    results = collection.query(**query_kwargs)
+def _query_index(
+    active: dict,
+    query_embeddings: list[list[float]],
+    n_results: int,
+    where: dict | None,
+    keep=None,
+) -> list[list[dict]]:
+    shards = [s for s in shards_for_area(active, _area_from_where(where)) if _collection_count(s)]
 
-    output = []
-    if results["ids"] and results["ids"][0]:
-        for i, embedding_id in enumerate(results["ids"][0]):
-            distance = results["distances"][0][i]
+    def query_shard(shard: dict) -> dict:
+        query_kwargs = {
+            "query_embeddings": query_embeddings,
+            "n_results": min(n_results, _collection_count(shard)),
+            "include": ["metadatas", "distances", "documents"],
+        }
+        if where:
+            query_kwargs["where"] = where
+        return _run_on_index(shard, lambda c: c.query(**query_kwargs))
+
+    # Sem sharding é uma única chamada; com shards, fan-out paralelo + merge do top-k
+    with stage("vector_search"):
+        per_shard = fan_out(query_shard, shards) if shards else []
+
+    outputs = []
+    for q in range(len(query_embeddings)):
+        output = []
+        merged = merge_topk([
+            list(zip(r["distances"][q], r["ids"][q], r["metadatas"][q]))
+            for r in per_shard if r["ids"]
+        ], n_results)
+        for distance, embedding_id, metadata in merged:
+            # ChromaDB retorna distância coseno: 0 = idêntico, 2 = oposto
+            # Converti para score de similaridade [0, 1]
             similarity = 1 - (distance / 2)
-            metadata = results["metadatas"][0][i]
+            if keep is not None and not keep(metadata):
+                continue
             output.append({
                 "embedding_id": embedding_id,
                 "job_id": int(metadata["job_id"]),
@@ -168,6 +418,315 @@ def search_similar_jobs(
                 "title": metadata.get("title"),
                 "company": metadata.get("company"),
             })
-            # ChromaDB retorna distância coseno: 0 = idêntico, 2 = oposto
-            # Converti para score de similaridade [0, 1]
-    return output
+        outputs.append(output)
+    return outputs
+
+
+def _exact_scan(shard: dict, query: np.ndarray, k: int, where: dict, keep=None) -> list[tuple]:
+    """Top-k de um shard lendo todas as vagas do filtro em páginas (memória limitada a uma página)."""
+    best: list[tuple] = []
+    page_size = settings.filter_exact_page_size
+    offset = 0
+    while True:
+        page = _run_on_index(shard, lambda c: c.get(
+            where=where, limit=page_size, offset=offset, include=["embeddings", "metadatas"],
+        ))
+        if not page["ids"]:
+            break
+        rows = [i for i, metadata in enumerate(page["metadatas"])
+                if keep is None or keep(metadata)]
+        if rows:
+            scores = np.asarray([page["embeddings"][i] for i in rows], dtype=np.float32) @ query
+            best = heapq.nlargest(k, best + [
+                (float(score), page["ids"][i], page["metadatas"][i])
+                for i, score in zip(rows, scores)
+            ], key=lambda item: item[0])
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    return best
+
+
+def _exact_search(
+    active: dict,
+    query_embedding: list[float],
+    n_results: int,
+    where: dict,
+    keep=None,
+) -> list[dict]:
+    """Força bruta sobre o subconjunto filtrado: resultado exato e custo previsível."""
+    query = np.asarray(query_embedding, dtype=np.float32)
+    with stage("vector_search"):
+        per_shard = fan_out(lambda shard: _exact_scan(shard, query, n_results, where, keep),
+                            shards_for_area(active, _area_from_where(where)))
+    top = heapq.nlargest(n_results, (item for items in per_shard for item in items),
+                         key=lambda item: item[0])
+    return [
+        {
+            "embedding_id": embedding_id,
+            "job_id": int(metadata["job_id"]),
+            "similarity_score": round((1 + score) / 2, 4),
+            "title": metadata.get("title"),
+            "company": metadata.get("company"),
+        }
+        for score, embedding_id, metadata in top
+    ]
+
+
+def _quantized_search(active: dict, quantized, query_embedding: list[float],
+                      n_results: int) -> list[dict]:
+    results = [
+        {
+            "embedding_id": f"job_{job_id}",
+            "job_id": job_id,
+            "similarity_score": round((1 + score) / 2, 4),
+            "title": None,
+            "company": None,
+        }
+        for job_id, score in quantized.search(query_embedding, n_results)
+    ]
+    # Vagas criadas/editadas depois do build não estão nos códigos: busca exata só nelas
+    built_at = datetime.fromisoformat(quantized.manifest["built_at"]).timestamp()
+    fresh = _exact_search(active, query_embedding, n_results, {"indexed_at": {"$gt": built_at}})
+    if not fresh:
+        return results
+    fresh_ids = {r["job_id"] for r in fresh}
+    merged = fresh + [r for r in results if r["job_id"] not in fresh_ids]
+    merged.sort(key=lambda r: -r["similarity_score"])
+    return merged[:n_results]
+
+
+def _radius_filter(location: str | None, radius_km: float | None):
+    """Pós-filtro por distância real: as células de geohash cobrem um quadrado."""
+    center = geo_center(location) if radius_km else None
+    if center is None:
+        return None
+
+    def keep(metadata: dict) -> bool:
+        if metadata.get("lat") is None:
+            return False
+        return haversine_km(center[0], center[1], metadata["lat"], metadata["lon"]) <= radius_km
+    return keep
+
+
+def _planned_search(
+    active: dict,
+    query_embedding: list[float],
+    n_results: int,
+    filters: dict,
+) -> list[dict]:
+    where = _build_where(*(filters.get(k) for k in (
+        "area", "seniority", "location", "salary_min", "salary_max", "skills",
+        "remote", "radius_km",
+    )), faceted=has_current_metadata(active))
+    keep = _radius_filter(filters.get("location"), filters.get("radius_km"))
+    if not where and keep is None:
+        # Sem filtros, o índice compacto (int8/float16 + rescoring) substitui o HNSW
+        quantized = get_quantized_index(active)
+        if quantized is not None:
+            return _quantized_search(active, quantized, query_embedding, n_results)
+    plan = plan_search(filters, n_results)
+    if plan["strategy"] == EXACT:
+        return _exact_search(active, query_embedding, n_results, where, keep)
+
+    n_fetch = plan["n_fetch"]
+    while True:
+        try:
+            results = _query_index(active, [query_embedding], n_fetch, where, keep)[0]
+        except Exception as exc:
+            # hnswlib falha quando o filtro deixa menos vizinhos que o pedido
+            print(f"[Embedder] ANN filtrado falhou ({exc!r}); usando busca exata")
+            break
+        if len(results) >= n_results or (not where and keep is None):
+            return results[:n_results]
+        if n_fetch >= settings.filter_max_overfetch:
+            break
+        n_fetch = min(n_fetch * 4, settings.filter_max_overfetch)
+    return _exact_search(active, query_embedding, n_results, where, keep)
+
+
+def search_similar_jobs( 
+    query_text: str,
+    n_results: int = 10,
+    filter_area: str = None,
+    filter_seniority: str = None,
+    filter_location: str = None,
+    filter_salary_min: float = None,
+    filter_salary_max: float = None,
+    filter_skills: list[str] = None,
+    filter_remote: bool = None,
+    filter_radius_km: float = None,
+    query_embedding: list[float] = None,
+) -> list[dict]:
+    
+    active = get_active_index()
+    # Vetor pronto (ex.: adaptado pelo feedback) dispensa o encode do texto
+    if query_embedding is None:
+        query_embedding = embed_text(query_text, active["model"], active.get("projection"))
+    filters = {
+        "area": filter_area,
+        "seniority": filter_seniority,
+        "location": filter_location,
+        "salary_min": filter_salary_min,
+        "salary_max": filter_salary_max,
+        "skills": filter_skills,
+        "remote": filter_remote,
+        "radius_km": filter_radius_km,
+    }
+    return _planned_search(active, query_embedding, n_results, filters)
+
+
+def search_similar_jobs_batch(
+    query_embeddings: list[list[float]],
+    n_results: int = 10,
+    filter_area: str = None,
+    filter_seniority: str = None,
+    filter_location: str = None,
+) -> list[list[dict]]:
+    """Várias consultas com o mesmo filtro em uma única chamada ao Chroma.
+
+    Quando o plano não é ANN puro (filtro seletivo, índice quantizado) ou uma
+    lista volta curta, a consulta cai em _planned_search: o mesmo caminho do /recommend.
+    """
+    if not query_embeddings:
+        return []
+    observe_batch("vector_search", len(query_embeddings))
+    active = get_active_index()
+    filters = {"area": filter_area, "seniority": filter_seniority, "location": filter_location}
+    where = _build_where(filter_area, filter_seniority, filter_location,
+                         faceted=has_current_metadata(active))
+    if where:
+        shared = plan_search(filters, n_results)["strategy"] == ANN
+    else:
+        shared = get_quantized_index(active) is None
+    results = [None] * len(query_embeddings)
+    if shared:
+        try:
+            results = _query_index(active, query_embeddings, n_results, where)
+        except Exception as exc:
+            print(f"[Embedder] Busca em lote falhou ({exc!r}); buscando uma a uma")
+    return [
+        found if found is not None and (len(found) >= n_results or not where)
+        else _planned_search(active, query, n_results, filters)
+        for query, found in zip(query_embeddings, results)
+    ]
+
+
+# ── Índice reverso: perfis ───────────────────────────────────────────────────
+
+def _profile_metadata(profile) -> dict:
+    return {
+        "profile_id": str(profile.id),
+        "session_id": profile.session_id,
+        "desired_area": profile.desired_area or "",
+        "desired_seniority": profile.desired_seniority or "",
+    }
+
+
+def index_profiles(profiles: list, vectors: dict[int, list[float]],
+                   targets: list[dict] | None = None) -> None:
+    """Upsert dos perfis na coleção de perfis pareada com cada coleção de vagas em escrita.
+
+    `vectors` são os do modelo ativo (ensure_query_embeddings); a sombra, se
+    houver, recebe vetores do seu próprio modelo. `targets` restringe a escrita
+    a essas coleções de vagas (p.ex. só a sombra, no backfill do reindex).
+    """
+    profiles = [p for p in profiles if p.id in vectors]
+    if not profiles:
+        return
+    active_space = embedding_space(get_active_index())
+    ids = [f"profile_{p.id}" for p in profiles]
+    metadatas = [_profile_metadata(p) for p in profiles]
+
+    for target in targets or _write_targets():
+        if embedding_space(target) == active_space:
+            embeddings = [vectors[p.id] for p in profiles]
+        else:
+            embeddings = embed_batch([p.query_text for p in profiles], model_name=target["model"],
+                                     projection=target.get("projection"))
+        index = profile_index(target)
+        _run_on_index(index, lambda c: c.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas))
+        chroma_manager.invalidate_count(index["collection"])
+
+
+def count_indexed_profiles(index: dict | None = None) -> int:
+    index = profile_index(index or get_active_index())
+    return chroma_manager.count(index["collection"], collection_metadata(index))
+
+
+def get_job_embedding(job_id: int, job: dict | None = None) -> list[float] | None:
+    """Vetor da vaga já gravado na coleção ativa; reembeda `job` se não estiver lá."""
+    active = get_active_index()
+    # A área pode ter mudado desde a indexação: procura em todos os shards
+    for result in fan_out(lambda shard: _run_on_index(
+        shard, lambda c: c.get(ids=[f"job_{job_id}"], include=["embeddings"]),
+    ), all_shards(active)):
+        embeddings = result.get("embeddings")
+        if embeddings is not None and len(embeddings):
+            return list(map(float, embeddings[0]))
+    if job is None:
+        return None
+    return embed_text(job_to_embedding_text(job), active["model"], active.get("projection"))
+
+
+def get_job_embeddings(job_ids: list[int]) -> dict[int, np.ndarray]:
+    """Vetores gravados de várias vagas em um get por shard (sem reembedar)."""
+    if not job_ids:
+        return {}
+    ids = [f"job_{job_id}" for job_id in job_ids]
+    vectors = {}
+    for result in fan_out(lambda shard: _run_on_index(
+        shard, lambda c: c.get(ids=ids, include=["embeddings"]),
+    ), all_shards(get_active_index())):
+        embeddings = result.get("embeddings")
+        for embedding_id, embedding in zip(result["ids"], embeddings if embeddings is not None else []):
+            vectors[int(embedding_id.removeprefix("job_"))] = np.asarray(embedding, dtype=np.float32)
+    return vectors
+
+
+def _build_profile_where(area: str = None, seniority: str = None) -> dict | None:
+    # Perfis sem preferência declarada ("") também são candidatos
+    where_clauses = []
+    if area:
+        where_clauses.append({"desired_area": {"$in": [area, ""]}})
+    if seniority:
+        where_clauses.append({"desired_seniority": {"$in": [seniority, ""]}})
+
+    if len(where_clauses) == 1:
+        return where_clauses[0]
+    if len(where_clauses) > 1:
+        return {"$and": where_clauses}
+    return None
+
+
+def search_candidate_profiles(
+    job_embedding: list[float],
+    n_results: int = 10,
+    filter_area: str = None,
+    filter_seniority: str = None,
+) -> list[dict]:
+    """Top-k de perfis para uma vaga via HNSW da coleção de perfis (sem varrer no Python)."""
+    index = profile_index(get_active_index())
+    total = count_indexed_profiles()
+    if not total:
+        return []
+    query_kwargs = {
+        "query_embeddings": [job_embedding],
+        "n_results": min(n_results, total),
+        "include": ["metadatas", "distances"],
+    }
+    where = _build_profile_where(filter_area, filter_seniority)
+    if where:
+        query_kwargs["where"] = where
+
+    with stage("vector_search"):
+        results = _run_on_index(index, lambda c: c.query(**query_kwargs))
+    ids = results["ids"][0] if results["ids"] else []
+    return [
+        {
+            "profile_id": int(results["metadatas"][0][i]["profile_id"]),
+            "session_id": results["metadatas"][0][i]["session_id"],
+            "similarity_score": round(1 - results["distances"][0][i] / 2, 4),
+        }
+        for i in range(len(ids))
+    ]
@@ -0,0 +1,141 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.db_models import UserFeedback
+
+DEFAULT_KS = (5, 10, 20)
+
+
+def load_judgments(
+    db: Session,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    model: str | None = None,
+) -> dict[str, np.ndarray]:
+    """Uma única consulta agregada: relevância por (perfil, modelo, posição).
+
+    Cliques repetidos na mesma posição colapsam em max(rating), ou seja,
+    a posição é relevante se recebeu ao menos um "relevante".
+    """
+    stmt = (
+        select(
+            UserFeedback.profile_id,
+            func.coalesce(UserFeedback.embedding_model, ""),
+            UserFeedback.rank_position,
+            func.max(UserFeedback.rating),
+        )
+        .where(UserFeedback.rank_position.isnot(None), UserFeedback.rank_position >= 1)
+        .group_by(
+            UserFeedback.profile_id,
+            func.coalesce(UserFeedback.embedding_model, ""),
+            UserFeedback.rank_position,
+        )
+    )
+    if since is not None:
+        stmt = stmt.where(UserFeedback.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(UserFeedback.created_at < until)
+    if model is not None:
+        stmt = stmt.where(UserFeedback.embedding_model == model)
+
+    rows = db.execute(stmt).all()
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return {"profile_id": empty, "model": np.array([], dtype=object),
+                "position": empty, "relevant": empty}
+
+    profile_ids, models, positions, ratings = zip(*rows)
+    return {
+        "profile_id": np.asarray(profile_ids, dtype=np.int64),
+        "model": np.asarray(models, dtype=object),
+        "position": np.asarray(positions, dtype=np.int64),
+        "relevant": (np.asarray(ratings, dtype=np.int64) == 1).astype(np.int8),
+    }
+
+
+def compute_metrics(
+    profile_ids: np.ndarray,
+    positions: np.ndarray,
+    relevant: np.ndarray,
+    ks: tuple[int, ...] = DEFAULT_KS,
+) -> dict[str, np.ndarray]:
+    """Métricas por perfil, vetorizadas sobre a matriz perfis x posições."""
+    profiles, row = np.unique(profile_ids, return_inverse=True)
+    max_k = max(ks)
+    n = len(profiles)
+
+    # Colapsa (perfil, posição) repetidos — p.ex. a mesma posição sob dois modelos
+    pair = row.astype(np.int64) * (int(positions.max()) + 1) + positions
+    order = np.argsort(pair, kind="stable")
+    pair_sorted = pair[order]
+    starts = np.flatnonzero(np.r_[True, pair_sorted[1:] != pair_sorted[:-1]])
+    relevant = np.maximum.reduceat(relevant[order], starts)
+    row, positions = row[order][starts], positions[order][starts]
+
+    in_window = positions <= max_k
+    judged = np.zeros((n, max_k), dtype=np.int8)
+    rel = np.zeros((n, max_k), dtype=np.int8)
+    judged[row[in_window], positions[in_window] - 1] = 1
+    rel[row[in_window], positions[in_window] - 1] = relevant[in_window]
+
+    # Total de relevantes julgados em qualquer posição (denominador do recall)
+    total_relevant = np.bincount(row, weights=relevant, minlength=n)
+
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    ideal_cumulative = np.concatenate([[0.0], np.cumsum(discounts)])
+
+    first_hit = np.where(rel.any(axis=1), rel.argmax(axis=1) + 1, 0)
+    metrics = {
+        "profile_id": profiles,
+        "mrr": np.divide(1.0, first_hit, out=np.zeros(n), where=first_hit > 0),
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k in ks:
+            hits = rel[:, :k].sum(axis=1)
+            judged_k = judged[:, :k].sum(axis=1)
+            dcg = (rel[:, :k] * discounts[:k]).sum(axis=1)
+            idcg = ideal_cumulative[np.minimum(total_relevant, k).astype(np.int64)]
+            # Mesma convenção do calculate_precision_at_k: sobre as posições julgadas
+            metrics[f"precision@{k}"] = np.where(judged_k > 0, hits / judged_k, np.nan)
+            metrics[f"recall@{k}"] = np.where(total_relevant > 0, hits / total_relevant, np.nan)
+            metrics[f"ndcg@{k}"] = np.where(idcg > 0, dcg / idcg, np.nan)
+    return metrics
+
+
+def summarize(metrics: dict[str, np.ndarray]) -> dict:
+    summary = {"profiles": int(len(metrics["profile_id"]))}
+    for name, values in metrics.items():
+        if name == "profile_id":
+            continue
+        summary[name] = round(float(np.nanmean(values)), 4) if np.any(~np.isnan(values)) else None
+    return summary
+
+
+def evaluate(
+    db: Session,
+    ks: tuple[int, ...] = DEFAULT_KS,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    model: str | None = None,
+    by_model: bool = False,
+) -> list[dict]:
+    """Relatório agregado (uma linha por fatia): todas as sessões ou por modelo."""
+    data = load_judgments(db, since, until, model)
+    if not len(data["profile_id"]):
+        return []
+
+    if by_model:
+        slices = [(name, data["model"] == name) for name in sorted(set(data["model"]))]
+    else:
+        slices = [(model or "todos", np.ones(len(data["profile_id"]), dtype=bool))]
+
+    report = []
+    for name, mask in slices:
+        metrics = compute_metrics(
+            data["profile_id"][mask], data["position"][mask], data["relevant"][mask], ks,
+        )
+        report.append({"model": name or "desconhecido", **summarize(metrics)})
+    return report
@@ -0,0 +1,159 @@
+import json
+import time
+import uuid
+
+import redis
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import observe_batch
+from app.core.redis_client import get_redis
+from app.models.db_models import Job, UserFeedback
+from app.services.index_registry import embedding_space, get_active_index
+from app.services.personalization import apply_feedback
+from app.services.profile_cache import get_profile, invalidate_profile
+
+settings = get_settings()
+
+CONSUMER_GROUP = "feedback-writers"
+
+# Campos aceitos no envelope, com o tipo esperado
+_ENVELOPE_FIELDS = {
+    "event_id": str,
+    "profile_id": int,
+    "job_id": int,
+    "rating": int,
+    "rank_position": int,
+    "similarity_score": float,
+    "embedding_model": str,
+}
+
+
+def enqueue_feedback(
+    db: Session,
+    session_id: str,
+    job_id: int,
+    rating: int,
+    rank_position: int = None,
+    similarity_score: float = None,
+) -> str:
+    """Anexa o feedback ao stream do Redis e devolve o event_id (chave de idempotência)."""
+    profile = get_profile(db, session_id)
+    if not profile:
+        raise ValueError("Perfil não encontrado.")
+
+    event = {
+        "event_id": uuid.uuid4().hex,
+        "profile_id": profile["id"],
+        "job_id": job_id,
+        "rating": rating,
+        "rank_position": rank_position,
+        "similarity_score": similarity_score,
+        "embedding_model": embedding_space(get_active_index()),
+        "ts": time.time(),
+    }
+    get_redis().xadd(
+        settings.feedback_stream_key,
+        {"event": json.dumps(event)},
+        maxlen=settings.feedback_stream_maxlen,
+        approximate=True,
+    )
+    return event["event_id"]
+
+
+def _parse_event(payload: bytes) -> dict | None:
+    try:
+        raw = json.loads(payload)
+        event = {}
+        for field, cast in _ENVELOPE_FIELDS.items():
+            value = raw.get(field)
+            event[field] = cast(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+    if not event["event_id"] or event["profile_id"] is None or event["job_id"] is None:
+        return None
+    if event["rating"] not in (-1, 0, 1):
+        return None
+    return event
+
+
+def _ensure_group(r: redis.Redis) -> None:
+    try:
+        r.xgroup_create(settings.feedback_stream_key, CONSUMER_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+def _insert_ignoring_duplicates(db: Session, rows: list[dict]) -> set[str]:
+    """Insere em lote e devolve os event_id realmente gravados (não duplicados)."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(UserFeedback).values(rows).on_conflict_do_nothing(
+        index_elements=["event_id"]
+    ).returning(UserFeedback.event_id)
+    return set(db.execute(stmt).scalars())
+
+
+def _read_batch(r: redis.Redis, consumer: str, count: int) -> list[tuple[bytes, dict]]:
+    # Primeiro recupera mensagens entregues a consumidores que morreram sem ACK
+    _, claimed, *_ = r.xautoclaim(
+        settings.feedback_stream_key, CONSUMER_GROUP, consumer,
+        min_idle_time=settings.feedback_claim_idle_ms, start_id="0-0", count=count,
+    )
+    if claimed:
+        return claimed
+    response = r.xreadgroup(
+        CONSUMER_GROUP, consumer, {settings.feedback_stream_key: ">"}, count=count,
+    )
+    return response[0][1] if response else []
+
+
+def flush_feedback_stream(db: Session, consumer: str, max_batches: int = 50) -> int:
+    """Grava os eventos pendentes em lote (at-least-once; duplicatas caem no event_id)."""
+    r = get_redis()
+    _ensure_group(r)
+    inserted = 0
+
+    for _ in range(max_batches):
+        messages = _read_batch(r, consumer, settings.feedback_flush_batch_size)
+        if not messages:
+            break
+        observe_batch("feedback_flush", len(messages))
+
+        message_ids = [message_id for message_id, _ in messages]
+        events = [_parse_event((fields or {}).get(b"event", b"")) for _, fields in messages]
+        events = [e for e in events if e is not None]
+
+        # Uma vaga removida não pode travar o lote inteiro pela FK
+        job_ids = {e["job_id"] for e in events}
+        existing = {
+            job_id for (job_id,) in db.query(Job.id).filter(Job.id.in_(job_ids)).all()
+        } if job_ids else set()
+        # Reentregas podem repetir o evento dentro do próprio lote
+        rows = list({e["event_id"]: e for e in events if e["job_id"] in existing}.values())
+
+        inserted_ids: set[str] = set()
+        if rows:
+            inserted_ids = _insert_ignoring_duplicates(db, rows)
+            # Reentregas já aplicadas não mexem de novo no vetor adaptado
+            by_profile: dict[int, list[tuple[int, int]]] = {}
+            for row in rows:
+                if row["event_id"] in inserted_ids:
+                    by_profile.setdefault(row["profile_id"], []).append((row["job_id"], row["rating"]))
+            sessions = [apply_feedback(db, profile_id, events)
+                        for profile_id, events in by_profile.items()]
+            db.commit()
+            for session_id in filter(None, sessions):
+                invalidate_profile(session_id)
+        r.xack(settings.feedback_stream_key, CONSUMER_GROUP, *message_ids)
+        r.xdel(settings.feedback_stream_key, *message_ids)
+
+        dropped = len(messages) - len(rows)
+        if dropped:
+            print(f"[Feedback] {dropped} eventos inválidos descartados")
+        inserted += len(inserted_ids)
+
+    return inserted
@@ -0,0 +1,184 @@
+import json
+import math
+import re
+import time
+
+import numpy as np
+import redis
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis
+from app.models.db_models import Job
+from app.services.location import GEOHASH_PRECISIONS, location_clauses, location_metadata
+
+settings = get_settings()
+
+# Estratégias de busca filtrada
+ANN = "ann"                  # HNSW com o where empurrado para o Chroma
+ANN_OVERFETCH = "overfetch"  # HNSW pedindo mais vizinhos, com retry adaptativo
+EXACT = "exact"              # força bruta sobre o subconjunto filtrado
+
+FACET_STATS_KEY = "filter:facet_stats"
+# Pontos da distribuição de salários guardados no Redis (quantis, não a lista inteira)
+SALARY_QUANTILES = 1001
+
+_stats: tuple[float, dict] | None = None
+
+
+def skill_key(skill: str) -> str:
+    """Chave de metadado booleana por habilidade (o Chroma só aceita escalares)."""
+    return "skill_" + re.sub(r"[^a-z0-9]+", "_", skill.strip().lower()).strip("_")
+
+
+def salary_bounds(salary_min: float | None, salary_max: float | None) -> tuple[float, float]:
+    # Faixa incompleta vira faixa de um ponto; 0 = vaga sem salário informado
+    low = salary_min or salary_max or 0.0
+    high = salary_max or salary_min or 0.0
+    return float(low), float(high)
+
+
+# Metadados de igualdade exata com contagem por valor
+FACET_FIELDS = ("area", "seniority", "city", "state", "country", "remote") + tuple(
+    f"geohash_{p}" for p in GEOHASH_PRECISIONS
+)
+
+
+def facet_value(value) -> str:
+    # Chave das contagens: o JSON do Redis transforma True em "true", então os bools já vão como texto
+    if isinstance(value, bool):
+        return str(value).lower()
+    return value
+
+
+def _quantiles(values: list[float]) -> np.ndarray:
+    if not values:
+        return np.zeros(0, dtype=np.float64)
+    return np.quantile(np.asarray(values, dtype=np.float64), np.linspace(0, 1, SALARY_QUANTILES))
+
+
+def load_facet_stats() -> dict:
+    """Contagens por faceta a partir do Postgres, numa única passada pelas vagas.
+
+    Caro em catálogos grandes: roda no Celery beat (publish_facet_stats), nunca no request.
+    """
+    db = SessionLocal()
+    try:
+        facets = {field: {} for field in FACET_FIELDS}
+        skills, lows, highs = {}, [], []
+        total = 0
+        rows = db.query(
+            Job.area, Job.seniority, Job.location, Job.skills, Job.salary_min, Job.salary_max,
+        ).filter(Job.embedding_id.isnot(None)).yield_per(5000)
+        for area, seniority, location, job_skills, salary_min, salary_max in rows:
+            total += 1
+            values = {"area": area or "", "seniority": seniority or "", **location_metadata(location)}
+            for field in FACET_FIELDS:
+                if field in values:
+                    counts, value = facets[field], facet_value(values[field])
+                    counts[value] = counts.get(value, 0) + 1
+            for key in {skill_key(s) for s in (job_skills or []) if isinstance(s, str)}:
+                skills[key] = skills.get(key, 0) + 1
+            low, high = salary_bounds(salary_min, salary_max)
+            if high > 0:
+                lows.append(low)
+                highs.append(high)
+    finally:
+        db.close()
+    return {
+        "total": total,
+        "facets": facets,
+        "skills": skills,
+        "salaried": len(highs),
+        "salary_low": _quantiles(lows),
+        "salary_high": _quantiles(highs),
+    }
+
+
+def publish_facet_stats() -> dict:
+    """Recalcula as contagens e grava no Redis para os workers da API."""
+    stats = load_facet_stats()
+    payload = {**stats, "salary_low": stats["salary_low"].tolist(),
+               "salary_high": stats["salary_high"].tolist()}
+    get_redis().set(FACET_STATS_KEY, json.dumps(payload))
+    invalidate_facet_stats()
+    return stats
+
+
+def get_facet_stats() -> dict | None:
+    """Contagens publicadas pelo beat (cache local curto); None enquanto não houver."""
+    global _stats
+    if _stats is not None and time.monotonic() - _stats[0] <= settings.filter_stats_ttl_seconds:
+        return _stats[1]
+    try:
+        payload = get_redis().get(FACET_STATS_KEY)
+    except redis.RedisError as exc:
+        print(f"[Planner] Estatísticas de facetas indisponíveis: {exc!r}")
+        return None
+    if not payload:
+        return None
+    stats = json.loads(payload)
+    stats["salary_low"] = np.asarray(stats["salary_low"], dtype=np.float64)
+    stats["salary_high"] = np.asarray(stats["salary_high"], dtype=np.float64)
+    _stats = (time.monotonic(), stats)
+    return stats
+
+
+def invalidate_facet_stats() -> None:
+    global _stats
+    _stats = None
+
+
+def estimate_selectivity(stats: dict, filters: dict) -> float:
+    """Fração estimada de vagas que passam nos filtros (facetas tratadas como independentes)."""
+    total = stats["total"]
+    if not total:
+        return 0.0
+    selectivity = 1.0
+    clauses = location_clauses(filters.get("location"), filters.get("radius_km"),
+                               filters.get("remote"))
+    for field in ("area", "seniority"):
+        if filters.get(field):
+            clauses.append({field: {"$eq": filters[field]}})
+    for clause in clauses:
+        (field, condition), = clause.items()
+        counts = stats["facets"].get(field, {})
+        values = condition["$in"] if "$in" in condition else [condition["$eq"]]
+        selectivity *= sum(counts.get(facet_value(v), 0) for v in values) / total
+    for skill in filters.get("skills") or []:
+        selectivity *= stats["skills"].get(skill_key(skill), 0) / total
+    if filters.get("salary_min") is not None or filters.get("salary_max") is not None:
+        highs, lows = stats["salary_high"], stats["salary_low"]
+        fraction = stats["salaried"] / total
+        if len(highs) and filters.get("salary_min") is not None:
+            fraction *= 1 - np.searchsorted(highs, filters["salary_min"], side="left") / len(highs)
+        if len(lows) and filters.get("salary_max") is not None:
+            fraction *= np.searchsorted(lows, filters["salary_max"], side="right") / len(lows)
+        selectivity *= fraction
+    return float(selectivity)
+
+
+def plan_search(filters: dict, n_results: int) -> dict:
+    """Escolhe a estratégia pela seletividade estimada dos filtros."""
+    if not any(v for v in filters.values() if v is not None):
+        return {"strategy": ANN, "selectivity": 1.0, "estimated_matches": None,
+                "n_fetch": n_results}
+
+    stats = get_facet_stats()
+    if stats is None:
+        # Sem estatísticas publicadas: ANN com o retry adaptativo de _planned_search
+        return {"strategy": ANN, "selectivity": None, "estimated_matches": None,
+                "n_fetch": n_results}
+    selectivity = estimate_selectivity(stats, filters)
+    estimated = math.ceil(selectivity * stats["total"])
+
+    if estimated <= settings.filter_exact_max_candidates:
+        strategy, n_fetch = EXACT, n_results
+    elif selectivity >= settings.filter_ann_min_selectivity:
+        strategy, n_fetch = ANN, n_results
+    else:
+        # Post-filtering do HNSW perde vizinhos na proporção da seletividade
+        strategy = ANN_OVERFETCH
+        n_fetch = min(math.ceil(n_results / selectivity), settings.filter_max_overfetch)
+    return {"strategy": strategy, "selectivity": selectivity,
+            "estimated_matches": estimated, "n_fetch": max(n_fetch, n_results)}
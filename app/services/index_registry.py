@@ -0,0 +1,224 @@
+import json
+import re
+import time
+
+from sqlalchemy import or_
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.models.db_models import Job, IndexState
+
+settings = get_settings()
+
+# Coleção legada: usada enquanto nenhum alias foi gravado no banco
+JOBS_COLLECTION = "jobs"
+
+ACTIVE_KEY = "jobs_alias"
+PREVIOUS_KEY = "jobs_alias_previous"
+SHADOW_KEY = "jobs_shadow"
+
+# Versão dos metadados de filtro das vagas (2 = salário, skill_*, localização normalizada).
+# Coleções abaixo dela usam o where legado até o backfill_job_metadata_task terminar.
+JOB_METADATA_VERSION = 2
+
+_cache: dict[str, tuple[float, dict | None]] = {}
+
+
+def versioned_collection_name(model_name: str, dimension: int,
+                              projection: str | None = None) -> str:
+    # Chroma aceita 3-63 chars [a-zA-Z0-9._-], começando/terminando em alfanumérico
+    slug = re.sub(r"[^a-z0-9]+", "-", model_name.split("/")[-1].lower()).strip("-")
+    suffix = f"__{dimension}" + (f"p{projection[-6:]}" if projection else "")
+    slug = slug[:63 - len("jobs__") - len(suffix)].strip("-")
+    return f"jobs__{slug}{suffix}"
+
+
+def make_index(model_name: str, dimension: int, projection: str | None = None) -> dict:
+    index = {
+        "collection": versioned_collection_name(model_name, dimension, projection),
+        "model": model_name,
+        "dimension": dimension,
+        # Coleção nova é preenchida do zero com os metadados atuais
+        "metadata_version": JOB_METADATA_VERSION,
+    }
+    if projection:
+        index["projection"] = projection
+    return index
+
+
+def embedding_space(index: dict) -> str:
+    """Modelo + projeção: vetores só são comparáveis dentro do mesmo espaço."""
+    projection = index.get("projection")
+    return f"{index['model']}#{projection}" if projection else index["model"]
+
+
+def profile_index(index: dict) -> dict:
+    """Coleção de perfis pareada com a de vagas (mesmo modelo e dimensão)."""
+    suffix = index["collection"][len("jobs"):]
+    # Mantém o fim do nome (dimensão) dentro do limite de 63 chars do Chroma
+    return {**index, "collection": "profiles" + suffix[-(63 - len("profiles")):]}
+
+
+def has_current_metadata(index: dict) -> bool:
+    return index.get("metadata_version", 0) >= JOB_METADATA_VERSION
+
+
+def default_index() -> dict:
+    return {"collection": JOBS_COLLECTION, "model": settings.embedding_model, "dimension": None}
+
+
+def collection_metadata(index: dict) -> dict:
+    metadata = {"hnsw:space": "cosine"}
+    if index.get("dimension"):
+        metadata["embedding_model"] = embedding_space(index)
+        metadata["dimension"] = index["dimension"]
+    if index.get("shard_of"):
+        metadata["shard_of"] = index["shard_of"]
+    return metadata
+
+
+def _read(key: str) -> dict | None:
+    cached = _cache.get(key)
+    if cached and time.monotonic() - cached[0] < settings.index_alias_ttl_seconds:
+        return cached[1]
+
+    db = SessionLocal()
+    try:
+        state = db.get(IndexState, key)
+        value = json.loads(state.value) if state and state.value else None
+    finally:
+        db.close()
+    _cache[key] = (time.monotonic(), value)
+    return value
+
+
+def _write(db, key: str, value: dict | None) -> None:
+    state = db.query(IndexState).filter(IndexState.key == key).with_for_update().first()
+    if state is None:
+        state = IndexState(key=key)
+        db.add(state)
+    state.value = json.dumps(value) if value else None
+
+
+def invalidate_cache() -> None:
+    _cache.clear()
+
+
+def get_active_index() -> dict:
+    return _read(ACTIVE_KEY) or default_index()
+
+
+def get_previous_index() -> dict | None:
+    return _read(PREVIOUS_KEY)
+
+
+def get_shadow_index() -> dict | None:
+    return _read(SHADOW_KEY)
+
+
+def set_shadow_index(index: dict | None) -> None:
+    db = SessionLocal()
+    try:
+        _write(db, SHADOW_KEY, index)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_cache()
+
+
+def _switch(db, new_active: dict, new_previous: dict | None) -> None:
+    # Import local: result_cache depende deste módulo
+    from app.services.result_cache import bump_index_version
+
+    _write(db, ACTIVE_KEY, new_active)
+    _write(db, PREVIOUS_KEY, new_previous)
+    shadow = db.get(IndexState, SHADOW_KEY)
+    if shadow and shadow.value and json.loads(shadow.value) == new_active:
+        shadow.value = None
+    # Vagas indexadas passam a ser "do" modelo ativo; updated_at é preservado
+    # para não disparar a reindexação incremental de todo o catálogo.
+    db.query(Job).filter(Job.embedding_id.isnot(None)).update(
+        {Job.embedding_model: embedding_space(new_active), Job.updated_at: Job.updated_at},
+        synchronize_session=False,
+    )
+    # Respostas ranqueadas pelo modelo anterior deixam de ser servidas
+    bump_index_version()
+
+
+def mark_metadata_current(index: dict) -> None:
+    """Registra nos aliases que apontam para a coleção que os metadados estão atualizados."""
+    from app.services.result_cache import bump_index_version
+
+    db = SessionLocal()
+    try:
+        for key in (ACTIVE_KEY, SHADOW_KEY, PREVIOUS_KEY):
+            state = db.query(IndexState).filter(IndexState.key == key).with_for_update().first()
+            value = json.loads(state.value) if state and state.value else None
+            if value is None and key == ACTIVE_KEY:
+                value = default_index()
+            if value and value["collection"] == index["collection"]:
+                _write(db, key, {**value, "metadata_version": JOB_METADATA_VERSION})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    invalidate_cache()
+    # Os filtros passam a usar as facetas novas: respostas em cache ficam velhas
+    bump_index_version()
+
+
+def activate_index(index: dict | None = None) -> dict:
+    """Aponta o alias para `index` (ou para a coleção sombra) numa única transação."""
+    db = SessionLocal()
+    try:
+        if index is None:
+            state = db.get(IndexState, SHADOW_KEY)
+            if not state or not state.value:
+                raise ValueError("Nenhuma coleção sombra para ativar.")
+            index = json.loads(state.value)
+        current = db.get(IndexState, ACTIVE_KEY)
+        previous = json.loads(current.value) if current and current.value else default_index()
+        _switch(db, index, previous)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    invalidate_cache()
+    print(f"[Index] Alias ativo -> {index['collection']} ({index['model']})")
+    return index
+
+
+def rollback_index() -> dict:
+    """Volta o alias para a coleção anterior (a atual vira a 'anterior')."""
+    db = SessionLocal()
+    try:
+        previous = db.get(IndexState, PREVIOUS_KEY)
+        if not previous or not previous.value:
+            raise ValueError("Não há coleção anterior para rollback.")
+        target = json.loads(previous.value)
+        current = db.get(IndexState, ACTIVE_KEY)
+        current_index = json.loads(current.value) if current and current.value else default_index()
+        if current is not None and current.updated_at is not None:
+            # Vagas criadas/editadas depois da ativação só foram escritas na coleção
+            # atual: sem hash, a reindexação incremental as leva para a anterior.
+            db.query(Job).filter(or_(
+                Job.created_at > current.updated_at,
+                Job.updated_at > current.updated_at,
+            )).update(
+                {Job.embedding_hash: None, Job.updated_at: Job.updated_at},
+                synchronize_session=False,
+            )
+        _switch(db, target, current_index)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    invalidate_cache()
+    print(f"[Index] Rollback -> {target['collection']} ({target['model']})")
+    return target
@@ -0,0 +1,198 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import get_settings
+from app.core.metrics import stage
+from app.models.db_models import Job
+from app.services.embedder import (
+    _build_where, _job_metadata, _radius_filter, search_similar_jobs,
+)
+
+settings = get_settings()
+
+# Coluna gerada + índice GIN criados por init_db (só Postgres); ver app/core/database.py
+_SEARCH_SQL = """
+    SELECT id, ts_rank_cd(search_vector, q, 32) AS score
+    FROM jobs, websearch_to_tsquery(CAST(:language AS regconfig), :query) AS q
+    WHERE search_vector @@ q {conditions}
+    ORDER BY score DESC, id
+    LIMIT :limit
+"""
+_PUSHDOWN = ("area", "seniority")
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.hybrid_workers, thread_name_prefix="hybrid")
+    return _executor
+
+
+def matches_where(metadata: dict, where: dict | None) -> bool:
+    """Avalia um where do Chroma sobre metadados em memória (mesma semântica)."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches_where(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches_where(metadata, clause) for clause in where["$or"])
+    for field, condition in where.items():
+        if field not in metadata:
+            return False
+        value = metadata[field]
+        for op, expected in condition.items():
+            ok = {
+                "$eq": lambda: value == expected,
+                "$ne": lambda: value != expected,
+                "$in": lambda: value in expected,
+                "$nin": lambda: value not in expected,
+                "$gt": lambda: value > expected,
+                "$gte": lambda: value >= expected,
+                "$lt": lambda: value < expected,
+                "$lte": lambda: value <= expected,
+            }[op]()
+            if not ok:
+                return False
+    return True
+
+
+def profile_keyword_query(profile: dict, max_terms: int = 20) -> str | None:
+    """Habilidades do perfil como consulta OR (websearch_to_tsquery)."""
+    terms = []
+    for skill in (profile.get("skills") or [])[:max_terms]:
+        skill = re.sub(r'["\s]+', " ", skill).strip()
+        if skill:
+            terms.append(f'"{skill}"' if " " in skill else skill)
+    return " or ".join(terms) or None
+
+
+def _fallback_search(db: Session, query: str, limit: int, filters: dict) -> list[dict]:
+    # Sem Postgres (SQLite nos testes/dev): conta termos no título/descrição
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t != "or"]
+    if not terms:
+        return []
+    q = db.query(Job).options(load_only(Job.id, Job.title, Job.description, Job.skills))
+    for field in _PUSHDOWN:
+        if filters.get(field):
+            q = q.filter(getattr(Job, field) == filters[field])
+    q = q.filter(or_(*(
+        column.ilike(f"%{term}%") for term in terms for column in (Job.title, Job.description)
+    )))
+    hits = []
+    for job in q.limit(settings.filter_exact_scan_limit):
+        title, body = (job.title or "").lower(), (job.description or "").lower()
+        score = sum(2.0 * (term in title) + (term in body) for term in terms)
+        hits.append({"job_id": job.id, "score": score})
+    hits.sort(key=lambda h: (-h["score"], h["job_id"]))
+    return hits[:limit]
+
+
+def _post_filter(db: Session, hits: list[dict], filters: dict, limit: int) -> list[dict]:
+    """Aplica os filtros que não viram SQL (localização, raio, salário, skills)."""
+    where = _build_where(*(filters.get(k) for k in (
+        "area", "seniority", "location", "salary_min", "salary_max", "skills",
+        "remote", "radius_km",
+    )))
+    keep = _radius_filter(filters.get("location"), filters.get("radius_km"))
+    if not hits or (where is None and keep is None):
+        return hits[:limit]
+    jobs = {
+        job.id: job
+        for job in db.query(Job).options(load_only(
+            Job.id, Job.title, Job.company, Job.location, Job.area, Job.seniority,
+            Job.salary_min, Job.salary_max, Job.skills,
+        )).filter(Job.id.in_([h["job_id"] for h in hits]))
+    }
+    kept = []
+    for hit in hits:
+        job = jobs.get(hit["job_id"])
+        if job is None:
+            continue
+        metadata = _job_metadata(job.id, {
+            "title": job.title, "company": job.company, "location": job.location,
+            "area": job.area, "seniority": job.seniority, "skills": job.skills,
+            "salary_min": job.salary_min, "salary_max": job.salary_max,
+        })
+        if matches_where(metadata, where) and (keep is None or keep(metadata)):
+            kept.append(hit)
+            if len(kept) == limit:
+                break
+    return kept
+
+
+def keyword_search(db: Session, query: str, limit: int = 20,
+                   filters: dict | None = None) -> list[dict]:
+    """Busca textual ranqueada (ts_rank_cd) -> [{"job_id", "score"}]."""
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    if not query or not query.strip():
+        return []
+    # Filtros fora de área/nível são aplicados depois; busca alguns a mais
+    needs_post = any(k not in _PUSHDOWN for k in filters)
+    fetch = limit * settings.hybrid_post_filter_overfetch if needs_post else limit
+
+    if db.bind.dialect.name != "postgresql":
+        hits = _fallback_search(db, query, fetch, filters)
+    else:
+        params = {"language": settings.fulltext_language, "query": query, "limit": fetch}
+        conditions = ""
+        for field in _PUSHDOWN:
+            if filters.get(field):
+                conditions += f" AND {field} = :{field}"
+                params[field] = filters[field]
+        rows = db.execute(text(_SEARCH_SQL.format(conditions=conditions)), params)
+        hits = [{"job_id": row.id, "score": round(float(row.score), 4)} for row in rows]
+    return _post_filter(db, hits, filters, limit) if needs_post else hits
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = 60) -> list[tuple[int, float]]:
+    """RRF: score(d) = Σ 1 / (k + posição de d em cada lista), posições a partir de 1."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for position, job_id in enumerate(ranking, start=1):
+            scores[job_id] = scores.get(job_id, 0.0) + 1.0 / (k + position)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def hybrid_search(db: Session, query_text: str, keyword_query: str | None,
+                  n_results: int, filters: dict,
+                  query_embedding: list[float] | None = None) -> list[dict]:
+    """Densa (Chroma) e textual (Postgres) em paralelo, fundidas por RRF."""
+    depth = max(n_results, settings.hybrid_candidates)
+    # Contexto copiado: os estágios da thread densa entram no Server-Timing do request
+    dense_future = _pool().submit(
+        contextvars.copy_context().run, search_similar_jobs, query_text, depth,
+        **{f"filter_{name}": value for name, value in filters.items()},
+        query_embedding=query_embedding,
+    )
+    # A sessão do request não é thread-safe: a parte textual roda nesta thread
+    try:
+        with stage("lexical_search"):
+            lexical = keyword_search(db, keyword_query, depth, filters) if keyword_query else []
+    except SQLAlchemyError as exc:
+        db.rollback()
+        print(f"[Hybrid] Busca textual falhou ({exc!r}); seguindo só com a densa")
+        lexical = []
+    dense = dense_future.result()
+
+    fused = reciprocal_rank_fusion(
+        [[d["job_id"] for d in dense], [h["job_id"] for h in lexical]],
+        k=settings.hybrid_rrf_k,
+    )[:n_results]
+    dense_by_id = {d["job_id"]: d for d in dense}
+    return [
+        {
+            **dense_by_id.get(job_id, {"job_id": job_id}),
+            # Vaga vinda só da busca textual não tem similaridade calculada
+            "similarity_score": dense_by_id.get(job_id, {}).get("similarity_score", 0.0),
+            "fusion_score": round(score, 6),
+        }
+        for job_id, score in fused
+    ]
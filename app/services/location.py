@@ -0,0 +1,217 @@
+import csv
+import math
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class FilterError(ValueError):
+    """Filtro que o índice não consegue atender (erro do pedido, não perfil ausente)."""
+
+
+REMOTE_TERMS = ("remoto", "remota", "remote", "home office", "anywhere", "teletrabalho")
+
+BR_STATES = {
+    "ac": "acre", "al": "alagoas", "ap": "amapa", "am": "amazonas", "ba": "bahia",
+    "ce": "ceara", "df": "distrito federal", "es": "espirito santo", "go": "goias",
+    "ma": "maranhao", "mt": "mato grosso", "ms": "mato grosso do sul", "mg": "minas gerais",
+    "pa": "para", "pb": "paraiba", "pr": "parana", "pe": "pernambuco", "pi": "piaui",
+    "rj": "rio de janeiro", "rn": "rio grande do norte", "rs": "rio grande do sul",
+    "ro": "rondonia", "rr": "roraima", "sc": "santa catarina", "sp": "sao paulo",
+    "se": "sergipe", "to": "tocantins",
+}
+_STATE_BY_NAME = {name: code for code, name in BR_STATES.items()}
+
+COUNTRIES = {
+    "br": "br", "brasil": "br", "brazil": "br",
+    "pt": "pt", "portugal": "pt",
+    "us": "us", "usa": "us", "eua": "us", "estados unidos": "us", "united states": "us",
+}
+
+# Precisões de geohash gravadas como metadado (geohash_2 ... geohash_6)
+GEOHASH_PRECISIONS = (2, 3, 4, 5, 6)
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Altura x largura (no equador) da célula, em km, por precisão
+_CELL_KM = {2: (625.0, 1250.0), 3: (156.0, 156.0), 4: (19.5, 39.1), 5: (4.89, 4.89), 6: (0.61, 1.22)}
+# Maior raio que a célula mais grossa ainda cobre (altura de geohash_2)
+MAX_RADIUS_KM = _CELL_KM[GEOHASH_PRECISIONS[0]][0]
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", _fold(text)).strip("-")
+
+
+@lru_cache(maxsize=1)
+def _gazetteer() -> dict[str, list[dict]]:
+    """Cidade (slug) -> linhas do gazetteer local; vazio se o arquivo não existir."""
+    path = settings.gazetteer_path
+    if not path or not os.path.exists(path):
+        return {}
+    places: dict[str, list[dict]] = {}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            places.setdefault(slugify(row["city"]), []).append({
+                "state": _fold(row["state"]) or None,
+                "country": _fold(row["country"]) or None,
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+            })
+    return places
+
+
+def _lookup(city: str | None, state: str | None, country: str | None) -> tuple | None:
+    candidates = _gazetteer().get(city or "", [])
+    if state:
+        candidates = [p for p in candidates if p["state"] == state]
+    if country:
+        candidates = [p for p in candidates if p["country"] == country]
+    # Nome ambíguo sem UF/país não ganha coordenada
+    if len(candidates) != 1:
+        return None
+    return candidates[0]["lat"], candidates[0]["lon"]
+
+
+@lru_cache(maxsize=50_000)
+def normalize_location(raw: str | None) -> dict:
+    """'São Paulo, SP (Híbrido)' -> cidade, UF, país, remoto e lat/lon (se no gazetteer)."""
+    text = _fold(raw or "")
+    remote = any(term in text for term in REMOTE_TERMS)
+    for term in REMOTE_TERMS:
+        text = text.replace(term, " ")
+    text = re.sub(r"\(.*?\)", " ", text)
+
+    city = state = country = None
+    parts = [p.strip() for p in re.split(r"[,/;|]| - ", text) if p.strip()]
+    for i, part in enumerate(parts):
+        name = re.sub(r"\s+", " ", part)
+        if name in COUNTRIES:
+            country = COUNTRIES[name]
+        elif name in BR_STATES:
+            state, country = name, country or "br"
+        # "São Paulo" / "Rio de Janeiro" sozinhos na primeira posição são a cidade
+        elif name in _STATE_BY_NAME and i > 0:
+            state, country = _STATE_BY_NAME[name], country or "br"
+        elif city is None:
+            city = slugify(name) or None
+
+    coords = _lookup(city, state, country) if city else None
+    return {
+        "city": city,
+        "state": state,
+        "country": country,
+        "remote": remote,
+        "lat": coords[0] if coords else None,
+        "lon": coords[1] if coords else None,
+    }
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    bits, bit, even, cell = 0, 0, True, []
+    while len(cell) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            cell.append(_BASE32[bits])
+            bits, bit = 0, 0
+    return "".join(cell)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> tuple[int, list[str]] | None:
+    """Célula do centro + 8 vizinhas na precisão mais fina cuja célula cobre o raio."""
+    chosen = None
+    for precision in GEOHASH_PRECISIONS:
+        height, width = _CELL_KM[precision]
+        if min(height, width * math.cos(math.radians(lat))) >= radius_km:
+            chosen = precision
+    if chosen is None:
+        return None
+    height, width = _CELL_KM[chosen]
+    dlat = height / 111.0
+    dlon = width / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    cells = {
+        geohash_encode(max(min(lat + i * dlat, 89.999), -89.999),
+                       (lon + j * dlon + 180) % 360 - 180, chosen)
+        for i in (-1, 0, 1) for j in (-1, 0, 1)
+    }
+    return chosen, sorted(cells)
+
+
+def location_metadata(raw: str | None) -> dict:
+    """Metadados de igualdade exata para o Chroma (campos desconhecidos são omitidos)."""
+    place = normalize_location(raw)
+    metadata = {"remote": place["remote"]}
+    for field in ("city", "state", "country"):
+        if place[field]:
+            metadata[field] = place[field]
+    if place["lat"] is not None:
+        metadata["lat"], metadata["lon"] = place["lat"], place["lon"]
+        for precision in GEOHASH_PRECISIONS:
+            metadata[f"geohash_{precision}"] = geohash_encode(place["lat"], place["lon"], precision)
+    return metadata
+
+
+def geo_center(location: str | None) -> tuple[float, float] | None:
+    place = normalize_location(location)
+    return (place["lat"], place["lon"]) if place["lat"] is not None else None
+
+
+def location_clauses(
+    location: str | None,
+    radius_km: float | None = None,
+    remote: bool | None = None,
+) -> list[dict]:
+    """Cláusulas where de igualdade/$in para os filtros de localização."""
+    clauses = []
+    if remote is not None:
+        clauses.append({"remote": {"$eq": bool(remote)}})
+    if not location:
+        return clauses
+
+    place = normalize_location(location)
+    if radius_km and place["lat"] is not None:
+        cover = covering_cells(place["lat"], place["lon"], radius_km)
+        if cover is None:
+            # Sem cláusula a busca viraria uma varredura sem filtro: recusa o raio
+            raise FilterError(
+                f"Raio de {radius_km:g} km grande demais para '{location}' "
+                f"(máx. {MAX_RADIUS_KM:g} km, menos em latitudes altas)."
+            )
+        precision, cells = cover
+        clauses.append({f"geohash_{precision}": {"$in": cells}})
+        return clauses
+
+    if radius_km:
+        print(f"[Location] '{location}' fora do gazetteer; filtrando por igualdade")
+    for field in ("city", "state", "country"):
+        if place[field]:
+            clauses.append({field: {"$eq": place[field]}})
+    # "Remoto" / "Home office" sozinho não tem lugar: vira o filtro de remoto
+    if remote is None and place["remote"] and not any(place[f] for f in ("city", "state", "country")):
+        clauses.append({"remote": {"$eq": True}})
+    return clauses
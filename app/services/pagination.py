@@ -0,0 +1,78 @@
+import base64
+import json
+import secrets
+
+import redis
+
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+
+settings = get_settings()
+
+# Um cursor = lista ordenada no Redis (uma entrada compacta por vaga) + meta.
+# O token volta ao cliente codificado junto com o offset da próxima página.
+
+
+def _items_key(token: str) -> str:
+    return f"reco:cursor:{token}:items"
+
+
+def _meta_key(token: str) -> str:
+    return f"reco:cursor:{token}:meta"
+
+
+def encode_cursor(token: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{token}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        token, offset = raw.rsplit(":", 1)
+        return token, int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido.")
+
+
+def create_cursor(session_id: str, ranked: list[dict], page_size: int) -> str | None:
+    """Grava a lista ranqueada inteira e devolve o cursor da 2ª página (None se acabou)."""
+    if len(ranked) <= page_size:
+        return None
+    token = secrets.token_urlsafe(12)
+    entries = [
+        json.dumps([r["job_id"], r["similarity_score"], r.get("fusion_score"),
+                    r.get("rerank_score")], separators=(",", ":"))
+        for r in ranked
+    ]
+    meta = {"session_id": session_id, "page_size": page_size, "total": len(ranked)}
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.rpush(_items_key(token), *entries)
+        pipe.expire(_items_key(token), settings.pagination_ttl_seconds)
+        pipe.set(_meta_key(token), json.dumps(meta), ex=settings.pagination_ttl_seconds)
+        pipe.execute()
+    except redis.RedisError as exc:
+        print(f"[Pagination] Falha ao gravar cursor: {exc!r}")
+        return None
+    return encode_cursor(token, page_size)
+
+
+def read_page(cursor: str) -> tuple[dict, list[dict], str | None]:
+    """(meta, itens da página, próximo cursor) — um LRANGE, sem busca vetorial."""
+    token, offset = decode_cursor(cursor)
+    r = get_redis()
+    meta = r.get(_meta_key(token))
+    if meta is None:
+        raise ValueError("Cursor inválido ou expirado.")
+    meta = json.loads(meta)
+    page_size = meta["page_size"]
+    raw = r.lrange(_items_key(token), offset, offset + page_size - 1)
+    items = []
+    for entry in raw:
+        job_id, similarity, fusion, rerank = json.loads(entry)
+        items.append({"job_id": job_id, "similarity_score": similarity,
+                      "fusion_score": fusion, "rerank_score": rerank})
+    next_offset = offset + page_size
+    next_cursor = encode_cursor(token, next_offset) if next_offset < meta["total"] else None
+    meta["offset"] = offset
+    return meta, items, next_cursor
@@ -4,36 +4,14 @@ import spacy
 from spacy.matcher import PhraseMatcher
 from io import BytesIO
 
+from app.core.metrics import stage
+from app.utils.skills import TECH_SKILLS
+
 try:
     nlp = spacy.load("pt_core_news_lg")
 except OSError:
     nlp = spacy.load("pt_core_news_sm")
 
-TECH_SKILLS = [
-    # Linguagens
-    "Python", "JavaScript", "TypeScript", "Java", "Kotlin", "Swift", "Go", "Rust",
-    "C", "C++", "C#", "PHP", "Ruby", "Scala", "R", "MATLAB", "Perl", "Dart",
-    # Frontend
-    "React", "Vue", "Angular", "Next.js", "Nuxt", "Svelte", "HTML", "CSS",
-    "Tailwind", "Bootstrap", "Redux", "GraphQL", "REST API",
-    # Backend
-    "Node.js", "Django", "Flask", "FastAPI", "Spring Boot", "Laravel", "Rails",
-    "Express", "NestJS", "Gin",
-    # Dados & IA
-    "Machine Learning", "Deep Learning", "TensorFlow", "PyTorch", "Keras",
-    "scikit-learn", "Pandas", "NumPy", "Spark", "Hadoop", "Airflow", "dbt",
-    "SQL", "PostgreSQL", "MySQL", "MongoDB", "Redis", "Elasticsearch",
-    "Power BI", "Tableau", "Looker", "BigQuery", "Snowflake", "Databricks",
-    "NLP", "Computer Vision", "LLM", "RAG", "LangChain", "OpenAI",
-    # DevOps & Cloud
-    "Docker", "Kubernetes", "AWS", "Azure", "GCP", "Terraform", "Ansible",
-    "CI/CD", "Jenkins", "GitHub Actions", "Linux", "Bash",
-    # Mobile
-    "Flutter", "React Native", "Android", "iOS", "Jetpack Compose",
-    # Outros
-    "Git", "Agile", "Scrum", "Kanban", "JIRA", "Figma", "Microservices",
-    "Design Patterns", "TDD", "Clean Code", "DDD", "SOLID",
-]
 
 SENIORITY_KEYWORDS = {
     "junior": ["junior", "júnior", "jr", "entry level", "trainee", "estágio", "estagiário"],
@@ -196,27 +174,29 @@ def parse_resume(text: str = None, file_bytes: bytes = None,
                  desired_area: str = None, desired_seniority: str = None) -> dict:
 
     if file_bytes:
-        text = extract_text_from_pdf(file_bytes)
+        with stage("pdf_extract"):
+            text = extract_text_from_pdf(file_bytes)
     if not text:
         raise ValueError("É necessário fornecer texto ou arquivo PDF.")
 
-    sections = split_sections(text)
-
-    skills_text = sections["skills"] if sections["skills"] else text
-    skills = extract_skills(skills_text)
-    if len(skills) < 3:
-        skills = extract_skills(text)
-
-    profile = {
-        "raw_text": text[:5000],  # limite para não sobrecarregar o bd
-        "skills": skills,
-        "experiences": extract_experiences(sections["experience"] or text),
-        "education": extract_education(sections["education"] or text),
-        "languages": extract_languages(sections["languages"] or text),
-        "seniority_detected": extract_seniority(text),
-        "desired_area": desired_area,
-        "desired_seniority": desired_seniority or extract_seniority(text),
-    }
+    with stage("parse"):
+        sections = split_sections(text)
+
+        skills_text = sections["skills"] if sections["skills"] else text
+        skills = extract_skills(skills_text)
+        if len(skills) < 3:
+            skills = extract_skills(text)
+
+        profile = {
+            "raw_text": text[:5000],  # limite para não sobrecarregar o bd
+            "skills": skills,
+            "experiences": extract_experiences(sections["experience"] or text),
+            "education": extract_education(sections["education"] or text),
+            "languages": extract_languages(sections["languages"] or text),
+            "seniority_detected": extract_seniority(text),
+            "desired_area": desired_area,
+            "desired_seniority": desired_seniority or extract_seniority(text),
+        }
 
     profile["query_text"] = build_query_text(profile)
     return profile
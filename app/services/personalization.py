@@ -0,0 +1,101 @@
+import base64
+
+import numpy as np
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import get_settings
+from app.models.db_models import UserProfile
+from app.services.embedder import (
+    bytes_to_vector, ensure_query_embeddings, get_job_embeddings, vector_to_bytes,
+)
+from app.services.index_registry import embedding_space, get_active_index
+
+settings = get_settings()
+
+
+def rocchio(query: np.ndarray, sums: np.ndarray, ratings: dict) -> np.ndarray:
+    """q' = α·q + β·média(curtidas) − γ·média(rejeitadas), normalizado."""
+    liked = sum(1 for r in ratings.values() if r > 0)
+    disliked = sum(1 for r in ratings.values() if r < 0)
+    adapted = settings.rocchio_alpha * query
+    if liked:
+        adapted = adapted + settings.rocchio_beta * sums[0] / liked
+    if disliked:
+        adapted = adapted - settings.rocchio_gamma * sums[1] / disliked
+    norm = np.linalg.norm(adapted)
+    return adapted / norm if norm > 0 else query
+
+
+def _contribute(sums: np.ndarray, vector: np.ndarray, rating: int, sign: float) -> None:
+    if rating > 0:
+        sums[0] += sign * vector
+    elif rating < 0:
+        sums[1] += sign * vector
+
+
+def apply_feedback(db: Session, profile_id: int, events: list[tuple[int, int]]) -> str | None:
+    """Atualiza o vetor adaptado do perfil com (job_id, rating), O(d) por evento.
+
+    Uma nova nota para a mesma vaga substitui a anterior. Se o espaço de
+    embeddings ativo mudou, as somas são refeitas a partir das notas guardadas.
+    Só faz flush: o chamador faz o commit e depois `invalidate_profile` com o
+    session_id devolvido (a projeção em cache carrega o vetor adaptado).
+    """
+    if not settings.personalization_enabled or not events:
+        return None
+    profile = (
+        db.query(UserProfile)
+        .options(load_only(
+            UserProfile.id, UserProfile.session_id, UserProfile.query_text,
+            UserProfile.query_embedding, UserProfile.query_embedding_model,
+            UserProfile.adapted_embedding, UserProfile.adapted_embedding_model,
+            UserProfile.feedback_sums, UserProfile.feedback_ratings,
+        ))
+        .filter(UserProfile.id == profile_id)
+        .with_for_update()
+        .first()
+    )
+    if profile is None:
+        return None
+    query = np.asarray(ensure_query_embeddings(db, [profile]).get(profile.id, []), dtype=np.float32)
+    if not len(query):
+        return None
+
+    space = embedding_space(get_active_index())
+    ratings = dict(profile.feedback_ratings or {})
+    rebuild = profile.adapted_embedding_model != space or profile.feedback_sums is None
+    job_ids = [int(job_id) for job_id in ratings] if rebuild else []
+    vectors = get_job_embeddings(sorted(set(job_ids) | {job_id for job_id, _ in events}))
+
+    if rebuild:
+        sums = np.zeros((2, len(query)), dtype=np.float32)
+        for job_id in job_ids:
+            if job_id in vectors:
+                _contribute(sums, vectors[job_id], ratings[str(job_id)], 1.0)
+    else:
+        sums = bytes_to_vector(profile.feedback_sums).reshape(2, -1).copy()
+
+    for job_id, rating in events:
+        vector = vectors.get(job_id)
+        previous = ratings.get(str(job_id))
+        if vector is not None:
+            if previous is not None:
+                _contribute(sums, vector, previous, -1.0)
+            _contribute(sums, vector, rating, 1.0)
+        ratings[str(job_id)] = rating
+
+    profile.feedback_sums = vector_to_bytes(sums)
+    profile.feedback_ratings = ratings
+    profile.adapted_embedding = vector_to_bytes(rocchio(query, sums, ratings))
+    profile.adapted_embedding_model = space
+    db.flush()
+    return profile.session_id
+
+
+def adapted_query(profile: dict) -> list[float] | None:
+    """Vetor adaptado da projeção do perfil, se for do espaço de embeddings ativo."""
+    if not profile.get("adapted_embedding"):
+        return None
+    if profile.get("adapted_model") != embedding_space(get_active_index()):
+        return None
+    return bytes_to_vector(base64.b64decode(profile["adapted_embedding"])).tolist()
@@ -0,0 +1,191 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import redis
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import get_settings
+from app.core.metrics import record_cache
+from app.core.redis_client import get_redis
+from app.models.db_models import UserProfile
+from app.services.embedder import (
+    _collection_count, _run_on_index, bytes_to_vector, count_indexed_jobs,
+    ensure_query_embeddings,
+)
+from app.services.index_registry import embedding_space, get_active_index
+from app.services.profile_cache import feedback_version, profile_version
+from app.services.sharding import all_shards
+
+settings = get_settings()
+
+
+def _topn_key(collection: str, session_id: str, profile: str,
+              feedback: str | None = None) -> str:
+    # A coleção faz parte da chave: após trocar o alias, listas antigas são ignoradas.
+    # As versões do perfil e do feedback também: regravar o currículo ou avaliar
+    # uma vaga invalida a lista até a próxima rodada
+    key = f"reco:top:{collection}:{session_id}:{profile}"
+    return f"{key}:{feedback}" if feedback else key
+
+
+def load_job_matrix(index: dict, page_size: int = 5000,
+                    workdir: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """(job_ids, matriz float32) da coleção; vai para memmap se passar do teto de memória.
+
+    O arquivo do memmap é criado em `workdir` com nome único; quem chama remove o diretório.
+    """
+    total = count_indexed_jobs(index)
+    job_ids = np.zeros(total, dtype=np.int64)
+    matrix = None
+    loaded = 0
+
+    pages = (
+        _run_on_index(shard, lambda c: c.get(
+            offset=offset, limit=page_size, include=["embeddings", "metadatas"],
+        ))
+        for shard in all_shards(index)
+        for offset in range(0, _collection_count(shard), page_size)
+    )
+    for page in pages:
+        if not page["ids"]:
+            continue
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if matrix is None:
+            nbytes = total * vectors.shape[1] * 4
+            if nbytes > settings.precompute_memory_mb * 1024 * 1024 // 2:
+                fd, path = tempfile.mkstemp(prefix="precompute_jobs-", suffix=".npy", dir=workdir)
+                os.close(fd)
+                matrix = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=np.float32, shape=(total, vectors.shape[1]))
+            else:
+                matrix = np.empty((total, vectors.shape[1]), dtype=np.float32)
+        # Upserts concorrentes podem passar do total lido no início
+        n = min(len(vectors), total - loaded)
+        matrix[loaded:loaded + n] = vectors[:n]
+        job_ids[loaded:loaded + n] = [int(m["job_id"]) for m in page["metadatas"][:n]]
+        loaded += n
+
+    if matrix is None:
+        return job_ids[:0], np.zeros((0, 0), dtype=np.float32)
+    return job_ids[:loaded], matrix[:loaded]
+
+
+def job_block_size(profile_block: int) -> int:
+    # Matriz de scores (perfis x vagas, float32) limitada a metade do teto de memória
+    budget = settings.precompute_memory_mb * 1024 * 1024 // 2
+    return max(1024, budget // (4 * max(profile_block, 1)))
+
+
+def streaming_topk(queries: np.ndarray, jobs: np.ndarray, k: int,
+                   block: int) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k por linha de `queries` percorrendo `jobs` em blocos (sem a matriz completa)."""
+    n_queries = len(queries)
+    k = min(k, len(jobs))
+    best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+    best_index = np.zeros((n_queries, 0), dtype=np.int64)
+    rows = np.arange(n_queries)[:, None]
+
+    for start in range(0, len(jobs), block):
+        scores = queries @ np.asarray(jobs[start:start + block]).T
+        cand_scores = np.concatenate([best_scores, scores], axis=1)
+        cand_index = np.concatenate(
+            [best_index, np.arange(start, start + scores.shape[1])[None, :].repeat(n_queries, 0)],
+            axis=1,
+        )
+        if cand_scores.shape[1] > k:
+            keep = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            cand_scores, cand_index = cand_scores[rows, keep], cand_index[rows, keep]
+        best_scores, best_index = cand_scores, cand_index
+
+    order = np.argsort(-best_scores, axis=1)
+    return best_index[rows, order], best_scores[rows, order]
+
+
+def precompute_recommendations(db: Session, top_n: int | None = None) -> int:
+    top_n = top_n or settings.precompute_top_n
+    index = get_active_index()
+    # Diretório próprio por execução: duas rodadas simultâneas não dividem o memmap
+    workdir = tempfile.mkdtemp(prefix="precompute-")
+    try:
+        job_ids, job_matrix = load_job_matrix(index, workdir=workdir)
+        if not len(job_ids):
+            return 0
+        return _precompute_profiles(db, index, job_ids, job_matrix, top_n)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _precompute_profiles(db: Session, index: dict, job_ids: np.ndarray,
+                         job_matrix: np.ndarray, top_n: int) -> int:
+    profile_block = settings.precompute_profile_block
+    block = job_block_size(profile_block)
+    r = get_redis()
+    written, last_id = 0, 0
+
+    while True:
+        profiles = (
+            db.query(UserProfile)
+            .options(load_only(
+                UserProfile.id, UserProfile.session_id, UserProfile.query_text,
+                UserProfile.query_embedding, UserProfile.query_embedding_model,
+                UserProfile.adapted_embedding, UserProfile.adapted_embedding_model,
+                UserProfile.feedback_ratings, UserProfile.skills,
+                UserProfile.desired_area, UserProfile.desired_seniority,
+            ))
+            .filter(UserProfile.id > last_id)
+            .order_by(UserProfile.id)
+            .limit(profile_block)
+            .all()
+        )
+        if not profiles:
+            break
+        last_id = profiles[-1].id
+
+        vectors = ensure_query_embeddings(db, profiles)
+        # Quem tem feedback usa o vetor adaptado, o mesmo da busca ao vivo
+        space = embedding_space(index)
+        for profile in profiles:
+            if profile.adapted_embedding and profile.adapted_embedding_model == space:
+                vectors[profile.id] = bytes_to_vector(profile.adapted_embedding).tolist()
+        profiles = [p for p in profiles if p.id in vectors]
+        if not profiles:
+            continue
+        queries = np.asarray([vectors[p.id] for p in profiles], dtype=np.float32)
+        top_index, top_scores = streaming_topk(queries, job_matrix, top_n, block)
+
+        pipe = r.pipeline(transaction=False)
+        for profile, indexes, scores in zip(profiles, top_index, top_scores):
+            key = _topn_key(index["collection"], profile.session_id, profile_version(profile),
+                            feedback_version(profile.feedback_ratings))
+            # Mesma escala de search_similar_jobs: 1 - distância_cosseno / 2
+            mapping = {int(job_ids[i]): float(round((1 + s) / 2, 4)) for i, s in zip(indexes, scores)}
+            pipe.delete(key)
+            pipe.zadd(key, mapping)
+            pipe.expire(key, settings.precompute_ttl_seconds)
+        pipe.execute()
+        db.commit()
+        written += len(profiles)
+        print(f"[Precompute] {written} perfis processados")
+
+    return written
+
+
+def get_precomputed(session_id: str, n_results: int, profile_version: str | None,
+                    feedback_version: str | None = None) -> list[dict] | None:
+    """Lista pré-computada (job_id, score) ou None se ausente/curta demais."""
+    if not settings.precompute_enabled or not profile_version:
+        return None
+    key = _topn_key(get_active_index()["collection"], session_id, profile_version,
+                    feedback_version)
+    try:
+        entries = get_redis().zrevrange(key, 0, n_results - 1, withscores=True)
+    except redis.RedisError as exc:
+        print(f"[Precompute] Redis indisponível: {exc!r}")
+        return None
+    if len(entries) < n_results:
+        record_cache("precompute", "miss")
+        return None
+    record_cache("precompute", "hit")
+    return [{"job_id": int(job_id), "similarity_score": score} for job_id, score in entries]
@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import record_cache, stage
+from app.core.redis_client import get_redis
+from app.models.db_models import UserProfile
+
+settings = get_settings()
+
+# Colunas da projeção: nada de raw_text / experiences / education
+PROFILE_COLUMNS = (
+    UserProfile.id,
+    UserProfile.session_id,
+    UserProfile.query_text,
+    UserProfile.desired_area,
+    UserProfile.desired_seniority,
+    UserProfile.skills,
+    UserProfile.languages,
+    UserProfile.adapted_embedding,
+    UserProfile.adapted_embedding_model,
+    UserProfile.feedback_ratings,
+)
+
+
+class TTLCache:
+    """LRU em processo com expiração por entrada."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_local = TTLCache(settings.profile_cache_size, settings.profile_cache_ttl_seconds)
+
+
+def _redis_key(session_id: str) -> str:
+    return f"profile:{session_id}"
+
+
+def _version_key(session_id: str) -> str:
+    # Token da versão em cache: muda a cada regravação, some na invalidação
+    return f"profile:ver:{session_id}"
+
+
+def feedback_version(ratings: dict | None) -> str | None:
+    if not ratings:
+        return None
+    return hashlib.sha1(json.dumps(ratings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def profile_version(profile) -> str:
+    """Hash do conteúdo que decide o ranking; muda quando o currículo é regravado."""
+    content = [profile.query_text, profile.skills or [], profile.desired_area,
+               profile.desired_seniority]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+
+def build_profile_summary(profile: dict) -> str:
+    parts = []
+    if profile.get("skills"):
+        top_skills = profile["skills"][:8]
+        parts.append(f"Habilidades: {', '.join(top_skills)}")
+    if profile.get("desired_area"):
+        parts.append(f"Área: {profile['desired_area']}")
+    if profile.get("desired_seniority"):
+        parts.append(f"Nível: {profile['desired_seniority']}")
+    if profile.get("languages"):
+        parts.append(f"Idiomas: {', '.join(profile['languages'][:3])}")
+    return " | ".join(parts) if parts else "Perfil genérico"
+
+
+def profile_projection(profile) -> dict:
+    """Projeção compacta do perfil (aceita o modelo ORM ou uma Row das PROFILE_COLUMNS)."""
+    projection = {
+        "id": profile.id,
+        "session_id": profile.session_id,
+        "query_text": profile.query_text,
+        "desired_area": profile.desired_area,
+        "desired_seniority": profile.desired_seniority,
+        "skills": profile.skills or [],
+        "languages": profile.languages or [],
+    }
+    projection["summary"] = build_profile_summary(projection)
+    projection["profile_version"] = profile_version(profile)
+    # Vetor adaptado vai junto (base64 do float32): a consulta não precisa de embed_text
+    ratings = profile.feedback_ratings or {}
+    projection["adapted_embedding"] = (
+        base64.b64encode(profile.adapted_embedding).decode("ascii")
+        if profile.adapted_embedding else None
+    )
+    projection["adapted_model"] = profile.adapted_embedding_model
+    projection["rated_job_ids"] = sorted(int(job_id) for job_id in ratings)
+    projection["feedback_version"] = feedback_version(ratings)
+    return projection
+
+
+def cache_profile(profile) -> dict:
+    projection = profile_projection(profile)
+    projection["cache_version"] = uuid.uuid4().hex[:12]
+    session_id = projection["session_id"]
+    _local.set(session_id, projection)
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.set(_redis_key(session_id), json.dumps(projection, ensure_ascii=False),
+                 ex=settings.profile_cache_redis_ttl_seconds)
+        pipe.set(_version_key(session_id), projection["cache_version"],
+                 ex=settings.profile_cache_redis_ttl_seconds)
+        pipe.execute()
+    except redis.RedisError as exc:
+        print(f"[ProfileCache] Falha ao gravar no Redis: {exc!r}")
+    return projection
+
+
+def invalidate_profile(session_id: str) -> None:
+    # Sem o token no Redis, as LRUs locais dos outros processos descartam a cópia no próximo hit
+    _local.pop(session_id)
+    try:
+        get_redis().delete(_redis_key(session_id), _version_key(session_id))
+    except redis.RedisError as exc:
+        print(f"[ProfileCache] Falha ao invalidar no Redis: {exc!r}")
+
+
+def _is_current(session_id: str, projection: dict) -> bool:
+    """Confere a cópia local com o token no Redis (só a chave curta, sem o payload)."""
+    try:
+        version = get_redis().get(_version_key(session_id))
+    except redis.RedisError as exc:
+        # Sem Redis, vale o TTL da LRU local
+        print(f"[ProfileCache] Redis indisponível: {exc!r}")
+        return True
+    return version is not None and version.decode() == projection.get("cache_version")
+
+
+def get_profile(db: Session, session_id: str) -> dict | None:
+    """Perfil compacto: memória local -> Redis -> Postgres (só as colunas da projeção)."""
+    projection = _local.get(session_id)
+    if projection is not None:
+        if _is_current(session_id, projection):
+            record_cache("profile", "local")
+            return projection
+        record_cache("profile", "stale")
+        _local.pop(session_id)
+
+    try:
+        payload = get_redis().get(_redis_key(session_id))
+    except redis.RedisError as exc:
+        print(f"[ProfileCache] Redis indisponível: {exc!r}")
+        payload = None
+    if payload:
+        record_cache("profile", "redis")
+        projection = json.loads(payload)
+        _local.set(session_id, projection)
+        return projection
+
+    record_cache("profile", "miss")
+    with stage("profile_db"):
+        row = db.query(*PROFILE_COLUMNS).filter(
+            UserProfile.session_id == session_id
+        ).first()
+    if not row:
+        return None
+    return cache_profile(row)
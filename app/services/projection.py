@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Artefato versionado: <projection_dir>/<nome>.npz (média e componentes) +
+# <nome>.json (modelo de origem, variância explicada, tamanho da amostra).
+# O nome carrega um hash dos componentes, então refits nunca se sobrescrevem.
+
+
+def fit_pca(matrix: np.ndarray, n_components: int) -> dict:
+    """PCA via SVD da amostra centrada."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if n_components >= matrix.shape[1]:
+        raise ValueError("n_components deve ser menor que a dimensão original.")
+    mean = matrix.mean(axis=0)
+    _, singular, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+    variance = singular ** 2
+    return {
+        "mean": mean.astype(np.float32),
+        "components": vt[:n_components].astype(np.float32),
+        "explained_variance": float(variance[:n_components].sum() / variance.sum()),
+    }
+
+
+def projection_name(fitted: dict) -> str:
+    digest = hashlib.sha1(fitted["components"].tobytes()).hexdigest()[:8]
+    return f"pca{fitted['components'].shape[0]}-{digest}"
+
+
+def save_projection(fitted: dict, model_name: str, sample_size: int,
+                    directory: str | None = None) -> str:
+    directory = directory or settings.projection_dir
+    os.makedirs(directory, exist_ok=True)
+    name = projection_name(fitted)
+    np.savez(os.path.join(directory, f"{name}.npz"),
+             mean=fitted["mean"], components=fitted["components"])
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "name": name,
+            "model": model_name,
+            "input_dimension": int(fitted["components"].shape[1]),
+            "dimension": int(fitted["components"].shape[0]),
+            "explained_variance": round(fitted["explained_variance"], 4),
+            "sample_size": sample_size,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }, f, indent=2)
+    return name
+
+
+@lru_cache(maxsize=8)
+def load_projection(name: str, directory: str | None = None) -> dict:
+    directory = directory or settings.projection_dir
+    with np.load(os.path.join(directory, f"{name}.npz")) as data:
+        projection = {"mean": data["mean"], "components": data["components"]}
+    with open(os.path.join(directory, f"{name}.json"), encoding="utf-8") as f:
+        projection.update(json.load(f))
+    return projection
+
+
+def apply_projection(vectors, projection: dict) -> np.ndarray:
+    """Projeta e renormaliza (as coleções usam cosseno)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    reduced = (vectors - projection["mean"]) @ projection["components"].T
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.where(norms > 0, norms, 1.0)
+
+
+def _topk(matrix: np.ndarray, queries: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    started = time.perf_counter()
+    scores = queries @ matrix.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    rows = np.arange(len(queries))[:, None]
+    top = top[rows, np.argsort(-scores[rows, top], axis=1)]
+    return top, time.perf_counter() - started
+
+
+def evaluate_projection(jobs: np.ndarray, queries: np.ndarray, projection: dict,
+                        k: int = 10) -> dict:
+    """Recall@k e sobreposição média das listas (projetada x dimensão completa)."""
+    full_top, full_seconds = _topk(jobs, queries, k)
+    reduced_jobs = apply_projection(jobs, projection)
+    reduced_top, reduced_seconds = _topk(reduced_jobs, apply_projection(queries, projection), k)
+
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(full_top, reduced_top)])
+    # Average overlap: média de |A@d ∩ B@d| / d para d = 1..k (sensível à ordem)
+    overlap = np.mean([
+        np.mean([len(set(a[:d]) & set(b[:d])) / d for d in range(1, k + 1)])
+        for a, b in zip(full_top, reduced_top)
+    ])
+    return {
+        f"recall@{k}": round(float(recall), 4),
+        f"avg_overlap@{k}": round(float(overlap), 4),
+        "dimension": int(reduced_jobs.shape[1]),
+        "full_dimension": int(jobs.shape[1]),
+        "bytes_per_vector": int(reduced_jobs.shape[1] * 4),
+        "full_bytes_per_vector": int(jobs.shape[1] * 4),
+        "search_ms": round(1000 * reduced_seconds / len(queries), 3),
+        "full_search_ms": round(1000 * full_seconds / len(queries), 3),
+    }
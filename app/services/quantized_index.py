@@ -0,0 +1,219 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.index_registry import get_active_index
+
+settings = get_settings()
+
+# Layout do diretório do índice compacto (QUANTIZED_INDEX_DIR):
+#   CURRENT               -> nome do build servido (trocado com os.replace)
+#   builds/<timestamp>-*/ -> um diretório por build, com:
+#     manifest.json       -> coleção/modelo de origem, modo, total e início do build
+#     codes.npy           -> códigos int8 (ou float16), carregados na RAM
+#     scales.npy          -> escala por dimensão (só int8)
+#     vectors.npy         -> float32 completos, abertos via memmap para o rescoring
+#     job_ids.npy         -> job_id de cada linha
+MODES = ("int8", "float16")
+CURRENT_POINTER = "CURRENT"
+BUILDS_DIR = "builds"
+KEEP_BUILDS = 2
+_SCORE_CHUNK = 16_384
+
+
+def quantize_int8(matrix: np.ndarray, chunk: int = 65_536) -> tuple[np.ndarray, np.ndarray]:
+    """Quantização escalar simétrica por dimensão: x ≈ code * scale, code em [-127, 127]."""
+    max_abs = np.zeros(matrix.shape[1], dtype=np.float32)
+    for start in range(0, len(matrix), chunk):
+        np.maximum(max_abs, np.abs(matrix[start:start + chunk]).max(axis=0), out=max_abs)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.empty(matrix.shape, dtype=np.int8)
+    for start in range(0, len(matrix), chunk):
+        block = np.asarray(matrix[start:start + chunk], dtype=np.float32) / scales
+        codes[start:start + chunk] = np.clip(np.rint(block), -127, 127)
+    return codes, scales
+
+
+class QuantizedIndex:
+    """Top-k grosso nos códigos compactos, rescoring exato nos float32 em disco."""
+
+    def __init__(self, codes: np.ndarray, vectors: np.ndarray, job_ids: np.ndarray,
+                 scales: np.ndarray | None = None, manifest: dict | None = None):
+        self.codes = codes
+        self.vectors = vectors
+        self.job_ids = job_ids
+        self.scales = scales
+        self.manifest = manifest or {}
+
+    @classmethod
+    def load(cls, directory: str) -> "QuantizedIndex":
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        scales_path = os.path.join(directory, "scales.npy")
+        return cls(
+            codes=np.load(os.path.join(directory, "codes.npy")),
+            vectors=np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r"),
+            job_ids=np.load(os.path.join(directory, "job_ids.npy")),
+            scales=np.load(scales_path) if os.path.exists(scales_path) else None,
+            manifest=manifest,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memória residente do índice (os float32 ficam no page cache, sob demanda)."""
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return self.codes.nbytes + scales + self.job_ids.nbytes
+
+    def coarse_scores(self, query: np.ndarray) -> np.ndarray:
+        # Com escala por dimensão, codes @ (q * scale) == (codes * scale) @ q
+        weights = query * self.scales if self.scales is not None else query
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _SCORE_CHUNK):
+            block = self.codes[start:start + _SCORE_CHUNK].astype(np.float32)
+            scores[start:start + _SCORE_CHUNK] = block @ weights
+        return scores
+
+    def search(self, query, k: int, rescore_factor: int | None = None) -> list[tuple[int, float]]:
+        """[(job_id, cosseno)] em ordem decrescente."""
+        query = np.asarray(query, dtype=np.float32)
+        k = min(k, len(self.codes))
+        if k <= 0:
+            return []
+        n_coarse = min(len(self.codes), k * (rescore_factor or settings.quantized_rescore_factor))
+        scores = self.coarse_scores(query)
+        candidates = np.argpartition(-scores, n_coarse - 1)[:n_coarse]
+        candidates.sort()  # leitura sequencial no memmap
+        exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        top = np.argsort(-exact)[:k]
+        return [(int(self.job_ids[candidates[i]]), float(exact[i])) for i in top]
+
+
+def current_build_dir(output_dir: str) -> str | None:
+    """Diretório do build apontado por CURRENT (None se ainda não houver build)."""
+    try:
+        with open(os.path.join(output_dir, CURRENT_POINTER), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(output_dir, BUILDS_DIR, name) if name else None
+
+
+def _point_to(output_dir: str, name: str) -> None:
+    # Troca atômica: os leitores veem o ponteiro antigo ou o novo, nunca um diretório pela metade
+    tmp = os.path.join(output_dir, f".{CURRENT_POINTER}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(output_dir, CURRENT_POINTER))
+
+
+def _prune_builds(output_dir: str, keep: int = KEEP_BUILDS) -> None:
+    builds_dir = os.path.join(output_dir, BUILDS_DIR)
+    current = os.path.basename(current_build_dir(output_dir) or "")
+    # Nomes começam pelo timestamp: os mais recentes por último
+    for name in sorted(os.listdir(builds_dir))[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(builds_dir, name), ignore_errors=True)
+
+
+def build_quantized_index(index: dict | None = None, output_dir: str | None = None,
+                          mode: str | None = None) -> dict:
+    """Lê os vetores da coleção ativa e grava o índice compacto num build versionado.
+
+    O build só passa a ser servido quando o ponteiro CURRENT é trocado (os.replace);
+    os KEEP_BUILDS mais recentes ficam em disco para leitores ainda no build anterior.
+    """
+    from app.services.precompute import load_job_matrix
+
+    index = index or get_active_index()
+    output_dir = output_dir or settings.quantized_index_dir
+    mode = mode or settings.quantized_mode
+    if mode not in MODES:
+        raise ValueError(f"Modo de quantização inválido: {mode}")
+
+    # Vagas gravadas depois deste instante ficam de fora dos códigos (ver indexed_at)
+    started = datetime.now(timezone.utc)
+    builds_dir = os.path.join(output_dir, BUILDS_DIR)
+    os.makedirs(builds_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f"{started:%Y%m%dT%H%M%S%f}-", dir=builds_dir)
+    try:
+        # Scratch do load_job_matrix no mesmo disco do índice, fora do build
+        scratch = tempfile.mkdtemp(prefix=".scratch-", dir=output_dir)
+        try:
+            job_ids, matrix = load_job_matrix(index, workdir=scratch)
+            vectors = np.lib.format.open_memmap(
+                os.path.join(staging, "vectors.npy"), mode="w+", dtype=np.float32,
+                shape=matrix.shape)
+            vectors[:] = matrix
+            vectors.flush()
+            del matrix
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        if mode == "int8":
+            codes, scales = quantize_int8(vectors)
+            np.save(os.path.join(staging, "scales.npy"), scales)
+        else:
+            codes = np.asarray(vectors, dtype=np.float16)
+        np.save(os.path.join(staging, "codes.npy"), codes)
+        np.save(os.path.join(staging, "job_ids.npy"), job_ids)
+        del vectors
+
+        manifest = {
+            "collection": index["collection"],
+            "model": index["model"],
+            "mode": mode,
+            "count": int(len(job_ids)),
+            "dimension": int(codes.shape[1]) if codes.ndim == 2 else None,
+            "built_at": started.isoformat(),
+        }
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _point_to(output_dir, os.path.basename(staging))
+    _prune_builds(output_dir)
+    print(f"[Quantized] {manifest['count']} vetores ({mode}) em {staging}")
+    return manifest
+
+
+_loaded: dict[str, tuple[str, QuantizedIndex]] = {}
+_lock = threading.Lock()
+
+
+def get_quantized_index(index: dict) -> QuantizedIndex | None:
+    """Índice compacto da coleção ativa, se habilitado, construído para ela e recente."""
+    if not settings.quantized_index_enabled:
+        return None
+    root = settings.quantized_index_dir
+    directory = current_build_dir(root)
+    if directory is None:
+        return None
+
+    with _lock:
+        cached = _loaded.get(root)
+        if cached is None or cached[0] != directory:
+            try:
+                cached = (directory, QuantizedIndex.load(directory))
+            except (OSError, ValueError, KeyError) as exc:
+                # Build removido ou corrompido: busca normal até o próximo build
+                print(f"[Quantized] Falha ao carregar {directory}: {exc!r}")
+                return None
+            _loaded[root] = cached
+    quantized = cached[1]
+
+    if quantized.manifest.get("collection") != index["collection"]:
+        return None
+    built_at = datetime.fromisoformat(quantized.manifest["built_at"])
+    age_hours = (datetime.now(timezone.utc) - built_at).total_seconds() / 3600
+    if age_hours > settings.quantized_max_age_hours:
+        return None
+    return quantized
@@ -1,9 +1,38 @@
+import time
 import uuid
-from sqlalchemy.orm import Session
+from typing import Iterator
+from sqlalchemy.orm import Session, load_only
+from app.core.config import get_settings
+from app.core.metrics import observe_batch, observe_stage, stage
 from app.models.db_models import Job, UserProfile, UserFeedback
-from app.models.schemas import RecommendedJob, RecommendResponse
-from app.services.embedder import search_similar_jobs, index_job
+from app.models.schemas import (
+    RecommendedJob, RecommendResponse, BatchRecommendError, JobSummary,
+    CandidateMatch, CandidatesResponse, KeywordSearchHit,
+)
+from app.services.embedder import (
+    search_similar_jobs, search_similar_jobs_batch, index_job, mark_job_indexed,
+    ensure_query_embeddings, count_indexed_jobs,
+    index_profiles, get_job_embedding, search_candidate_profiles, count_indexed_profiles,
+    job_to_dict, job_to_embedding_text, get_job_embeddings,
+)
+from app.services.diversity import diversify as diversify_candidates
+from app.services.index_registry import embedding_space, get_active_index
+from app.services.lexical import hybrid_search, keyword_search, profile_keyword_query
+from app.services.pagination import create_cursor, read_page
 from app.services.parser import parse_resume
+from app.services.personalization import adapted_query, apply_feedback
+from app.services.profile_cache import (
+    PROFILE_COLUMNS, cache_profile, get_profile, profile_projection, invalidate_profile,
+)
+from app.services.result_cache import get_cached_recommendations, store_recommendations
+from app.services.precompute import get_precomputed
+from app.services.reranker import rerank as rerank_candidates
+from app.services.skill_index import rerank_by_skills, skill_gaps, skill_index
+
+settings = get_settings()
+
+# view=compact carrega só as colunas do JobSummary (descrição/requisitos ficam no banco)
+COMPACT_JOB_COLUMNS = tuple(getattr(Job, name) for name in JobSummary.model_fields)
 
 
 def create_profile_from_text(
@@ -11,13 +40,14 @@ def create_profile_from_text(
     text: str,
     desired_area: str = None,
     desired_seniority: str = None,
+    session_id: str = None,
 ) -> UserProfile:
     parsed = parse_resume(
         text=text,
         desired_area=desired_area,
         desired_seniority=desired_seniority,
     )
-    return _save_profile(db, parsed)
+    return _save_profile(db, parsed, session_id)
 
 
 def create_profile_from_pdf(
@@ -25,33 +55,61 @@ def create_profile_from_pdf(
     file_bytes: bytes,
     desired_area: str = None,
     desired_seniority: str = None,
+    session_id: str = None,
 ) -> UserProfile:
     parsed = parse_resume(
         file_bytes=file_bytes,
         desired_area=desired_area,
         desired_seniority=desired_seniority,
     )
-    return _save_profile(db, parsed)
-
-
-def _save_profile(db: Session, parsed: dict) -> UserProfile:
-    profile = UserProfile(
-        session_id=str(uuid.uuid4()),
-        raw_text=parsed.get("raw_text"),
-        skills=parsed.get("skills"),
-        experiences=parsed.get("experiences"),
-        education=parsed.get("education"),
-        languages=parsed.get("languages"),
-        desired_area=parsed.get("desired_area"),
-        desired_seniority=parsed.get("desired_seniority"),
-        query_text=parsed.get("query_text"),
-    )
-    db.add(profile)
+    return _save_profile(db, parsed, session_id)
+
+
+def _save_profile(db: Session, parsed: dict, session_id: str = None) -> UserProfile:
+    """Cria um perfil novo ou, com `session_id`, regrava o currículo da sessão."""
+    if session_id:
+        profile = db.query(UserProfile).filter(UserProfile.session_id == session_id).first()
+        if profile is None:
+            raise ValueError(f"Perfil não encontrado: {session_id}")
+        # Texto novo: vetor da consulta e vetor adaptado são refeitos; as notas ficam
+        profile.query_embedding = None
+        profile.query_embedding_model = None
+        profile.adapted_embedding = None
+        profile.adapted_embedding_model = None
+        profile.feedback_sums = None
+    else:
+        profile = UserProfile(session_id=str(uuid.uuid4()))
+        db.add(profile)
+    profile.raw_text = parsed.get("raw_text")
+    profile.skills = parsed.get("skills")
+    profile.experiences = parsed.get("experiences")
+    profile.education = parsed.get("education")
+    profile.languages = parsed.get("languages")
+    profile.desired_area = parsed.get("desired_area")
+    profile.desired_seniority = parsed.get("desired_seniority")
+    profile.query_text = parsed.get("query_text")
     db.commit()
     db.refresh(profile)
+    if session_id:
+        invalidate_profile(session_id)
+    cache_profile(profile)
+    try:
+        index_profiles([profile], ensure_query_embeddings(db, [profile]))
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        # O upload não depende do índice reverso; index_profiles_task recupera depois
+        print(f"[Recommender] Falha ao indexar o perfil {profile.id}: {exc!r}")
     return profile
 
 
+def _lap(timings: dict[str, float], stage: str, started: float) -> float:
+    now = time.perf_counter()
+    timings[stage] = round(1000 * (now - started), 2)
+    observe_stage(stage, now - started)
+    return now
+
+
 def recommend_jobs(
     db: Session,
     session_id: str,
@@ -59,66 +117,358 @@ def recommend_jobs(
     filter_area: str = None,
     filter_seniority: str = None,
     filter_location: str = None,
+    filter_salary_min: float = None,
+    filter_salary_max: float = None,
+    filter_skills: list[str] = None,
+    filter_remote: bool = None,
+    filter_radius_km: float = None,
+    hybrid: bool = False,
+    skill_boost: bool = False,
+    rerank: bool = False,
+    rerank_budget_ms: float = None,
+    diversify: bool = False,
+    mmr_lambda: float = 0.7,
+    diversity_overfetch: int = 4,
+    max_per_company: int = None,
+    paginate: bool = False,
+    compact: bool = False,
 ) -> RecommendResponse:
-    profile = db.query(UserProfile).filter(
-        UserProfile.session_id == session_id
-    ).first()
+    filters = {
+        "area": filter_area,
+        "seniority": filter_seniority,
+        "location": filter_location,
+        "salary_min": filter_salary_min,
+        "salary_max": filter_salary_max,
+        "skills": sorted(filter_skills) if filter_skills else None,
+        "remote": filter_remote,
+        "radius_km": filter_radius_km,
+    }
+    cache_filters = dict(filters)
+    if hybrid:
+        cache_filters["hybrid"] = True
+    if skill_boost:
+        cache_filters["skill_boost"] = True
+    if rerank:
+        # O orçamento decide quantos pares são reordenados: entra na chave
+        cache_filters["rerank"] = rerank_budget_ms or settings.rerank_budget_ms
+    if diversify:
+        cache_filters["mmr"] = [mmr_lambda, diversity_overfetch, max_per_company]
+    if compact:
+        cache_filters["view"] = "compact"
+    started = time.perf_counter()
+    # Projeção do perfil vem da LRU local; as versões do currículo e do feedback
+    # entram na chave, então regravar o perfil ou avaliar uma vaga invalida o cache
+    profile = get_profile(db, session_id)
     if not profile:
         raise ValueError(f"Perfil não encontrado: {session_id}")
+    cache_filters["profile"] = profile.get("profile_version")
+    if profile.get("feedback_version"):
+        cache_filters["feedback"] = profile["feedback_version"]
+    # Cursor novo a cada chamada paginada: essa resposta não passa pelo cache
+    cached, cache_key = (None, None) if paginate else get_cached_recommendations(
+        session_id, n_results, cache_filters)
+    if cached is not None:
+        # Tempos da resposta original não valem para o hit
+        timings = {}
+        _lap(timings, "cache", started)
+        return cached.model_copy(update={"timings_ms": timings})
 
-    if not profile.query_text:
+    if not profile["query_text"]:
         raise ValueError("Perfil sem texto de consulta. Reenvie o currículo.")
 
-    similar = search_similar_jobs(
-        query_text=profile.query_text,
-        n_results=n_results,
-        filter_area=filter_area,
-        filter_seniority=filter_seniority,
-        filter_location=filter_location,
+    # Paginado: ranqueia uma lista funda uma vez; as próximas páginas só fatiam
+    limit = max(n_results, settings.pagination_depth) if paginate else n_results
+    # Boost e rerank reordenam um conjunto maior e cortam em `limit` depois
+    n_fetch = limit
+    if skill_boost:
+        n_fetch = max(n_fetch, min(limit * settings.skill_boost_overfetch, 100))
+    if rerank:
+        n_fetch = max(n_fetch, min(limit * settings.rerank_overfetch,
+                                   settings.rerank_max_candidates))
+    if diversify:
+        n_fetch = max(n_fetch, min(limit * diversity_overfetch,
+                                   settings.diversity_max_candidates))
+    # Vagas já avaliadas saem da lista; busca essas posições a mais
+    rated = set(profile.get("rated_job_ids") or [])
+    n_fetch += min(len(rated), settings.personalization_max_excluded)
+    adapted = adapted_query(profile)
+
+    timings: dict[str, float] = {}
+    stage_started = time.perf_counter()
+    similar = None
+    if hybrid:
+        similar = hybrid_search(
+            db, profile["query_text"], profile_keyword_query(profile), n_fetch, filters,
+            query_embedding=adapted)
+    elif not any(filters.values()):
+        # Sem filtros, a lista noturna já responde; com filtros, busca ao vivo.
+        # A lista é por versão do feedback: avaliação nova cai na busca ao vivo
+        similar = get_precomputed(session_id, n_fetch, profile.get("profile_version"),
+                                  profile.get("feedback_version"))
+    if similar is None:
+        similar = search_similar_jobs(
+            query_text=profile["query_text"],
+            n_results=n_fetch,
+            filter_area=filter_area,
+            filter_seniority=filter_seniority,
+            filter_location=filter_location,
+            filter_salary_min=filter_salary_min,
+            filter_salary_max=filter_salary_max,
+            filter_skills=filter_skills,
+            filter_remote=filter_remote,
+            filter_radius_km=filter_radius_km,
+            query_embedding=adapted,
+        )
+    if rated:
+        similar = [s for s in similar if s["job_id"] not in rated]
+    stage_started = _lap(timings, "retrieval", stage_started)
+
+    if skill_boost:
+        # No híbrido a ordem vem do RRF: o boost soma sobre ela, não sobre a similaridade densa
+        similar = rerank_by_skills(db, similar, profile["skills"], settings.skill_boost_weight,
+                                   score_key="fusion_score" if hybrid else "similarity_score")
+        stage_started = _lap(timings, "skill_boost", stage_started)
+
+    # Rerank e MMR precisam das vagas candidatas; sem eles, só a página é hidratada
+    jobs_map: dict[int, Job] = {}
+    if rerank or diversify:
+        jobs_map = _hydrate(db, [s["job_id"] for s in similar])
+        similar = [s for s in similar if s["job_id"] in jobs_map]
+        stage_started = _lap(timings, "hydrate_candidates", stage_started)
+
+    rerank_stats = None
+    if rerank:
+        texts = [job_to_embedding_text(job_to_dict(jobs_map[s["job_id"]])) for s in similar]
+        similar, rerank_stats = rerank_candidates(
+            profile["query_text"], similar, texts, rerank_budget_ms)
+        stage_started = _lap(timings, "rerank", stage_started)
+    if diversify:
+        similar = diversify_candidates(
+            similar, get_job_embeddings([s["job_id"] for s in similar]), limit, mmr_lambda,
+            companies=[jobs_map[s["job_id"]].company for s in similar],
+            max_per_company=max_per_company,
+            # Ordem já refeita por RRF/boost/rerank: MMR parte dela, não do cosseno
+            by_rank=hybrid or skill_boost or rerank,
+        )
+        stage_started = _lap(timings, "diversify", stage_started)
+    similar = similar[:limit]
+
+    next_cursor = None
+    if paginate:
+        next_cursor = create_cursor(session_id, similar, n_results)
+        similar = similar[:n_results]
+        stage_started = _lap(timings, "cursor", stage_started)
+
+    response = _build_response(db, session_id, profile, similar, jobs_map, timings,
+                               stage_started, compact=compact)
+    response.rerank = rerank_stats
+    response.next_cursor = next_cursor
+    store_recommendations(cache_key, response)
+    return response
+
+
+def recommend_page(db: Session, cursor: str, compact: bool = False) -> RecommendResponse:
+    """Página seguinte de uma recomendação paginada: fatia no Redis + hidratação."""
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+    meta, items, next_cursor = read_page(cursor)
+    stage_started = _lap(timings, "cursor", started)
+    profile = get_profile(db, meta["session_id"])
+    if not profile:
+        raise ValueError(f"Perfil não encontrado: {meta['session_id']}")
+    response = _build_response(db, meta["session_id"], profile, items, {}, timings,
+                               stage_started, first_rank=meta["offset"] + 1, compact=compact)
+    response.next_cursor = next_cursor
+    return response
+
+
+def _hydrate(db: Session, job_ids: list[int], compact: bool = False) -> dict[int, Job]:
+    if not job_ids:
+        return {}
+    query = db.query(Job)
+    if compact:
+        query = query.options(load_only(*COMPACT_JOB_COLUMNS))
+    return {job.id: job for job in query.filter(Job.id.in_(job_ids)).all()}
+
+
+def _build_response(
+    db: Session,
+    session_id: str,
+    profile: dict,
+    page: list[dict],
+    jobs_map: dict[int, Job],
+    timings: dict[str, float],
+    stage_started: float,
+    first_rank: int = 1,
+    compact: bool = False,
+) -> RecommendResponse:
+    missing_ids = [s["job_id"] for s in page if s["job_id"] not in jobs_map]
+    jobs_map = {**jobs_map, **_hydrate(db, missing_ids, compact)}
+    page = [s for s in page if s["job_id"] in jobs_map]
+    stage_started = _lap(timings, "hydrate", stage_started)
+
+    recommendations = _recommended_jobs(db, page, jobs_map, profile["skills"], first_rank, compact)
+    _lap(timings, "skill_gaps", stage_started)
+
+    return RecommendResponse(
+        session_id=session_id,
+        profile_summary=profile["summary"],
+        recommendations=recommendations,
+        total_jobs_searched=count_indexed_jobs(),
+        timings_ms=timings,
     )
 
-    job_ids = [s["job_id"] for s in similar]
-    jobs_map = {
-        job.id: job
-        for job in db.query(Job).filter(Job.id.in_(job_ids)).all()
-    }
 
+def _recommended_jobs(
+    db: Session,
+    page: list[dict],
+    jobs_map: dict[int, Job],
+    skills: list[str],
+    first_rank: int = 1,
+    compact: bool = False,
+) -> list[RecommendedJob]:
+    gaps = skill_gaps(db, [s["job_id"] for s in page], skills)
     recommendations = []
-    for rank, result in enumerate(similar, start=1):
-        job = jobs_map.get(result["job_id"])
-        if not job:
-            continue
+    for rank, result in enumerate(page, start=first_rank):
+        job = jobs_map[result["job_id"]]
+        jaccard, matched, missing = gaps.get(job.id, (None, None, None))
         recommendations.append(RecommendedJob(
-            job=job,
+            job=JobSummary.model_validate(job) if compact else job,
             similarity_score=result["similarity_score"],
             rank=rank,
+            fusion_score=result.get("fusion_score"),
+            rerank_score=result.get("rerank_score"),
+            skill_jaccard=round(jaccard, 4) if jaccard is not None else None,
+            matched_skills=matched,
+            missing_skills=missing,
         ))
+    return recommendations
 
-    profile_summary = _build_profile_summary(profile)
 
-    from app.services.embedder import get_jobs_collection
-    total = get_jobs_collection().count()
+def search_jobs_by_keyword(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    area: str = None,
+    seniority: str = None,
+) -> list[KeywordSearchHit]:
+    hits = keyword_search(db, query, limit, {"area": area, "seniority": seniority})
+    with stage("hydrate"):
+        jobs_map = {
+            job.id: job
+            for job in db.query(Job).filter(Job.id.in_([h["job_id"] for h in hits])).all()
+        }
+    return [
+        KeywordSearchHit(job=jobs_map[hit["job_id"]], score=hit["score"], rank=rank)
+        for rank, hit in enumerate((h for h in hits if h["job_id"] in jobs_map), start=1)
+    ]
 
-    return RecommendResponse(
-        session_id=session_id,
-        profile_summary=profile_summary,
-        recommendations=recommendations,
-        total_jobs_searched=total,
-    )
 
+def recommend_jobs_batch(
+    db: Session,
+    items: list[dict],
+    n_results: int = 10,
+    filter_area: str = None,
+    filter_seniority: str = None,
+    filter_location: str = None,
+) -> Iterator[RecommendResponse | BatchRecommendError]:
+    """Recomendações para várias sessões, geradas bloco a bloco na ordem dos itens.
 
-def _build_profile_summary(profile: UserProfile) -> str:
-    parts = []
-    if profile.skills:
-        top_skills = profile.skills[:8]
-        parts.append(f"Habilidades: {', '.join(top_skills)}")
-    if profile.desired_area:
-        parts.append(f"Área: {profile.desired_area}")
-    if profile.desired_seniority:
-        parts.append(f"Nível: {profile.desired_seniority}")
-    if profile.languages:
-        parts.append(f"Idiomas: {', '.join(profile.languages[:3])}")
-    return " | ".join(parts) if parts else "Perfil genérico"
+    Ranking igual ao do /recommend sem estágios opcionais (vetor adaptado pelo
+    feedback, vagas avaliadas fora, busca filtrada pelo planner); o lote não
+    consulta o cache de respostas nem a lista pré-computada.
+    """
+    observe_batch("recommend", len(items))
+    shared = {"area": filter_area, "seniority": filter_seniority, "location": filter_location}
+    chunk = settings.batch_recommend_chunk_size
+    for start in range(0, len(items), chunk):
+        yield from _recommend_chunk(db, items[start:start + chunk], n_results, shared)
+
+
+def _recommend_chunk(
+    db: Session,
+    items: list[dict],
+    n_results: int,
+    shared: dict,
+) -> list[RecommendResponse | BatchRecommendError]:
+    session_ids = [item["session_id"] for item in items]
+    with stage("profiles"):
+        rows = (
+            db.query(UserProfile)
+            .options(load_only(
+                UserProfile.id, UserProfile.session_id, UserProfile.query_text,
+                UserProfile.desired_area, UserProfile.desired_seniority,
+                UserProfile.skills, UserProfile.languages,
+                UserProfile.query_embedding, UserProfile.query_embedding_model,
+                UserProfile.adapted_embedding, UserProfile.adapted_embedding_model,
+                UserProfile.feedback_ratings,
+            ))
+            .filter(UserProfile.session_id.in_(session_ids))
+            .all()
+        )
+    vectors = ensure_query_embeddings(db, rows)
+    # Mesma projeção do /recommend: resumo, vetor adaptado e vagas avaliadas
+    profiles = {row.session_id: (profile_projection(row), vectors.get(row.id)) for row in rows}
+    db.commit()  # persiste os vetores calculados por ensure_query_embeddings
+
+    # Uma consulta multi-vetor por combinação de filtros
+    groups: dict[tuple, list[int]] = {}
+    for i, item in enumerate(items):
+        profile, vector = profiles.get(item["session_id"], (None, None))
+        if profile is None or vector is None:
+            continue
+        key = tuple(item.get(f"filter_{name}") or shared[name] for name in shared)
+        groups.setdefault(key, []).append(i)
+
+    similar_by_item: dict[int, list[dict]] = {}
+    errors: dict[int, str] = {}
+    for (area, seniority, location), indexes in groups.items():
+        queries, excluded = [], 0
+        for i in indexes:
+            profile, vector = profiles[items[i]["session_id"]]
+            queries.append(adapted_query(profile) or vector)
+            excluded = max(excluded, min(len(profile["rated_job_ids"]),
+                                         settings.personalization_max_excluded))
+        try:
+            results = search_similar_jobs_batch(
+                queries,
+                n_results=n_results + excluded,
+                filter_area=area,
+                filter_seniority=seniority,
+                filter_location=location,
+            )
+        except ValueError as exc:
+            errors.update((i, str(exc)) for i in indexes)
+            continue
+        for i, similar in zip(indexes, results):
+            rated = set(profiles[items[i]["session_id"]][0]["rated_job_ids"])
+            similar_by_item[i] = [s for s in similar if s["job_id"] not in rated][:n_results]
+
+    job_ids = [s["job_id"] for similar in similar_by_item.values() for s in similar]
+    with stage("hydrate"):
+        jobs_map = _hydrate(db, list(set(job_ids)))
+    total = count_indexed_jobs()
+
+    responses = []
+    for i, item in enumerate(items):
+        profile, _ = profiles.get(item["session_id"], (None, None))
+        if profile is None:
+            responses.append(BatchRecommendError(
+                session_id=item["session_id"], error="Perfil não encontrado"))
+            continue
+        if i not in similar_by_item:
+            responses.append(BatchRecommendError(
+                session_id=item["session_id"],
+                error=errors.get(i, "Perfil sem texto de consulta")))
+            continue
+        page = [s for s in similar_by_item[i] if s["job_id"] in jobs_map]
+        responses.append(RecommendResponse(
+            session_id=profile["session_id"],
+            profile_summary=profile["summary"],
+            recommendations=_recommended_jobs(db, page, jobs_map, profile["skills"]),
+            total_jobs_searched=total,
+        ))
+    return responses
 
 
 def save_feedback(
@@ -129,22 +479,23 @@ def save_feedback(
     rank_position: int = None,
     similarity_score: float = None,
 ) -> UserFeedback:
-    profile = db.query(UserProfile).filter(
-        UserProfile.session_id == session_id
-    ).first()
+    profile = get_profile(db, session_id)
     if not profile:
         raise ValueError("Perfil não encontrado.")
 
     feedback = UserFeedback(
-        profile_id=profile.id,
+        profile_id=profile["id"],
         job_id=job_id,
         rating=rating,
         rank_position=rank_position,
         similarity_score=similarity_score,
+        embedding_model=embedding_space(get_active_index()),
     )
     db.add(feedback)
+    apply_feedback(db, profile["id"], [(job_id, rating)])
     db.commit()
     db.refresh(feedback)
+    invalidate_profile(session_id)
     return feedback
 
 
@@ -155,32 +506,83 @@ def add_job(db: Session, job_data: dict) -> Job:
     db.commit()
     db.refresh(job)
 
-    embedding_id = index_job(job.id, {
-        "title": job.title,
-        "company": job.company,
-        "area": job.area,
-        "seniority": job.seniority,
-        "skills": job.skills,
-        "requirements": job.requirements,
-        "description": job.description,
-    })
-    job.embedding_id = embedding_id
+    job_for_embedding = job_to_dict(job)
+    embedding_id = index_job(job.id, job_for_embedding)
+    mark_job_indexed(job, job_for_embedding, embedding_id)
     db.commit()
+    # Visível já neste processo; os demais pegam no próximo refresh por watermark
+    skill_index.upsert(job.id, job.skills)
+    if settings.candidate_matching_enabled:
+        from app.services.tasks import match_candidates_task
+        try:
+            match_candidates_task.delay(job.id)
+        except Exception as exc:
+            print(f"[Recommender] Falha ao agendar matching da vaga {job.id}: {exc!r}")
     return job
 
 
+def find_candidates(
+    db: Session,
+    job_id: int,
+    n_results: int = 10,
+    match_preferences: bool = True,
+) -> CandidatesResponse:
+    job = (
+        db.query(Job)
+        .options(load_only(
+            Job.id, Job.title, Job.company, Job.location, Job.area, Job.seniority,
+            Job.skills, Job.requirements, Job.description, Job.salary_min, Job.salary_max,
+        ))
+        .filter(Job.id == job_id)
+        .first()
+    )
+    if not job:
+        raise ValueError(f"Vaga não encontrada: {job_id}")
+
+    job_embedding = get_job_embedding(job.id, job_to_dict(job))
+    # Pré-filtro pelas preferências declaradas do candidato (área/nível da vaga)
+    matches = search_candidate_profiles(
+        job_embedding,
+        n_results=n_results,
+        filter_area=job.area if match_preferences else None,
+        filter_seniority=job.seniority if match_preferences else None,
+    )
+
+    profile_ids = [m["profile_id"] for m in matches]
+    profiles = {
+        row.id: row
+        for row in db.query(*PROFILE_COLUMNS).filter(UserProfile.id.in_(profile_ids)).all()
+    } if profile_ids else {}
+
+    candidates = []
+    for match in matches:
+        row = profiles.get(match["profile_id"])
+        if row is None:
+            continue
+        candidates.append(CandidateMatch(
+            session_id=row.session_id,
+            profile_summary=profile_projection(row)["summary"],
+            similarity_score=match["similarity_score"],
+            rank=len(candidates) + 1,
+        ))
+
+    return CandidatesResponse(
+        job_id=job.id,
+        candidates=candidates,
+        total_profiles_searched=count_indexed_profiles(),
+    )
+
+
 def calculate_precision_at_k(db: Session, session_id: str, k: int = 10) -> float:
 
-    profile = db.query(UserProfile).filter(
-        UserProfile.session_id == session_id
-    ).first()
+    profile = get_profile(db, session_id)
     if not profile:
         return 0.0
 
     feedbacks = (
         db.query(UserFeedback)
         .filter(
-            UserFeedback.profile_id == profile.id,
+            UserFeedback.profile_id == profile["id"],
             UserFeedback.rank_position <= k,
         )
         .all()
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+
+import redis
+
+from app.core.config import get_settings
+from app.core.metrics import observe_batch, record_cache
+from app.core.redis_client import get_redis
+
+settings = get_settings()
+
+_model = None
+_model_lock = threading.Lock()
+# Média móvel do custo por par (ms): decide quantos pares cabem no orçamento
+_ms_per_pair = settings.rerank_initial_ms_per_pair
+
+
+def get_cross_encoder():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import CrossEncoder
+            print(f"[Reranker] Carregando cross-encoder: {settings.rerank_model}")
+            _model = CrossEncoder(settings.rerank_model, max_length=settings.rerank_max_length)
+    return _model
+
+
+def warm_cross_encoder() -> None:
+    # Um predict descartado: pesos carregados e kernels inicializados antes do 1º request
+    get_cross_encoder().predict([("aquecimento", "aquecimento")])
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _pair_key(query_hash: str, text_hash: str) -> str:
+    return f"rerank:{_digest(settings.rerank_model)}:{query_hash}:{text_hash}"
+
+
+def _cached_scores(keys: list[str]) -> list[float | None]:
+    try:
+        values = get_redis().mget(keys)
+    except redis.RedisError as exc:
+        print(f"[Reranker] Cache indisponível: {exc!r}")
+        return [None] * len(keys)
+    return [float(v) if v is not None else None for v in values]
+
+
+def _store_scores(items: dict[str, float]) -> None:
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key, score in items.items():
+            pipe.set(key, score, ex=settings.rerank_cache_ttl_seconds)
+        pipe.execute()
+    except redis.RedisError as exc:
+        print(f"[Reranker] Falha ao gravar scores: {exc!r}")
+
+
+def rerank(query_text: str, candidates: list[dict], texts: list[str],
+           budget_ms: float | None = None) -> tuple[list[dict], dict]:
+    """Reordena `candidates` (ordem do bi-encoder) pelo cross-encoder dentro do orçamento.
+
+    Pares já vistos saem do cache (hash do perfil x hash do texto da vaga); os
+    demais são pontuados num único batch, limitado ao que cabe no tempo restante.
+    Só o maior prefixo totalmente pontuado é reordenado; o resto mantém a ordem
+    original.
+    """
+    global _ms_per_pair
+    started = time.perf_counter()
+    budget_ms = budget_ms or settings.rerank_budget_ms
+    query_hash = _digest(query_text)
+    keys = [_pair_key(query_hash, _digest(text)) for text in texts]
+    scores = _cached_scores(keys)
+    n_cached = sum(score is not None for score in scores)
+    record_cache("rerank", "hit", n_cached)
+    record_cache("rerank", "miss", len(scores) - n_cached)
+
+    pending = [i for i, score in enumerate(scores) if score is None]
+    model = get_cross_encoder() if pending else None
+    remaining = budget_ms - 1000 * (time.perf_counter() - started)
+    n_pairs = min(len(pending), max(int(remaining / _ms_per_pair), 0))
+    if n_pairs:
+        batch = pending[:n_pairs]
+        scored_at = time.perf_counter()
+        observe_batch("rerank", len(batch))
+        predicted = model.predict([(query_text, texts[i]) for i in batch],
+                                  batch_size=len(batch), show_progress_bar=False)
+        elapsed = 1000 * (time.perf_counter() - scored_at)
+        _ms_per_pair = 0.8 * _ms_per_pair + 0.2 * (elapsed / len(batch))
+        fresh = {}
+        for i, score in zip(batch, predicted):
+            scores[i] = float(score)
+            fresh[keys[i]] = scores[i]
+        _store_scores(fresh)
+
+    prefix = 0
+    while prefix < len(scores) and scores[prefix] is not None:
+        prefix += 1
+    head = sorted(
+        ({**candidates[i], "rerank_score": round(scores[i], 4)} for i in range(prefix)),
+        key=lambda c: -c["rerank_score"],
+    )
+    stats = {
+        "candidates": len(candidates),
+        "reranked": prefix,
+        "cached": n_cached,
+        "scored": n_pairs,
+        "budget_exhausted": prefix < len(candidates),
+    }
+    return head + candidates[prefix:], stats
@@ -0,0 +1,94 @@
+import hashlib
+import json
+
+import redis
+
+from app.core.config import get_settings
+from app.core.metrics import record_cache
+from app.core.redis_client import get_redis
+from app.models.schemas import RecommendResponse
+from app.services.index_registry import embedding_space, get_active_index
+
+settings = get_settings()
+
+# Contador global do índice: todo upsert incrementa e as entradas antigas
+# deixam de ser endereçadas (expiram sozinhas pelo TTL).
+INDEX_VERSION_KEY = "jobs:index_version"
+STATS_KEY = "reco_cache:stats"
+
+
+def get_index_version() -> int:
+    value = get_redis().get(INDEX_VERSION_KEY)
+    return int(value) if value else 0
+
+
+def bump_index_version() -> None:
+    try:
+        get_redis().incr(INDEX_VERSION_KEY)
+    except redis.RedisError as exc:
+        print(f"[Cache] Falha ao incrementar versão do índice: {exc!r}")
+
+
+def _cache_key(version: int, session_id: str, n_results: int, filters: dict) -> str:
+    # Coleção + espaço no digest: um worker com o alias antigo ainda em cache
+    # grava sob outra chave e não contamina as respostas do modelo novo
+    active = get_active_index()
+    params = json.dumps({"n": n_results, "index": [active["collection"], embedding_space(active)],
+                         **filters}, sort_keys=True)
+    digest = hashlib.sha1(params.encode("utf-8")).hexdigest()[:16]
+    return f"reco:{version}:{session_id}:{digest}"
+
+
+def _record(field: str) -> None:
+    record_cache("recommendations", field)
+    get_redis().hincrby(STATS_KEY, field, 1)
+
+
+def get_cached_recommendations(
+    session_id: str, n_results: int, filters: dict,
+) -> tuple[RecommendResponse | None, str | None]:
+    """Retorna (resposta em cache ou None, chave para gravar em caso de miss)."""
+    if not settings.reco_cache_enabled:
+        return None, None
+    try:
+        key = _cache_key(get_index_version(), session_id, n_results, filters)
+        payload = get_redis().get(key)
+        _record("hits" if payload else "misses")
+    except redis.RedisError as exc:
+        print(f"[Cache] Redis indisponível: {exc!r}")
+        return None, None
+    if payload is None:
+        return None, key
+    return RecommendResponse.model_validate_json(payload), key
+
+
+def store_recommendations(key: str | None, response: RecommendResponse) -> None:
+    if key is None:
+        return
+    payload = response.model_dump_json()
+    try:
+        if len(payload) > settings.reco_cache_max_entry_bytes:
+            _record("skipped_too_large")
+            return
+        get_redis().set(key, payload, ex=settings.reco_cache_ttl_seconds)
+    except redis.RedisError as exc:
+        print(f"[Cache] Falha ao gravar recomendação: {exc!r}")
+
+
+def cache_stats() -> dict:
+    try:
+        raw = {k.decode(): int(v) for k, v in get_redis().hgetall(STATS_KEY).items()}
+        index_version = get_index_version()
+    except redis.RedisError as exc:
+        print(f"[Cache] Redis indisponível: {exc!r}")
+        return {"available": False}
+    hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+    lookups = hits + misses
+    return {
+        "available": True,
+        "hits": hits,
+        "misses": misses,
+        "skipped_too_large": raw.get("skipped_too_large", 0),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "index_version": index_version,
+    }
@@ -0,0 +1,154 @@
+import heapq
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from app.core.chroma import chroma_manager
+from app.core.config import get_settings
+from app.services.index_registry import collection_metadata, get_active_index
+from app.services.result_cache import bump_index_version
+
+settings = get_settings()
+
+OTHER_SHARD = "outros"
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def sharding_enabled() -> bool:
+    return settings.shard_mode in ("area", "hash")
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def shard_key(area: str | None, job_id: int | str) -> str:
+    """Shard de uma vaga: pela área configurada ou por hash do job_id."""
+    if settings.shard_mode == "hash":
+        return f"h{int(job_id) % settings.shard_count}"
+    area = _slug(area or "")
+    return area if area in {_slug(a) for a in settings.shard_areas} else OTHER_SHARD
+
+
+def shard_keys() -> list[str]:
+    if settings.shard_mode == "hash":
+        return [f"h{i}" for i in range(settings.shard_count)]
+    return sorted({_slug(a) for a in settings.shard_areas} | {OTHER_SHARD})
+
+
+def shard_index(index: dict, key: str) -> dict:
+    # Sufixo preservado dentro do limite de 63 chars do Chroma; a base vai no
+    # metadado da coleção (shard_of), já que o nome pode ter sido truncado
+    suffix = f"__s-{key}"
+    return {**index, "collection": index["collection"][:63 - len(suffix)] + suffix,
+            "shard_of": index["collection"]}
+
+
+def all_shards(index: dict) -> list[dict]:
+    """Coleções físicas por trás de um índice lógico (a própria, sem sharding)."""
+    if not sharding_enabled():
+        return [index]
+    return [shard_index(index, key) for key in shard_keys()]
+
+
+def shards_for_area(index: dict, area: str | None) -> list[dict]:
+    # Com shard por área, um filtro de área vai direto a uma única coleção
+    if not sharding_enabled():
+        return [index]
+    if area and settings.shard_mode == "area":
+        return [shard_index(index, shard_key(area, 0))]
+    return all_shards(index)
+
+
+def fan_out(fn, shards: list[dict]) -> list:
+    """Executa `fn(shard)` em paralelo (pool compartilhado); ordem preservada."""
+    global _executor
+    if len(shards) == 1:
+        return [fn(shards[0])]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.shard_fanout_workers, thread_name_prefix="shard")
+    return list(_executor.map(fn, shards))
+
+
+def merge_topk(per_shard: list[list[tuple]], k: int) -> list[tuple]:
+    """Junta listas já ordenadas por distância (tuplas (distância, ...)) e corta em k."""
+    return list(islice(heapq.merge(*per_shard, key=lambda item: item[0]), k))
+
+
+def _is_layout_of(name: str, base: str, known: set[str]) -> bool:
+    """A própria coleção base, um shard do layout atual ou um shard antigo dela."""
+    if name == base or name in known:
+        return True
+    prefix, sep, _ = name.partition("__s-")
+    if not (sep and prefix and base.startswith(prefix)):
+        return False
+    # Só o prefixo não basta (jobs__a é prefixo de jobs__ab): confirma pelo metadado
+    metadata = chroma_manager.client().get_collection(name).metadata or {}
+    return metadata.get("shard_of") == base
+
+
+def rebalance_shards(index: dict | None = None, batch_size: int = 1000,
+                     dry_run: bool = False) -> dict[str, int]:
+    """Move vetores (sem re-embedar) do layout atual para o configurado em Settings.
+
+    Percorre a coleção base e todos os shards existentes; cada registro fora do
+    shard correto é copiado para o destino e removido da origem. Coleções que
+    deixam de fazer parte do layout são apagadas ao final.
+    """
+    index = index or get_active_index()
+    metadata = collection_metadata(index)
+    targets = {shard["collection"] for shard in all_shards(index)}
+    known = targets | {shard_index(index, key)["collection"] for key in shard_keys()}
+    # chromadb 0.5 devolve objetos Collection; versões novas, só os nomes
+    names = [getattr(c, "name", c) for c in chroma_manager.client().list_collections()]
+    sources = sorted(name for name in names if _is_layout_of(name, index["collection"], known))
+
+    moved: dict[str, int] = {}
+    for source in sources:
+        offset = 0
+        while True:
+            page = chroma_manager.run(source, metadata, lambda c: c.get(
+                offset=offset, limit=batch_size,
+                include=["embeddings", "metadatas", "documents"],
+            ))
+            if not page["ids"]:
+                break
+            groups: dict[str, list[int]] = {}
+            for i, meta in enumerate(page["metadatas"]):
+                key = shard_key(meta.get("area"), meta["job_id"]) if sharding_enabled() else None
+                target = shard_index(index, key)["collection"] if key else index["collection"]
+                if target != source:
+                    groups.setdefault(target, []).append(i)
+
+            moving = [i for rows in groups.values() for i in rows]
+            for target, rows in groups.items():
+                moved[target] = moved.get(target, 0) + len(rows)
+                if dry_run:
+                    continue
+                target_metadata = metadata if target == index["collection"] else {
+                    **metadata, "shard_of": index["collection"]}
+                chroma_manager.run(target, target_metadata, lambda c: c.upsert(
+                    ids=[page["ids"][i] for i in rows],
+                    embeddings=[page["embeddings"][i] for i in rows],
+                    metadatas=[page["metadatas"][i] for i in rows],
+                    documents=[page["documents"][i] for i in rows],
+                ))
+            if moving and not dry_run:
+                chroma_manager.run(source, metadata, lambda c: c.delete(
+                    ids=[page["ids"][i] for i in moving]))
+                offset += len(page["ids"]) - len(moving)
+            else:
+                offset += len(page["ids"])
+        print(f"[Shards] {source} verificada")
+
+        if source not in targets and not dry_run:
+            chroma_manager.client().delete_collection(source)
+            chroma_manager.forget(source)
+            print(f"[Shards] {source} removida (fora do layout)")
+
+    if not dry_run:
+        chroma_manager.invalidate_count()
+        bump_index_version()
+    return moved
@@ -0,0 +1,174 @@
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.db_models import Job
+from app.utils.skills import TECH_SKILLS
+
+settings = get_settings()
+
+# Bit i = TECH_SKILLS[i]; habilidades fora do vocabulário são ignoradas
+_BIT = {skill.lower(): i for i, skill in enumerate(TECH_SKILLS)}
+WORDS = (len(TECH_SKILLS) + 63) // 64
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_BIT_WEIGHTS = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+
+def encode_skills(skills: list[str] | None) -> np.ndarray:
+    words = np.zeros(WORDS, dtype=np.uint64)
+    for skill in skills or []:
+        bit = _BIT.get(skill.strip().lower()) if isinstance(skill, str) else None
+        if bit is not None:
+            words[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+    return words
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Bits ligados por linha (numpy 1.26 não tem bitwise_count)."""
+    bytes_ = np.ascontiguousarray(words).view(np.uint8).reshape(len(words), WORDS * 8)
+    return _POPCOUNT8[bytes_].sum(axis=1, dtype=np.int32)
+
+
+def decode_rows(words: np.ndarray) -> list[list[str]]:
+    # (n, WORDS) -> matriz booleana (n, WORDS*64) de uma vez; só a montagem final é por linha
+    bits = (words[:, :, None] & _BIT_WEIGHTS) != 0
+    bits = bits.reshape(len(words), -1)[:, :len(TECH_SKILLS)]
+    rows, cols = np.nonzero(bits)
+    decoded: list[list[str]] = [[] for _ in range(len(words))]
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        decoded[row].append(TECH_SKILLS[col])
+    return decoded
+
+
+class SkillBitsetIndex:
+    """Bitsets de habilidades por vaga (uint64[WORDS]) em memória, atualizados por watermark."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.words = np.zeros((0, WORDS), dtype=np.uint64)
+        self.job_ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._row_of: dict[int, int] = {}
+        self._sorted: tuple[np.ndarray, np.ndarray] | None = None
+        self._max_id = 0
+        self._watermark: datetime | None = None
+        self._checked_at = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def upsert(self, job_id: int, skills: list[str] | None) -> None:
+        with self._lock:
+            self._upsert_locked(job_id, encode_skills(skills))
+
+    def _upsert_locked(self, job_id: int, encoded: np.ndarray) -> None:
+        row = self._row_of.get(job_id)
+        if row is None:
+            if self._size == len(self.words):
+                capacity = max(1024, 2 * len(self.words))
+                words = np.zeros((capacity, WORDS), dtype=np.uint64)
+                words[:self._size] = self.words[:self._size]
+                job_ids = np.zeros(capacity, dtype=np.int64)
+                job_ids[:self._size] = self.job_ids[:self._size]
+                self.words, self.job_ids = words, job_ids
+            row = self._size
+            self._size += 1
+            self._row_of[job_id] = row
+            self.job_ids[row] = job_id
+            self._sorted = None
+        self.words[row] = encoded
+        self._max_id = max(self._max_id, job_id)
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Carrega vagas novas (id > máximo visto) ou alteradas (updated_at > watermark)."""
+        if not force and time.monotonic() - self._checked_at < settings.skill_index_refresh_seconds:
+            return 0
+        self._checked_at = time.monotonic()
+        query = db.query(Job.id, Job.skills, Job.updated_at)
+        if self._size:
+            changed = [Job.id > self._max_id]
+            if self._watermark is not None:
+                # >= : commits com o mesmo timestamp do watermark não se perdem
+                changed.append(Job.updated_at >= self._watermark)
+            query = query.filter(or_(*changed))
+        # Codifica fora do lock; o lock só cobre a escrita nas matrizes
+        rows = [(job_id, encode_skills(skills), updated_at)
+                for job_id, skills, updated_at in query.yield_per(5000)]
+        with self._lock:
+            for job_id, encoded, updated_at in rows:
+                self._upsert_locked(job_id, encoded)
+                if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+        if rows:
+            print(f"[SkillIndex] {len(rows)} vagas atualizadas ({self._size} no índice)")
+        return len(rows)
+
+    def _rows(self, job_ids: list[int]) -> np.ndarray:
+        # Busca vetorizada id -> linha (-1 se a vaga não está no índice)
+        if self._sorted is None:
+            order = np.argsort(self.job_ids[:self._size], kind="stable")
+            self._sorted = (self.job_ids[:self._size][order], order)
+        sorted_ids, order = self._sorted
+        ids = np.asarray(job_ids, dtype=np.int64)
+        if not len(sorted_ids):
+            return np.full(len(ids), -1)
+        pos = np.clip(np.searchsorted(sorted_ids, ids), 0, len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == ids, order[pos], -1)
+
+    def score(self, job_ids: list[int], profile_skills: list[str] | None) -> dict:
+        """Sobreposição, Jaccard e máscaras de habilidades para todas as vagas candidatas."""
+        query = encode_skills(profile_skills)
+        with self._lock:
+            rows = self._rows(job_ids)
+            jobs = np.where((rows >= 0)[:, None], self.words[np.maximum(rows, 0)], np.uint64(0))
+        matched = jobs & query
+        union = popcount(jobs | query)
+        overlap = popcount(matched)
+        return {
+            "indexed": rows >= 0,
+            "overlap": overlap,
+            "jaccard": np.divide(overlap, union, out=np.zeros(len(rows)), where=union > 0),
+            "matched": matched,
+            "missing": jobs & ~query,  # exigidas pela vaga e ausentes no perfil
+        }
+
+
+skill_index = SkillBitsetIndex()
+
+
+def get_skill_index(db: Session) -> SkillBitsetIndex:
+    skill_index.refresh(db)
+    return skill_index
+
+
+def rerank_by_skills(db: Session, similar: list[dict], profile_skills: list[str] | None,
+                     weight: float, score_key: str = "similarity_score") -> list[dict]:
+    """Reordena por score + weight * Jaccard (todas as candidatas de uma vez).
+
+    Com `score_key="fusion_score"` (híbrido), o RRF é dividido pelo maior score
+    da lista: fica em [0, 1], na mesma escala do Jaccard.
+    """
+    if not similar:
+        return similar
+    jaccard = get_skill_index(db).score([s["job_id"] for s in similar], profile_skills)["jaccard"]
+    scores = np.array([s.get(score_key) or 0.0 for s in similar])
+    if score_key == "fusion_score" and scores.max() > 0:
+        scores = scores / scores.max()
+    boosted = scores + weight * jaccard
+    order = np.argsort(-boosted, kind="stable")
+    return [similar[i] for i in order]
+
+
+def skill_gaps(db: Session, job_ids: list[int], profile_skills: list[str] | None) -> dict:
+    """{job_id: (jaccard, matched_skills, missing_skills)} para as vagas do índice."""
+    scores = get_skill_index(db).score(job_ids, profile_skills)
+    matched, missing = decode_rows(scores["matched"]), decode_rows(scores["missing"])
+    return {
+        job_id: (float(scores["jaccard"][i]), matched[i], missing[i])
+        for i, job_id in enumerate(job_ids) if scores["indexed"][i]
+    }
@@ -0,0 +1,200 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.core.chroma import chroma_manager
+from app.services.embedder import _group_by_shard, get_chroma_client, get_jobs_collection
+from app.services.index_registry import embedding_space, get_active_index
+from app.services.result_cache import bump_index_version
+from app.services.sharding import all_shards, shard_index, sharding_enabled
+
+# Layout de um snapshot (diretório):
+#   manifest.json    -> modelo, dimensão, dtype, total de vetores, coleção (e shards) de origem
+#   embeddings.npy   -> matriz (n, dim) em float16/float32, lida via memmap no import
+#   records.parquet  -> ids, metadados (JSON) e documentos, na mesma ordem da matriz
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.parquet"
+SNAPSHOT_VERSION = 1
+
+
+def export_snapshot(
+    output_dir: str,
+    collection_name: str | None = None,
+    dtype: str = "float16",
+    batch_size: int = 5000,
+) -> dict:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if dtype not in ("float16", "float32"):
+        raise ValueError("dtype deve ser 'float16' ou 'float32'.")
+
+    active = get_active_index()
+    # Índice lógico: com sharding, o snapshot junta todos os shards num arquivo só
+    index = {**active, "collection": collection_name or active["collection"]}
+    shards = [shard["collection"] for shard in all_shards(index)]
+    collections = [get_jobs_collection(name) for name in shards]
+    counts = [collection.count() for collection in collections]
+    total = sum(counts)
+    os.makedirs(output_dir, exist_ok=True)
+
+    matrix = None
+    writer = None
+    written = 0
+    try:
+        for collection, count in zip(collections, counts):
+            for offset in range(0, count, batch_size):
+                # Limite pela contagem inicial: vetores gravados durante o export não estouram a matriz
+                page = collection.get(
+                    offset=offset,
+                    limit=min(batch_size, count - offset),
+                    include=["embeddings", "metadatas", "documents"],
+                )
+                if not page["ids"]:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(
+                        os.path.join(output_dir, EMBEDDINGS_FILE),
+                        mode="w+", dtype=dtype, shape=(total, vectors.shape[1]),
+                    )
+                matrix[written:written + len(vectors)] = vectors.astype(dtype)
+
+                records = pa.table({
+                    "id": page["ids"],
+                    "metadata": [json.dumps(m or {}, ensure_ascii=False)
+                                 for m in page["metadatas"]],
+                    "document": page["documents"] or [None] * len(page["ids"]),
+                })
+                if writer is None:
+                    writer = pq.ParquetWriter(os.path.join(output_dir, RECORDS_FILE),
+                                              records.schema)
+                writer.write_table(records)
+
+                written += len(vectors)
+                print(f"[Snapshot] Exportados {written}/{total} vetores")
+    finally:
+        if writer is not None:
+            writer.close()
+        if matrix is not None:
+            matrix.flush()
+
+    # shard_of é do layout de origem; o import grava o do destino
+    source_metadata = {k: v for k, v in (collections[0].metadata or {}).items() if k != "shard_of"}
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "collection": index["collection"],
+        "shards": shards,
+        "collection_metadata": source_metadata,
+        "embedding_model": source_metadata.get("embedding_model", embedding_space(active)),
+        "dimension": int(matrix.shape[1]) if matrix is not None else 0,
+        "dtype": dtype,
+        "count": written,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def read_manifest(snapshot_dir: str) -> dict:
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _drop_collection(collection_name: str) -> None:
+    try:
+        get_chroma_client().delete_collection(collection_name)
+    except Exception as exc:
+        # O Chroma só sinaliza coleção inexistente pela mensagem; o resto sobe
+        if "does not exist" not in str(exc):
+            raise
+    chroma_manager.forget(collection_name)
+
+
+def import_snapshot(
+    snapshot_dir: str,
+    collection_name: str | None = None,
+    collection_metadata: dict | None = None,
+    batch_size: int = 5000,
+    recreate: bool = False,
+    allow_model_mismatch: bool = False,
+) -> int:
+    import pyarrow.parquet as pq
+
+    manifest = read_manifest(snapshot_dir)
+    active = get_active_index()
+    if recreate:
+        # Apagar exige alvo explícito, e nunca a coleção servida pelo alias
+        if not collection_name:
+            raise ValueError("--recreate exige uma coleção de destino explícita.")
+        active_names = {active["collection"]} | {s["collection"] for s in all_shards(active)}
+        if collection_name in active_names:
+            raise ValueError(
+                f"'{collection_name}' é a coleção ativa; importe em outra e use o alias.")
+    collection_name = collection_name or active["collection"]
+    if (collection_name == active["collection"]
+            and manifest["embedding_model"] != embedding_space(active)
+            and not allow_model_mismatch):
+        raise ValueError(
+            f"Snapshot gerado com '{manifest['embedding_model']}', mas a coleção "
+            f"ativa usa '{embedding_space(active)}'."
+        )
+    if manifest["count"] == 0:
+        return 0
+
+    # Destino no layout configurado: com sharding, cada vetor vai para o seu shard
+    index = {**active, "collection": collection_name}
+    targets = all_shards(index)
+    if recreate:
+        for target in targets:
+            _drop_collection(target["collection"])
+    # Parâmetros HNSW passados aqui sobrescrevem os da coleção de origem
+    metadata = {**(manifest.get("collection_metadata") or {"hnsw:space": "cosine"}),
+                **(collection_metadata or {})}
+    collections = {}
+
+    def target_collection(key: str | None):
+        if key not in collections:
+            if key is None:
+                collections[key] = get_jobs_collection(collection_name, metadata=metadata)
+            else:
+                collections[key] = get_jobs_collection(
+                    shard_index(index, key)["collection"],
+                    metadata={**metadata, "shard_of": collection_name})
+        return collections[key]
+
+    matrix = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    records = pq.ParquetFile(os.path.join(snapshot_dir, RECORDS_FILE))
+
+    imported = 0
+    for batch in records.iter_batches(batch_size=batch_size):
+        rows = batch.to_pydict()
+        n = len(rows["id"])
+        vectors = np.asarray(matrix[imported:imported + n], dtype=np.float32)
+        documents = rows["document"]
+        upsert_kwargs = {
+            "ids": rows["id"],
+            "embeddings": vectors.tolist(),
+            "metadatas": [json.loads(m) for m in rows["metadata"]],
+        }
+        if any(d is not None for d in documents):
+            upsert_kwargs["documents"] = [d or "" for d in documents]
+        groups = (_group_by_shard(upsert_kwargs["metadatas"]) if sharding_enabled()
+                  else {None: list(range(n))})
+        for key, positions in groups.items():
+            part = {name: [values[i] for i in positions] for name, values in upsert_kwargs.items()}
+            target_collection(key).upsert(**part)
+
+        imported += n
+        print(f"[Snapshot] Importados {imported}/{manifest['count']} vetores")
+
+    for target in targets:
+        chroma_manager.invalidate_count(target["collection"])
+    # Respostas em cache podem ter vindo do conteúdo anterior da coleção
+    bump_index_version()
+    return imported
@@ -1,37 +1,64 @@
+import socket
+import time
+from datetime import datetime
+
+from celery.signals import task_postrun, task_prerun
+from sqlalchemy import func, or_
+
 from app.core.celery_app import celery_app
+from app.core.config import get_settings
 from app.core.database import SessionLocal
-from app.models.db_models import Job
-from app.services.embedder import index_jobs_batch
+from app.core.metrics import observe_batch, observe_stage, stage
+from app.models.db_models import Job, IndexState
+from app.services.embedder import (
+    index_jobs_batch, embedding_text_hash, get_model, job_to_dict, mark_job_indexed,
+    update_job_metadata,
+)
+from app.services.index_registry import (
+    embedding_space, has_current_metadata, mark_metadata_current,
+    get_active_index, make_index, set_shadow_index, activate_index,
+)
+
+settings = get_settings()
+
+REINDEX_WATERMARK_KEY = "jobs_reindex_watermark"
+
+# Duração de cada execução de task (por nome), em reco_stage_seconds{stage="task:..."}
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _stop_task_timer(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        observe_stage(f"task:{task.name.rsplit('.', 1)[-1]}", time.perf_counter() - started)
 
 
 @celery_app.task(bind=True, max_retries=3)
 def index_all_jobs_task(self, batch_size: int = 100):
     db = SessionLocal()
     try:
-        jobs = db.query(Job).filter(Job.embedding_id.is_(None)).all()
+        with stage("db"):
+            jobs = db.query(Job).filter(Job.embedding_id.is_(None)).all()
         total = len(jobs)
         print(f"[Task] Indexando {total} vagas...")
 
         for i in range(0, total, batch_size):
             batch = jobs[i:i + batch_size]
-            jobs_data = [
-                (job.id, {
-                    "title": job.title,
-                    "company": job.company,
-                    "area": job.area,
-                    "seniority": job.seniority,
-                    "skills": job.skills,
-                    "requirements": job.requirements,
-                    "description": job.description,
-                })
-                for job in batch
-            ]
+            observe_batch("index", len(batch))
+            jobs_data = [(job.id, job_to_dict(job)) for job in batch]
             embedding_ids = index_jobs_batch(jobs_data)
 
             # Atualiza embedding_id no banco
-            for job, embedding_id in zip(batch, embedding_ids):
-                job.embedding_id = embedding_id
-            db.commit()
+            for job, (_, job_data), embedding_id in zip(batch, jobs_data, embedding_ids):
+                mark_job_indexed(job, job_data, embedding_id)
+            with stage("db"):
+                db.commit()
 
             progress = min(i + batch_size, total)
             print(f"[Task] Progresso: {progress}/{total} vagas indexadas")
@@ -44,6 +71,190 @@ def index_all_jobs_task(self, batch_size: int = 100):
         db.close()
 
 
+@celery_app.task(bind=True, max_retries=3)
+def reindex_changed_jobs_task(self, batch_size: int = 100, full_scan: bool = False):
+    """Re-embeda apenas vagas novas, editadas ou indexadas com outro modelo."""
+    db = SessionLocal()
+    try:
+        model_name = embedding_space(get_active_index())
+        state = db.get(IndexState, REINDEX_WATERMARK_KEY)
+        watermark = None
+        if state and state.value and not full_scan:
+            watermark = datetime.fromisoformat(state.value)
+        # Marca o início da varredura no relógio do banco: edições concorrentes
+        # ficam acima do próximo watermark e não se perdem.
+        scan_started_at = db.query(func.now()).scalar()
+
+        query = db.query(Job)
+        if watermark is not None:
+            query = query.filter(or_(
+                Job.embedding_id.is_(None),
+                Job.embedding_hash.is_(None),
+                Job.embedding_model.is_(None),
+                Job.embedding_model != model_name,
+                Job.updated_at > watermark,
+            ))
+
+        scanned, reindexed = 0, 0
+        pending: list[tuple[Job, dict]] = []
+
+        def flush():
+            nonlocal reindexed
+            if not pending:
+                return
+            observe_batch("index", len(pending))
+            embedding_ids = index_jobs_batch([(job.id, data) for job, data in pending])
+            for (job, data), embedding_id in zip(pending, embedding_ids):
+                mark_job_indexed(job, data, embedding_id)
+            with stage("db"):
+                db.commit()
+            reindexed += len(pending)
+            pending.clear()
+
+        # Paginação por id (keyset): os commits de cada lote não invalidam a varredura
+        last_id = 0
+        while True:
+            with stage("db"):
+                chunk = (
+                    query.filter(Job.id > last_id)
+                    .order_by(Job.id)
+                    .limit(1000)
+                    .all()
+                )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            for job in chunk:
+                scanned += 1
+                job_data = job_to_dict(job)
+                unchanged = (
+                    job.embedding_id is not None
+                    and job.embedding_model == model_name
+                    and job.embedding_hash == embedding_text_hash(job_data)
+                )
+                if unchanged:
+                    continue
+                pending.append((job, job_data))
+                if len(pending) >= batch_size:
+                    flush()
+        flush()
+
+        if state is None:
+            state = IndexState(key=REINDEX_WATERMARK_KEY)
+            db.add(state)
+        state.value = scan_started_at.isoformat()
+        db.commit()
+
+        print(f"[Task] Reindexação incremental: {reindexed}/{scanned} vagas re-embedadas")
+        return {"status": "success", "scanned": scanned, "total_reindexed": reindexed}
+    except Exception as exc:
+        db.rollback()
+        raise self.retry(exc=exc, countdown=60)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def shadow_reindex_task(self, model_name: str, batch_size: int = 100, activate: bool = False,
+                        projection: str = None):
+    """Preenche uma coleção versionada para `model_name` sem tirar a busca do ar.
+
+    A coleção ativa continua servindo; enquanto a sombra existir, index_job e
+    index_jobs_batch escrevem nas duas. Com `activate=True` o alias é trocado
+    ao final (depois do backfill dos perfis na coleção pareada); senão a troca
+    fica para `data/index_alias.py activate`. Com
+    `projection`, os vetores são reduzidos pela PCA salva com esse nome.
+    """
+    if projection:
+        from app.services.projection import load_projection
+        fitted = load_projection(projection)
+        if fitted["model"] != model_name:
+            raise ValueError(f"Projeção {projection} foi ajustada para '{fitted['model']}'.")
+        target = make_index(model_name, fitted["dimension"], projection)
+    else:
+        target = make_index(model_name, get_model(model_name).get_sentence_embedding_dimension())
+    if target["collection"] == get_active_index()["collection"]:
+        return {"status": "noop", "collection": target["collection"]}
+    set_shadow_index(target)
+
+    db = SessionLocal()
+    try:
+        total, last_id = 0, 0
+        while True:
+            batch = (
+                db.query(Job)
+                .filter(Job.id > last_id)
+                .order_by(Job.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            index_jobs_batch([(job.id, job_to_dict(job)) for job in batch], index=target)
+            total += len(batch)
+            db.expunge_all()
+            print(f"[Task] Shadow reindex ({target['collection']}): {total} vagas")
+        # Perfis também: sem isso a busca reversa da nova coleção nasce vazia
+        profiles = _backfill_profiles(db, batch_size, targets=[target])
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+    finally:
+        db.close()
+
+    if activate:
+        activate_index(target)
+    return {"status": "success", "collection": target["collection"],
+            "total_indexed": total, "profiles_indexed": profiles, "activated": activate}
+
+
+@celery_app.task(bind=True, max_retries=3)
+def backfill_job_metadata_task(self, batch_size: int = 500):
+    """Regrava os metadados de filtro das vagas já indexadas, sem reembedar.
+
+    Até terminar, a coleção ativa segue com o where legado (localização por
+    substring, sem filtros de salário/habilidades); ao final o alias é marcado.
+    """
+    index = get_active_index()
+    if has_current_metadata(index):
+        return {"status": "noop", "collection": index["collection"]}
+
+    db = SessionLocal()
+    try:
+        total, last_id = 0, 0
+        while True:
+            with stage("db"):
+                batch = (
+                    db.query(Job)
+                    .filter(Job.embedding_id.isnot(None), Job.id > last_id)
+                    .order_by(Job.id)
+                    .limit(batch_size)
+                    .all()
+                )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            observe_batch("metadata_backfill", len(batch))
+            update_job_metadata([(job.id, job_to_dict(job)) for job in batch], index)
+            total += len(batch)
+            db.expunge_all()
+            print(f"[Task] Metadados regravados ({index['collection']}): {total} vagas")
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+    finally:
+        db.close()
+
+    mark_metadata_current(index)
+    return {"status": "success", "collection": index["collection"], "total_updated": total}
+
+
+@celery_app.task(ignore_result=True)
+def refresh_facet_stats_task():
+    from app.services.filter_planner import publish_facet_stats
+    stats = publish_facet_stats()
+    print(f"[Task] Estatísticas de facetas: {stats['total']} vagas")
+
+
 @celery_app.task
 def index_single_job_task(job_id: int):
     from app.services.embedder import index_job
@@ -53,17 +264,114 @@ def index_single_job_task(job_id: int):
         if not job:
             return {"status": "error", "message": "Vaga não encontrada"}
 
-        embedding_id = index_job(job_id, {
-            "title": job.title,
-            "company": job.company,
-            "area": job.area,
-            "seniority": job.seniority,
-            "skills": job.skills,
-            "requirements": job.requirements,
-            "description": job.description,
-        })
-        job.embedding_id = embedding_id
+        job_data = job_to_dict(job)
+        embedding_id = index_job(job_id, job_data)
+        mark_job_indexed(job, job_data, embedding_id)
         db.commit()
+        if settings.candidate_matching_enabled:
+            match_candidates_task.delay(job_id)
         return {"status": "success", "embedding_id": embedding_id}
     finally:
         db.close()
+
+
+@celery_app.task(ignore_result=True)
+def flush_feedback_task():
+    from app.services.feedback_stream import flush_feedback_stream
+    db = SessionLocal()
+    try:
+        inserted = flush_feedback_stream(db, consumer=socket.gethostname())
+        if inserted:
+            print(f"[Task] {inserted} feedbacks gravados em lote")
+        return inserted
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=1)
+def precompute_recommendations_task(self, top_n: int = None):
+    from app.services.precompute import precompute_recommendations
+    db = SessionLocal()
+    try:
+        written = precompute_recommendations(db, top_n)
+        return {"status": "success", "profiles": written}
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=300)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def match_candidates_task(self, job_id: int, n_results: int = None):
+    """Top-k perfis para uma vaga recém-indexada, guardado em job:candidates:{id}."""
+    from app.core.redis_client import get_redis
+    from app.services.recommender import find_candidates
+    db = SessionLocal()
+    try:
+        result = find_candidates(db, job_id, n_results or settings.candidate_top_k)
+        key = f"job:candidates:{job_id}"
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(key)
+        if result.candidates:
+            pipe.zadd(key, {c.session_id: c.similarity_score for c in result.candidates})
+            pipe.expire(key, settings.candidate_ttl_seconds)
+        pipe.execute()
+        print(f"[Task] Vaga {job_id}: {len(result.candidates)} candidatos")
+        return {"status": "success", "candidates": [c.session_id for c in result.candidates]}
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=30)
+    finally:
+        db.close()
+
+
+def _backfill_profiles(db, batch_size: int, targets: list[dict] | None = None) -> int:
+    from sqlalchemy.orm import load_only
+    from app.models.db_models import UserProfile
+    from app.services.embedder import ensure_query_embeddings, index_profiles
+    total, last_id = 0, 0
+    while True:
+        batch = (
+            db.query(UserProfile)
+            .options(load_only(
+                UserProfile.id, UserProfile.session_id, UserProfile.query_text,
+                UserProfile.desired_area, UserProfile.desired_seniority,
+                UserProfile.query_embedding, UserProfile.query_embedding_model,
+            ))
+            .filter(UserProfile.id > last_id)
+            .order_by(UserProfile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        index_profiles(batch, ensure_query_embeddings(db, batch), targets=targets)
+        db.commit()
+        total += len(batch)
+        print(f"[Task] Perfis indexados: {total}")
+    return total
+
+
+@celery_app.task(bind=True, max_retries=3)
+def index_profiles_task(self, batch_size: int = 500):
+    """Backfill da coleção de perfis (p.ex. após ativar um novo modelo)."""
+    db = SessionLocal()
+    try:
+        return {"status": "success", "total_indexed": _backfill_profiles(db, batch_size)}
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=1)
+def build_quantized_index_task(self, mode: str = None):
+    from app.services.quantized_index import build_quantized_index
+    if not settings.quantized_index_enabled:
+        return {"status": "skipped", "reason": "quantized_index_enabled=False"}
+    try:
+        return {"status": "success", **build_quantized_index(mode=mode)}
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=300)
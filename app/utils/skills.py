@@ -0,0 +1,27 @@
+# Vocabulário canônico de habilidades (parser e índice de bitsets).
+# A posição de cada item é o bit no índice em memória: acrescente no fim.
+TECH_SKILLS = [
+    # Linguagens
+    "Python", "JavaScript", "TypeScript", "Java", "Kotlin", "Swift", "Go", "Rust",
+    "C", "C++", "C#", "PHP", "Ruby", "Scala", "R", "MATLAB", "Perl", "Dart",
+    # Frontend
+    "React", "Vue", "Angular", "Next.js", "Nuxt", "Svelte", "HTML", "CSS",
+    "Tailwind", "Bootstrap", "Redux", "GraphQL", "REST API",
+    # Backend
+    "Node.js", "Django", "Flask", "FastAPI", "Spring Boot", "Laravel", "Rails",
+    "Express", "NestJS", "Gin",
+    # Dados & IA
+    "Machine Learning", "Deep Learning", "TensorFlow", "PyTorch", "Keras",
+    "scikit-learn", "Pandas", "NumPy", "Spark", "Hadoop", "Airflow", "dbt",
+    "SQL", "PostgreSQL", "MySQL", "MongoDB", "Redis", "Elasticsearch",
+    "Power BI", "Tableau", "Looker", "BigQuery", "Snowflake", "Databricks",
+    "NLP", "Computer Vision", "LLM", "RAG", "LangChain", "OpenAI",
+    # DevOps & Cloud
+    "Docker", "Kubernetes", "AWS", "Azure", "GCP", "Terraform", "Ansible",
+    "CI/CD", "Jenkins", "GitHub Actions", "Linux", "Bash",
+    # Mobile
+    "Flutter", "React Native", "Android", "iOS", "Jetpack Compose",
+    # Outros
+    "Git", "Agile", "Scrum", "Kanban", "JIRA", "Figma", "Microservices",
+    "Design Patterns", "TDD", "Clean Code", "DDD", "SOLID",
+]
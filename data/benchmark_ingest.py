@@ -0,0 +1,111 @@
+"""Benchmark dos leitores de ingestão (CSV x Parquet x JSONL).
+
+Gera um dataset sintético, grava nos três formatos e mede, em um processo
+separado por formato, o tempo de carga e o pico de memória (RSS) do loader.
+
+    python data/benchmark_ingest.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "python backend dados engenharia cloud aws docker kubernetes sql api "
+    "produto design analytics machine learning equipe remoto híbrido senior "
+    "pleno junior desenvolvimento plataforma infraestrutura clientes vendas"
+).split()
+
+
+def synthetic_rows(n: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "job_id": 1_000_000 + i,
+            "title": " ".join(rng.choices(WORDS, k=3)).title(),
+            "company_name": f"Empresa {rng.randint(1, 5000)}",
+            "description": " ".join(rng.choices(WORDS, k=rng.randint(40, 300))),
+            "location": rng.choice(["São Paulo, SP", "Remoto", "Recife, PE", "Lisboa"]),
+            "job_posting_url": f"https://example.com/jobs/{i}",
+            # Colunas que não são projetadas — devem custar (quase) nada no Arrow
+            "max_salary": rng.random() * 20000,
+            "skills_desc": " ".join(rng.choices(WORDS, k=50)),
+            "views": rng.randint(0, 10000),
+        })
+    return rows
+
+
+def write_datasets(rows: list[dict], directory: str) -> dict[str, str]:
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    paths = {
+        "csv": os.path.join(directory, "jobs.csv"),
+        "parquet": os.path.join(directory, "jobs.parquet"),
+        "jsonl": os.path.join(directory, "jobs.jsonl"),
+    }
+    df.to_csv(paths["csv"], index=False)
+    df.to_parquet(paths["parquet"], index=False)
+    with open(paths["jsonl"], "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return paths
+
+
+def run_child(path: str, with_skills: bool) -> dict:
+    import resource
+    import time
+
+    from data import ingest_dataset
+
+    if not with_skills:
+        # Isola o custo de leitura/parsing do custo do spaCy
+        ingest_dataset.extract_skills = lambda text: []
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    jobs = ingest_dataset.load_jobs(path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        "jobs": len(jobs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos leitores de ingestão.")
+    parser.add_argument("--rows", type=int, default=50_000, help="Vagas sintéticas")
+    parser.add_argument("--with-skills", action="store_true",
+                        help="Inclui a extração de habilidades (spaCy) na medição")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.with_skills)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_datasets(synthetic_rows(args.rows), tmp)
+        print(f"{'formato':<10}{'arquivo (MB)':>14}{'tempo (s)':>12}{'pico (MB)':>12}{'vagas':>10}")
+        for fmt, path in paths.items():
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", path]
+            if args.with_skills:
+                cmd.append("--with-skills")
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{fmt:<10}{size_mb:>14.1f}{result['seconds']:>12.3f}"
+                  f"{result['peak_mb']:>12.1f}{result['jobs']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark do índice compacto: recall@k x memória x latência.
+
+Compara a busca exata em float32 (referência, o mesmo custo de memória dos
+vetores no Chroma) com códigos float16/int8, com e sem rescoring em float32.
+Usa os vetores de um snapshot (data/snapshot_index.py export) ou, sem ele,
+vetores sintéticos agrupados e normalizados.
+
+    python data/benchmark_quantization.py --snapshot snapshots/jobs --k 10
+    python data/benchmark_quantization.py --rows 200000 --dim 768
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.quantized_index import QuantizedIndex, quantize_int8
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int = 200, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)]
+    vectors += 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, n: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), n, replace=False)].astype(np.float32)
+    queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_topk(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    truth = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        truth[i] = top[np.argsort(-scores[top])]
+    return truth
+
+
+def run_variant(index: QuantizedIndex, queries: np.ndarray, truth: np.ndarray, k: int,
+                rescore_factor: int | None) -> dict:
+    hits, started = 0, time.perf_counter()
+    for query, expected in zip(queries, truth):
+        if rescore_factor is None:
+            # Só os códigos: ordena pelo score grosso, sem tocar no float32
+            scores = index.coarse_scores(query)
+            found = np.argpartition(-scores, k - 1)[:k]
+        else:
+            found = [job_id for job_id, _ in index.search(query, k, rescore_factor)]
+        hits += len(set(int(i) for i in found) & set(expected.tolist()))
+    elapsed = time.perf_counter() - started
+    return {"recall": hits / truth.size, "ms_per_query": 1000 * elapsed / len(queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot", help="Diretório de snapshot com embeddings.npy")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.snapshot:
+        vectors = np.load(os.path.join(args.snapshot, "embeddings.npy"), mmap_mode="r")
+        vectors = np.asarray(vectors, dtype=np.float32)
+    else:
+        vectors = synthetic_vectors(args.rows, args.dim)
+    queries = make_queries(vectors, args.queries)
+    truth = exact_topk(vectors, queries, args.k)
+    job_ids = np.arange(len(vectors), dtype=np.int64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.npy")
+        np.save(path, vectors)
+        on_disk = np.load(path, mmap_mode="r")
+
+        int8_codes, scales = quantize_int8(vectors)
+        variants = {
+            "float32": QuantizedIndex(vectors, on_disk, job_ids),
+            "float16": QuantizedIndex(vectors.astype(np.float16), on_disk, job_ids),
+            "int8": QuantizedIndex(int8_codes, on_disk, job_ids, scales=scales),
+        }
+
+        print(f"{len(vectors)} vetores x {vectors.shape[1]} dims | k={args.k} | "
+              f"{len(queries)} consultas\n")
+        print(f"{'variante':<22}{'memória (MB)':>14}{'recall@k':>11}{'ms/consulta':>14}")
+        for name, index in variants.items():
+            factors = [None] if name == "float32" else [None, 2, 4, 8]
+            for factor in factors:
+                result = run_variant(index, queries, truth, args.k, factor)
+                label = name if factor is None else f"{name} + rescore x{factor}"
+                print(f"{label:<22}{index.nbytes / 2**20:>14.1f}"
+                      f"{result['recall']:>11.3f}{result['ms_per_query']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from app.core.database import SessionLocal
+from app.services.evaluation import evaluate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Avaliação offline (Precision/Recall/MRR/nDCG) sobre todo o feedback.")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20], help="Cortes K")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Início (ISO, inclusivo)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None,
+                        help="Fim (ISO, exclusivo)")
+    parser.add_argument("--model", default=None, help="Filtra por modelo de embeddings")
+    parser.add_argument("--by-model", action="store_true", help="Uma linha por modelo")
+    parser.add_argument("--output", default=None,
+                        help="Grava o relatório (.csv ou .parquet)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = evaluate(db, tuple(args.k), args.since, args.until, args.model, args.by_model)
+    finally:
+        db.close()
+
+    if not report:
+        print("Nenhum feedback com posição no período.")
+        sys.exit(0)
+
+    df = pd.DataFrame(report)
+    print(df.to_string(index=False))
+    if args.output:
+        if args.output.endswith(".parquet"):
+            df.to_parquet(args.output, index=False)
+        else:
+            df.to_csv(args.output, index=False)
+        print(f"\n✅ Relatório gravado em {args.output}")
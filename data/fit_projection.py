@@ -0,0 +1,72 @@
+"""Ajusta uma projeção PCA dos embeddings e mede a perda de recall.
+
+Amostra vagas do banco, gera os embeddings na dimensão completa, ajusta a PCA
+em 80% da amostra e compara o top-k projetado com o completo no restante
+(consultas: query_text dos perfis ou, sem perfis, as próprias vagas retidas).
+
+    python data/fit_projection.py --dims 256 --sample 20000
+    python data/index_alias.py shadow --model <modelo> --projection <nome>
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models.db_models import Job, UserProfile
+from app.services.embedder import embed_batch, job_to_dict, job_to_embedding_text
+from app.services.index_registry import get_active_index
+from app.services.projection import evaluate_projection, fit_pca, save_projection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="Modelo de origem (padrão: o da coleção ativa)")
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--sample", type=int, default=20_000)
+    parser.add_argument("--eval-queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dry-run", action="store_true", help="Só avalia, sem salvar o artefato")
+    args = parser.parse_args()
+
+    model_name = args.model or get_active_index()["model"]
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job).order_by(func.random()).limit(args.sample).all()
+        texts = [job_to_embedding_text(job_to_dict(job)) for job in jobs]
+        query_texts = [row.query_text for row in db.query(UserProfile.query_text)
+                       .filter(UserProfile.query_text.isnot(None))
+                       .order_by(func.random()).limit(args.eval_queries)]
+    finally:
+        db.close()
+    if len(texts) <= args.dims:
+        parser.error(f"Amostra de {len(texts)} vagas é pequena demais para {args.dims} dimensões.")
+
+    vectors = np.asarray(embed_batch(texts, model_name=model_name, show_progress_bar=True), dtype=np.float32)
+    split = int(len(vectors) * 0.8)
+    fitted = fit_pca(vectors[:split], args.dims)
+    holdout = vectors[split:]
+    if query_texts:
+        queries = np.asarray(embed_batch(query_texts, model_name=model_name,
+                                         show_progress_bar=True), dtype=np.float32)
+    else:
+        queries = holdout[:args.eval_queries]
+
+    report = evaluate_projection(holdout, queries, fitted, k=min(args.k, len(holdout)))
+    report["explained_variance"] = round(fitted["explained_variance"], 4)
+    report["queries"] = "profiles" if query_texts else "holdout_jobs"
+    if not args.dry_run:
+        report["name"] = save_projection(fitted, model_name, sample_size=split)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if not args.dry_run:
+        print(f"\nPróximo passo: python data/index_alias.py shadow --model {model_name} "
+              f"--projection {report['name']}")
+
+
+if __name__ == "__main__":
+    main()
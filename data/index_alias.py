@@ -0,0 +1,73 @@
+import argparse
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.index_registry import (
+    activate_index,
+    get_active_index,
+    get_previous_index,
+    get_shadow_index,
+    rollback_index,
+    set_shadow_index,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gerencia coleções versionadas e o alias da coleção ativa.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="Mostra coleção ativa, anterior e sombra")
+
+    shadow = sub.add_parser("shadow", help="Inicia o shadow reindex para um novo modelo")
+    shadow.add_argument("--model", required=True, help="Nome do modelo Sentence-Transformers")
+    shadow.add_argument("--batch-size", type=int, default=100)
+    shadow.add_argument("--projection", help="Projeção PCA salva por data/fit_projection.py")
+    shadow.add_argument("--activate", action="store_true",
+                        help="Troca o alias automaticamente ao final")
+    shadow.add_argument("--sync", action="store_true",
+                        help="Roda no processo atual em vez de enfileirar no Celery")
+
+    sub.add_parser("activate", help="Ativa a coleção sombra")
+    sub.add_parser("rollback", help="Volta para a coleção anterior")
+    sub.add_parser("abort", help="Descarta a coleção sombra (para de escrever nela)")
+
+    backfill = sub.add_parser(
+        "backfill-metadata",
+        help="Regrava os metadados de filtro da coleção ativa sem reembedar")
+    backfill.add_argument("--batch-size", type=int, default=500)
+    backfill.add_argument("--sync", action="store_true",
+                          help="Roda no processo atual em vez de enfileirar no Celery")
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps({
+            "active": get_active_index(),
+            "previous": get_previous_index(),
+            "shadow": get_shadow_index(),
+        }, indent=2, ensure_ascii=False))
+    elif args.command == "shadow":
+        from app.services.tasks import shadow_reindex_task
+        if args.sync:
+            print(shadow_reindex_task(args.model, args.batch_size, args.activate, args.projection))
+        else:
+            result = shadow_reindex_task.delay(args.model, args.batch_size, args.activate,
+                                               args.projection)
+            print(f"Task enfileirada: {result.id}")
+    elif args.command == "backfill-metadata":
+        from app.services.tasks import backfill_job_metadata_task
+        if args.sync:
+            print(backfill_job_metadata_task(args.batch_size))
+        else:
+            print(f"Task enfileirada: {backfill_job_metadata_task.delay(args.batch_size).id}")
+    elif args.command == "activate":
+        activate_index()
+    elif args.command == "rollback":
+        rollback_index()
+    else:
+        set_shadow_index(None)
+        print("Coleção sombra descartada.")
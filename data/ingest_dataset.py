@@ -7,7 +7,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.database import SessionLocal, init_db
 from app.models.db_models import Job
-from app.services.embedder import index_jobs_batch
+from app.services.embedder import index_jobs_batch, mark_job_indexed
 from app.services.parser import extract_skills
 
 
@@ -52,6 +52,22 @@ def clean_text(text) -> str:
     return str(text).strip()
 
 
+def build_job_dict(title: str, company: str, description: str, location: str,
+                   external_id: str, url: str) -> dict:
+    full_text = f"{title} {description}"
+    return {
+        "external_id": external_id,
+        "title": title[:255],
+        "company": company[:255],
+        "location": location[:255],
+        "description": description[:5000],
+        "skills": extract_skills(full_text),
+        "area": detect_area(full_text),
+        "seniority": detect_seniority(full_text),
+        "url": url,
+    }
+
+
 def load_linkedin_dataset(csv_path: str, limit: int = None) -> list[dict]:
     df = pd.read_csv(csv_path, nrows=limit)
     print(f"[Ingestão] {len(df)} vagas carregadas do CSV.")
@@ -66,31 +82,182 @@ def load_linkedin_dataset(csv_path: str, limit: int = None) -> list[dict]:
         if not title or not description or len(description) < 50:
             continue
 
-        full_text = f"{title} {description}"
-        skills = extract_skills(full_text)
-
-        jobs.append({
-            "external_id": str(row.get("job_id", "")),
-            "title": title[:255],
-            "company": company[:255],
-            "location": location[:255],
-            "description": description[:5000],
-            "skills": skills,
-            "area": detect_area(full_text),
-            "seniority": detect_seniority(full_text),
-            "url": clean_text(row.get("job_posting_url", row.get("url", ""))),
-        })
+        jobs.append(build_job_dict(
+            title=title,
+            company=company,
+            description=description,
+            location=location,
+            external_id=str(row.get("job_id", "")),
+            url=clean_text(row.get("job_posting_url", row.get("url", ""))),
+        ))
+
+    print(f"[Ingestão] {len(jobs)} vagas válidas após filtragem.")
+    return jobs
+
+
+# ── Fontes colunares (Parquet / JSONL) via Arrow ──────────────────────────────
+
+# Colunas projetadas na leitura; os pares são alternativas (primeira que existir).
+ARROW_COLUMNS = {
+    "title": ("title",),
+    "company": ("company_name", "company"),
+    "description": ("description",),
+    "location": ("location",),
+    "external_id": ("job_id",),
+    "url": ("job_posting_url", "url"),
+}
+
 
+def _resolve_projection(schema_names: list[str]) -> dict[str, str]:
+    projection = {}
+    for field, candidates in ARROW_COLUMNS.items():
+        for name in candidates:
+            if name in schema_names:
+                projection[field] = name
+                break
+    return projection
+
+
+def _text_column(batch, column: str | None, max_len: int | None = None,
+                 default: str = ""):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if column is None:
+        return pa.array([default] * batch.num_rows, type=pa.string())
+    arr = batch.column(column)
+    if not pa.types.is_string(arr.type) and not pa.types.is_large_string(arr.type):
+        arr = pc.cast(arr, pa.string())
+    arr = pc.utf8_trim_whitespace(pc.fill_null(arr, ""))
+    if max_len is not None:
+        arr = pc.utf8_slice_codeunits(arr, 0, max_len)
+    return arr
+
+
+def _jobs_from_record_batch(batch, projection: dict[str, str]) -> list[dict]:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    title = _text_column(batch, projection.get("title"))
+    description = _text_column(batch, projection.get("description"))
+
+    # Filtragem vetorizada antes de materializar qualquer objeto Python
+    mask = pc.and_(
+        pc.greater(pc.utf8_length(title), 0),
+        pc.greater_equal(pc.utf8_length(description), 50),
+    )
+    if not pc.any(mask).as_py():
+        return []
+
+    columns = {
+        "title": title,
+        "company": _text_column(batch, projection.get("company"), 255, default="Empresa"),
+        "description": description,
+        "location": _text_column(batch, projection.get("location"), 255),
+        "external_id": _text_column(batch, projection.get("external_id")),
+        "url": _text_column(batch, projection.get("url")),
+    }
+    filtered = pa.RecordBatch.from_pydict(columns).filter(mask).to_pydict()
+
+    return [
+        build_job_dict(
+            title=filtered["title"][i],
+            company=filtered["company"][i],
+            description=filtered["description"][i],
+            location=filtered["location"][i],
+            external_id=filtered["external_id"][i],
+            url=filtered["url"][i],
+        )
+        for i in range(len(filtered["title"]))
+    ]
+
+
+def _load_record_batches(batches, schema_names: list[str], limit: int = None,
+                         source: str = "Arrow") -> list[dict]:
+    projection = _resolve_projection(schema_names)
+    if "title" not in projection or "description" not in projection:
+        raise ValueError(f"Dataset {source} sem colunas 'title'/'description'.")
+
+    jobs, read = [], 0
+    for batch in batches:
+        if limit is not None:
+            remaining = limit - read
+            if remaining <= 0:
+                break
+            batch = batch.slice(0, remaining)
+        read += batch.num_rows
+        jobs.extend(_jobs_from_record_batch(batch, projection))
+
+    print(f"[Ingestão] {read} vagas carregadas do {source}.")
     print(f"[Ingestão] {len(jobs)} vagas válidas após filtragem.")
     return jobs
 
 
-def ingest(csv_path: str, limit: int = None, batch_size: int = 100):
+def load_parquet_dataset(parquet_path: str, limit: int = None,
+                         batch_size: int = 10_000) -> list[dict]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(parquet_path)
+    schema_names = parquet_file.schema_arrow.names
+    columns = list(_resolve_projection(schema_names).values())
+    batches = parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+    return _load_record_batches(batches, columns, limit, source="Parquet")
+
+
+def _jsonl_id_type(jsonl_path: str):
+    import json
+    import pyarrow as pa
+
+    # O leitor JSON do Arrow não converte número -> texto; o tipo do job_id
+    # é decidido pela primeira linha (exports costumam ser homogêneos).
+    with open(jsonl_path, encoding="utf-8") as f:
+        first = f.readline()
+    value = json.loads(first).get("job_id") if first.strip() else None
+    return pa.int64() if isinstance(value, int) else pa.string()
+
+
+def load_jsonl_dataset(jsonl_path: str, limit: int = None,
+                       batch_size: int = 10_000) -> list[dict]:
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    # Schema explícito + "ignore" = projeção: campos fora da lista não são parseados.
+    fields = [name for candidates in ARROW_COLUMNS.values() for name in candidates]
+    schema = pa.schema([
+        (name, _jsonl_id_type(jsonl_path) if name == "job_id" else pa.string())
+        for name in fields
+    ])
+    table = pj.read_json(
+        jsonl_path,
+        parse_options=pj.ParseOptions(
+            explicit_schema=schema,
+            unexpected_field_behavior="ignore",
+        ),
+    )
+    # Campos do schema ausentes no arquivo chegam como colunas só de nulos
+    present = [name for name in table.column_names
+               if table.column(name).null_count < table.num_rows]
+    table = table.select(present)
+    return _load_record_batches(
+        table.to_batches(max_chunksize=batch_size), present, limit, source="JSONL",
+    )
+
+
+def load_jobs(path: str, limit: int = None) -> list[dict]:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".parquet":
+        return load_parquet_dataset(path, limit)
+    if suffix in (".jsonl", ".ndjson"):
+        return load_jsonl_dataset(path, limit)
+    return load_linkedin_dataset(path, limit)
+
+
+def ingest(path: str, limit: int = None, batch_size: int = 100):
     init_db()
     db = SessionLocal()
 
     try:
-        jobs_data = load_linkedin_dataset(csv_path, limit)
+        jobs_data = load_jobs(path, limit)
         total = len(jobs_data)
         inserted = 0
 
@@ -119,6 +286,7 @@ def ingest(csv_path: str, limit: int = None, batch_size: int = 100):
                     (job.id, {
                         "title": job.title,
                         "company": job.company,
+                        "location": job.location,
                         "area": job.area,
                         "seniority": job.seniority,
                         "skills": job.skills,
@@ -128,8 +296,8 @@ def ingest(csv_path: str, limit: int = None, batch_size: int = 100):
                 ]
                 embedding_ids = index_jobs_batch(jobs_for_embedding)
 
-                for job, emb_id in zip(db_jobs, embedding_ids):
-                    job.embedding_id = emb_id
+                for job, (_, job_data), emb_id in zip(db_jobs, jobs_for_embedding, embedding_ids):
+                    mark_job_indexed(job, job_data, emb_id)
                 db.commit()
                 inserted += len(db_jobs)
 
@@ -143,9 +311,10 @@ def ingest(csv_path: str, limit: int = None, batch_size: int = 100):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingere dataset de vagas no sistema.")
-    parser.add_argument("--csv", required=True, help="Caminho para o arquivo CSV")
+    parser.add_argument("--input", "--csv", dest="input", required=True,
+                        help="Caminho para o dataset (.csv, .parquet ou .jsonl)")
     parser.add_argument("--limit", type=int, default=None, help="Limite de vagas a importar")
     parser.add_argument("--batch-size", type=int, default=100, help="Tamanho do batch")
     args = parser.parse_args()
 
-    ingest(args.csv, args.limit, args.batch_size)
+    ingest(args.input, args.limit, args.batch_size)
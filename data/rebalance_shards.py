@@ -0,0 +1,31 @@
+import argparse
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import get_settings
+from app.services.index_registry import get_active_index, get_shadow_index
+from app.services.sharding import all_shards, rebalance_shards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Redistribui os vetores entre shards conforme SHARD_MODE / SHARD_AREAS.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Só conta quantos vetores mudariam de coleção")
+    parser.add_argument("--shadow", action="store_true",
+                        help="Rebalanceia a coleção sombra em vez da ativa")
+    args = parser.parse_args()
+
+    index = get_shadow_index() if args.shadow else get_active_index()
+    if index is None:
+        parser.error("Nenhuma coleção sombra configurada.")
+
+    settings = get_settings()
+    print(f"[Shards] Modo: {settings.shard_mode} | destino: "
+          f"{', '.join(s['collection'] for s in all_shards(index))}")
+    moved = rebalance_shards(index, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(json.dumps({"dry_run": args.dry_run, "moved": moved}, indent=2, ensure_ascii=False))
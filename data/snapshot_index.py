@@ -0,0 +1,60 @@
+import argparse
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.snapshot import export_snapshot, import_snapshot
+
+
+def _hnsw_metadata(args) -> dict | None:
+    metadata = {}
+    if args.hnsw_space:
+        metadata["hnsw:space"] = args.hnsw_space
+    if args.hnsw_m:
+        metadata["hnsw:M"] = args.hnsw_m
+    if args.hnsw_ef_construction:
+        metadata["hnsw:construction_ef"] = args.hnsw_ef_construction
+    return metadata or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta/importa os embeddings das vagas sem re-encodar.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="Exporta a coleção para um snapshot em disco")
+    exp.add_argument("--output", required=True, help="Diretório de destino")
+    exp.add_argument("--collection", default=None, help="Padrão: coleção ativa")
+    exp.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    exp.add_argument("--batch-size", type=int, default=5000)
+
+    imp = sub.add_parser("import", help="Carrega um snapshot em uma coleção")
+    imp.add_argument("--input", required=True, help="Diretório do snapshot")
+    imp.add_argument("--collection", default=None, help="Padrão: coleção ativa")
+    imp.add_argument("--batch-size", type=int, default=5000)
+    imp.add_argument("--recreate", action="store_true",
+                     help="Apaga a coleção de destino antes de importar (exige --collection)")
+    imp.add_argument("--allow-model-mismatch", action="store_true")
+    imp.add_argument("--hnsw-space", choices=["cosine", "l2", "ip"], default=None)
+    imp.add_argument("--hnsw-m", type=int, default=None)
+    imp.add_argument("--hnsw-ef-construction", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "import" and args.recreate and not args.collection:
+        parser.error("--recreate exige --collection (a coleção ativa nunca é apagada)")
+
+    if args.command == "export":
+        manifest = export_snapshot(args.output, args.collection, args.dtype, args.batch_size)
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
+    else:
+        total = import_snapshot(
+            args.input,
+            collection_name=args.collection,
+            collection_metadata=_hnsw_metadata(args),
+            batch_size=args.batch_size,
+            recreate=args.recreate,
+            allow_model_mismatch=args.allow_model_mismatch,
+        )
+        print(f"\n✅ {total} vetores importados.")
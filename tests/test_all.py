@@ -106,6 +106,75 @@ class TestEmbedder:
         assert "engenharia" in text
         assert "senior" in text
 
+    def test_search_batch_single_chroma_query(self):
+        from app.services import embedder
+
+        results = {
+            "ids": [["job_1", "job_2"], ["job_2", "job_3"]],
+            "distances": [[0.2, 0.4], [0.0, 0.5]],
+            "metadatas": [[{"job_id": "1"}, {"job_id": "2"}],
+                          [{"job_id": "2"}, {"job_id": "3"}]],
+        }
+        active = {"collection": "jobs", "model": "m", "dimension": None}
+        with patch.object(embedder, "get_active_index", return_value=active), \
+                patch.object(embedder, "plan_search", return_value={"strategy": embedder.ANN}), \
+                patch.object(embedder, "_collection_count", return_value=100), \
+                patch.object(embedder, "_run_on_index", return_value=results) as run:
+            out = embedder.search_similar_jobs_batch([[0.1], [0.2]], n_results=2,
+                                                     filter_area="dados")
+        assert run.call_count == 1
+        assert [[r["job_id"] for r in q] for q in out] == [[1, 2], [2, 3]]
+        assert out[1][0]["similarity_score"] == 1.0
+
+    def test_search_batch_falls_back_to_planner(self):
+        from app.services import embedder
+
+        results = {
+            "ids": [["job_1", "job_2"], ["job_2"]],
+            "distances": [[0.2, 0.4], [0.0]],
+            "metadatas": [[{"job_id": "1"}, {"job_id": "2"}], [{"job_id": "2"}]],
+        }
+        active = {"collection": "jobs", "model": "m", "dimension": None}
+        planned = [{"job_id": 2}, {"job_id": 9}]
+        with patch.object(embedder, "get_active_index", return_value=active), \
+                patch.object(embedder, "plan_search", return_value={"strategy": embedder.ANN}), \
+                patch.object(embedder, "_collection_count", return_value=100), \
+                patch.object(embedder, "_run_on_index", return_value=results), \
+                patch.object(embedder, "_planned_search", return_value=planned) as fallback:
+            out = embedder.search_similar_jobs_batch([[0.1], [0.2]], n_results=2,
+                                                     filter_area="dados")
+            # Lista curta: só a segunda consulta repete a busca do /recommend
+            assert out[1] == planned and fallback.call_count == 1
+            assert fallback.call_args.args[1] == [0.2]
+
+            # Plano exato: nenhuma consulta compartilhada
+            with patch.object(embedder, "plan_search", return_value={"strategy": embedder.EXACT}):
+                embedder.search_similar_jobs_batch([[0.1], [0.2]], n_results=2,
+                                                   filter_area="dados")
+            assert fallback.call_count == 3
+
+    def test_search_candidate_profiles_prefilters_preferences(self):
+        from app.services import embedder
+
+        results = {
+            "ids": [["profile_3"]],
+            "distances": [[0.5]],
+            "metadatas": [[{"profile_id": "3", "session_id": "s3"}]],
+        }
+        active = {"collection": "jobs__minilm__384", "model": "m", "dimension": 384}
+        with patch.object(embedder, "get_active_index", return_value=active), \
+                patch.object(embedder, "count_indexed_profiles", return_value=1000), \
+                patch.object(embedder, "_run_on_index", return_value=results) as run:
+            out = embedder.search_candidate_profiles([0.1], n_results=5, filter_area="dados")
+
+        index, query = run.call_args[0]
+        assert index["collection"] == "profiles__minilm__384"
+        collection = MagicMock()
+        query(collection)
+        kwargs = collection.query.call_args.kwargs
+        assert kwargs["where"] == {"desired_area": {"$in": ["dados", ""]}}
+        assert out == [{"profile_id": 3, "session_id": "s3", "similarity_score": 0.75}]
+
     def test_job_to_embedding_text_empty(self):
         from app.services.embedder import job_to_embedding_text
         text = job_to_embedding_text({})
@@ -151,6 +220,13 @@ class TestAPI:
         assert r.status_code == 200
         assert r.json()["session_id"] == "test-session-123"
 
+    @patch("app.api.routes.recommender.get_profile", return_value=None)
+    @patch("app.api.routes.recommender.create_profile_from_text")
+    def test_rewrite_unknown_session_is_404(self, mock_create, mock_get, client):
+        r = client.post("/api/v1/profile/text", data={"text": "Python", "session_id": "x"})
+        assert r.status_code == 404
+        mock_create.assert_not_called()
+
     def test_upload_text_empty(self, client):
         r = client.post("/api/v1/profile/text", data={"text": ""})
         assert r.status_code in (400, 422)
@@ -170,6 +246,91 @@ class TestAPI:
         })
         assert r.status_code == 200
 
+    @patch("app.api.routes.recommender.recommend_jobs")
+    def test_recommend_filter_error_is_400(self, mock_recommend, client):
+        from app.services.location import FilterError
+        mock_recommend.side_effect = FilterError("Raio grande demais")
+        r = client.post("/api/v1/recommend", json={"session_id": "s1"})
+        assert r.status_code == 400
+        mock_recommend.side_effect = ValueError("Perfil não encontrado: s1")
+        assert client.post("/api/v1/recommend", json={"session_id": "s1"}).status_code == 404
+
+    @patch("app.api.routes.recommender.recommend_jobs_batch")
+    def test_recommend_batch_streams_ndjson(self, mock_batch, client):
+        import json
+        from app.models.schemas import RecommendResponse, BatchRecommendError
+        mock_batch.return_value = [
+            RecommendResponse(session_id="s1", profile_summary="Python",
+                              recommendations=[], total_jobs_searched=100),
+            BatchRecommendError(session_id="s2", error="Perfil não encontrado"),
+        ]
+        r = client.post("/api/v1/recommend/batch", json={
+            "items": [{"session_id": "s1"}, {"session_id": "s2", "filter_area": "dados"}],
+            "n_results": 5,
+        })
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [line["session_id"] for line in lines] == ["s1", "s2"]
+        assert lines[1]["error"] == "Perfil não encontrado"
+
+    @patch("app.api.routes.recommender.recommend_jobs")
+    def test_recommend_compact_view(self, mock_recommend, client):
+        from app.models.schemas import JobSummary, RecommendedJob, RecommendResponse
+        mock_recommend.return_value = RecommendResponse(
+            session_id="test-123",
+            profile_summary="Python",
+            recommendations=[
+                RecommendedJob(job=JobSummary(id=i, title="Dev Python", company="ACME"),
+                               similarity_score=0.9, rank=i)
+                for i in range(1, 51)
+            ],
+            total_jobs_searched=100,
+        )
+        r = client.post("/api/v1/recommend", json={"session_id": "test-123", "view": "compact"},
+                        headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200
+        assert mock_recommend.call_args.kwargs["compact"] is True
+        assert r.headers["content-encoding"] == "gzip"
+        job = r.json()["recommendations"][0]
+        assert "description" not in job["job"] and "rerank_score" not in job
+
+    @patch("app.api.routes.recommender.recommend_jobs")
+    def test_server_timing_and_prometheus_endpoint(self, mock_recommend, client):
+        from app.core.metrics import stage
+        from app.models.schemas import RecommendResponse
+
+        def fake_recommend(**kwargs):
+            with stage("embed"):
+                pass
+            return RecommendResponse(session_id="s1", profile_summary="Python",
+                                     recommendations=[], total_jobs_searched=1)
+
+        mock_recommend.side_effect = fake_recommend
+        r = client.post("/api/v1/recommend", json={"session_id": "s1"})
+        timing = r.headers["server-timing"]
+        assert "embed;dur=" in timing and "serialize;dur=" in timing and "total;dur=" in timing
+
+        r = client.get("/internal/metrics")
+        assert r.status_code == 200
+        assert 'reco_stage_seconds_count{stage="request:' in r.text
+        assert 'recommend"}' in r.text
+
+    def test_feedback_falls_back_to_sync_write(self, client):
+        import redis
+        from types import SimpleNamespace
+        from app.api import routes
+
+        with patch.object(routes.settings, "feedback_write_behind", True), \
+                patch("app.services.feedback_stream.enqueue_feedback",
+                      side_effect=redis.ConnectionError("down")), \
+                patch("app.api.routes.recommender.save_feedback",
+                      return_value=SimpleNamespace(id=42)) as save:
+            r = client.post("/api/v1/feedback", json={"session_id": "s1", "job_id": 1, "rating": 1})
+        assert r.status_code == 200
+        assert r.json()["id"] == 42
+        save.assert_called_once()
+
     def test_recommend_not_found(self, client):
         with patch("app.api.routes.recommender.recommend_jobs") as mock:
             mock.side_effect = ValueError("Perfil não encontrado")
@@ -206,3 +367,1586 @@ class TestMetrics:
         mock_db2.query.return_value.filter.return_value.first.return_value = None
         result = calculate_precision_at_k(mock_db2, "nao-existe", k=5)
         assert result == 0.0
+
+
+# ── Testes de ingestão ────────────────────────────────────────────────────────
+
+class TestIngest:
+
+    @pytest.fixture
+    def rows(self):
+        return [
+            {"job_id": 1, "title": " Dev Python ", "company_name": "ACME",
+             "description": "Vaga backend com Python e FastAPI. " * 3,
+             "location": "São Paulo", "job_posting_url": "https://x/1", "views": 3},
+            {"job_id": 2, "title": "Curta", "company_name": "ACME",
+             "description": "curta demais", "location": None,
+             "job_posting_url": "https://x/2", "views": 1},
+        ]
+
+    @patch("data.ingest_dataset.extract_skills", return_value=[])
+    def test_parquet_matches_csv(self, _mock_skills, rows, tmp_path):
+        import pandas as pd
+        from data.ingest_dataset import load_linkedin_dataset, load_jobs
+
+        df = pd.DataFrame(rows)
+        df.to_csv(tmp_path / "jobs.csv", index=False)
+        df.to_parquet(tmp_path / "jobs.parquet", index=False)
+
+        from_csv = load_linkedin_dataset(str(tmp_path / "jobs.csv"))
+        from_parquet = load_jobs(str(tmp_path / "jobs.parquet"))
+        assert from_parquet == from_csv
+        assert len(from_parquet) == 1
+        assert from_parquet[0]["title"] == "Dev Python"
+
+    @patch("data.ingest_dataset.extract_skills", return_value=[])
+    def test_jsonl_projection_and_limit(self, _mock_skills, rows, tmp_path):
+        import json
+        from data.ingest_dataset import load_jobs
+
+        path = tmp_path / "jobs.jsonl"
+        path.write_text("\n".join(json.dumps(r) for r in rows * 3))
+
+        jobs = load_jobs(str(path), limit=2)
+        assert len(jobs) == 1
+        assert jobs[0]["external_id"] == "1"
+        assert jobs[0]["url"] == "https://x/1"
+        assert "views" not in jobs[0]
+
+
+class TestSnapshot:
+    ACTIVE = {"collection": "jobs", "model": "modelo-teste", "dimension": None}
+
+    @pytest.fixture
+    def source_collection(self):
+        collection = MagicMock()
+        collection.count.return_value = 3
+        collection.metadata = {"hnsw:space": "cosine"}
+        ids = [f"job_{i}" for i in range(3)]
+        collection.get.side_effect = lambda offset, limit, include: {
+            "ids": ids[offset:offset + limit],
+            "embeddings": [[float(i), 0.5, -0.25] for i in range(offset, min(offset + limit, 3))],
+            "metadatas": [{"job_id": str(i)} for i in range(offset, min(offset + limit, 3))],
+            "documents": [f"doc {i}" for i in range(offset, min(offset + limit, 3))],
+        }
+        return collection
+
+    def test_export_import_roundtrip(self, source_collection, tmp_path):
+        from app.services import snapshot
+
+        target = MagicMock()
+        with patch("app.services.snapshot.get_jobs_collection", return_value=source_collection), \
+                patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE):
+            manifest = snapshot.export_snapshot(str(tmp_path), batch_size=2)
+        assert manifest["count"] == 3
+        assert manifest["dimension"] == 3
+
+        with patch("app.services.snapshot.get_jobs_collection", return_value=target), \
+                patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE), \
+                patch("app.services.snapshot.bump_index_version") as bump:
+            imported = snapshot.import_snapshot(str(tmp_path), batch_size=2)
+        assert imported == 3
+        bump.assert_called_once()
+        upserted_ids = [i for call in target.upsert.call_args_list for i in call.kwargs["ids"]]
+        assert upserted_ids == ["job_0", "job_1", "job_2"]
+        last = target.upsert.call_args_list[-1].kwargs
+        assert last["embeddings"] == [[2.0, 0.5, -0.25]]
+        assert last["metadatas"] == [{"job_id": "2"}]
+
+    def test_sharded_export_and_import_cover_every_shard(self, tmp_path):
+        from app.services import sharding, snapshot
+
+        def shard(job_ids):
+            collection = MagicMock()
+            collection.count.return_value = len(job_ids)
+            collection.metadata = {"hnsw:space": "cosine", "shard_of": "jobs"}
+            collection.get.side_effect = lambda offset, limit, include: {
+                "ids": [f"job_{i}" for i in job_ids[offset:offset + limit]],
+                "embeddings": [[float(i), 1.0] for i in job_ids[offset:offset + limit]],
+                "metadatas": [{"job_id": i} for i in job_ids[offset:offset + limit]],
+                "documents": None,
+            }
+            return collection
+
+        sources = {"jobs__s-h0": shard([0, 2, 4]), "jobs__s-h1": shard([1, 3])}
+        targets = {}
+
+        def target(name, metadata=None):
+            targets.setdefault(name, (MagicMock(), metadata))
+            return targets[name][0]
+
+        with patch.object(sharding.settings, "shard_mode", "hash"), \
+                patch.object(sharding.settings, "shard_count", 2), \
+                patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE), \
+                patch("app.services.snapshot.bump_index_version"):
+            with patch("app.services.snapshot.get_jobs_collection",
+                       side_effect=lambda name, metadata=None: sources[name]):
+                manifest = snapshot.export_snapshot(str(tmp_path), batch_size=2)
+            assert manifest["count"] == 5
+            assert manifest["shards"] == ["jobs__s-h0", "jobs__s-h1"]
+            assert "shard_of" not in manifest["collection_metadata"]
+
+            with patch("app.services.snapshot.get_jobs_collection", side_effect=target):
+                assert snapshot.import_snapshot(str(tmp_path), collection_name="novo") == 5
+
+        upserted = {name: [i for call in mock.upsert.call_args_list for i in call.kwargs["ids"]]
+                    for name, (mock, _) in targets.items()}
+        assert upserted == {"novo__s-h0": ["job_0", "job_2", "job_4"],
+                            "novo__s-h1": ["job_1", "job_3"]}
+        assert targets["novo__s-h1"][1]["shard_of"] == "novo"
+
+    def test_import_rejects_other_model(self, source_collection, tmp_path):
+        import json
+        from app.services import snapshot
+
+        with patch("app.services.snapshot.get_jobs_collection", return_value=source_collection), \
+                patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE):
+            snapshot.export_snapshot(str(tmp_path))
+        manifest = snapshot.read_manifest(str(tmp_path))
+        manifest["embedding_model"] = "outro-modelo"
+        (tmp_path / snapshot.MANIFEST_FILE).write_text(json.dumps(manifest))
+
+        with patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE), \
+                pytest.raises(ValueError):
+            snapshot.import_snapshot(str(tmp_path))
+
+    def test_recreate_guards_active_collection(self, source_collection, tmp_path):
+        from app.services import snapshot
+
+        with patch("app.services.snapshot.get_jobs_collection", return_value=source_collection), \
+                patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE):
+            snapshot.export_snapshot(str(tmp_path))
+
+        client = MagicMock()
+        with patch("app.services.snapshot.get_active_index", return_value=self.ACTIVE), \
+                patch("app.services.snapshot.get_chroma_client", return_value=client), \
+                patch("app.services.snapshot.get_jobs_collection", return_value=MagicMock()), \
+                patch("app.services.snapshot.bump_index_version"):
+            for name in (None, "jobs"):
+                with pytest.raises(ValueError):
+                    snapshot.import_snapshot(str(tmp_path), collection_name=name, recreate=True)
+            client.delete_collection.assert_not_called()
+
+            # Coleção inexistente é ok; qualquer outro erro do Chroma sobe
+            client.delete_collection.side_effect = ValueError("Collection novo does not exist.")
+            assert snapshot.import_snapshot(str(tmp_path), collection_name="novo", recreate=True) == 3
+            client.delete_collection.side_effect = RuntimeError("timeout")
+            with pytest.raises(RuntimeError):
+                snapshot.import_snapshot(str(tmp_path), collection_name="novo", recreate=True)
+
+
+@pytest.fixture
+def db_factory():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.core.database import Base
+    from app.services import index_registry
+    import app.models.db_models  # noqa: F401 — registra as tabelas
+
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    index_registry.invalidate_cache()
+    with patch.object(index_registry, "SessionLocal", factory):
+        yield factory
+    index_registry.invalidate_cache()
+
+
+class TestIncrementalReindex:
+
+    def _add_job(self, db, title):
+        from app.models.db_models import Job
+        job = Job(title=title, company="ACME", description="Descrição " * 10)
+        db.add(job)
+        db.commit()
+        return job
+
+    def test_embedding_text_hash_tracks_text(self):
+        from app.services.embedder import embedding_text_hash
+        job = {"title": "Dev", "description": "Backend"}
+        assert embedding_text_hash(job) == embedding_text_hash(dict(job))
+        assert embedding_text_hash(job) != embedding_text_hash({**job, "title": "Dev Sr"})
+
+    def test_only_changed_jobs_are_reembedded(self, db_factory):
+        from app.services import tasks
+
+        db = db_factory()
+        first, second = self._add_job(db, "Dev Python"), self._add_job(db, "Dev Go")
+        db.close()
+
+        fake_index = MagicMock(side_effect=lambda jobs: [f"job_{i}" for i, _ in jobs])
+        with patch.object(tasks, "SessionLocal", db_factory), \
+                patch.object(tasks, "index_jobs_batch", fake_index):
+            result = tasks.reindex_changed_jobs_task(batch_size=10)
+            assert result["total_reindexed"] == 2
+
+            db = db_factory()
+            job = db.get(tasks.Job, second.id)
+            job.title = "Dev Go Sênior"
+            db.commit()
+            db.close()
+
+            result = tasks.reindex_changed_jobs_task(batch_size=10, full_scan=True)
+            assert result["total_reindexed"] == 1
+            reindexed_ids = [i for i, _ in fake_index.call_args_list[-1].args[0]]
+            assert reindexed_ids == [second.id]
+
+    def test_watermark_skips_untouched_and_picks_edited(self, db_factory):
+        from datetime import datetime
+        from app.models.db_models import IndexState
+        from app.services import tasks
+
+        db = db_factory()
+        first, second = self._add_job(db, "Dev Python"), self._add_job(db, "Dev Go")
+        db.close()
+
+        fake_index = MagicMock(side_effect=lambda jobs: [f"job_{i}" for i, _ in jobs])
+        with patch.object(tasks, "SessionLocal", db_factory), \
+                patch.object(tasks, "index_jobs_batch", fake_index):
+            assert tasks.reindex_changed_jobs_task(batch_size=10)["total_reindexed"] == 2
+
+            db = db_factory()
+            # Indexar não pode mexer no updated_at (senão tudo volta amanhã)
+            assert db.get(tasks.Job, first.id).updated_at is None
+            db.get(IndexState, tasks.REINDEX_WATERMARK_KEY).value = "2020-01-01T00:00:00"
+            job = db.get(tasks.Job, second.id)
+            job.title = "Dev Go Sênior"
+            job.updated_at = datetime(2021, 1, 1)
+            db.commit()
+            db.close()
+
+            result = tasks.reindex_changed_jobs_task(batch_size=10)
+            assert result == {"status": "success", "scanned": 1, "total_reindexed": 1}
+            assert [i for i, _ in fake_index.call_args_list[-1].args[0]] == [second.id]
+
+    def test_shadow_reindex_backfills_profiles_before_activation(self, db_factory):
+        from app.models.db_models import UserProfile
+        from app.services import tasks
+
+        db = db_factory()
+        self._add_job(db, "Dev Python")
+        db.add(UserProfile(session_id="s1", query_text="python"))
+        db.commit()
+        db.close()
+
+        target = {"collection": "jobs__novo", "model": "novo", "dimension": 8}
+        calls = MagicMock()
+        with patch.object(tasks, "SessionLocal", db_factory), \
+                patch.object(tasks, "make_index", return_value=target), \
+                patch.object(tasks, "get_model"), \
+                patch.object(tasks, "set_shadow_index"), \
+                patch.object(tasks, "index_jobs_batch"), \
+                patch.object(tasks, "activate_index", calls.activate), \
+                patch("app.services.embedder.ensure_query_embeddings",
+                      side_effect=lambda db, batch: {p.id: [0.1] * 8 for p in batch}), \
+                patch("app.services.embedder.index_profiles", calls.index_profiles):
+            result = tasks.shadow_reindex_task("novo", activate=True)
+
+        assert result["profiles_indexed"] == 1
+        assert [c[0] for c in calls.mock_calls] == ["index_profiles", "activate"]
+        # Só a coleção nova: a ativa já tem os perfis
+        assert calls.index_profiles.call_args.kwargs["targets"] == [target]
+
+    def test_metadata_backfill_updates_without_reembedding(self, db_factory):
+        from app.services import tasks
+        from app.services.index_registry import get_active_index, has_current_metadata
+
+        db = db_factory()
+        job = self._add_job(db, "Dev Python")
+        job.embedding_id, job.salary_min = f"job_{job.id}", 5000
+        db.add(tasks.Job(title="Sem vetor", company="ACME", description="x" * 60))
+        db.commit()
+        db.close()
+
+        assert not has_current_metadata(get_active_index())
+        with patch.object(tasks, "SessionLocal", db_factory), \
+                patch.object(tasks, "update_job_metadata") as update, \
+                patch.object(tasks, "index_jobs_batch") as reembed, \
+                patch("app.services.result_cache.bump_index_version") as bump:
+            assert tasks.backfill_job_metadata_task(batch_size=10)["total_updated"] == 1
+            assert tasks.backfill_job_metadata_task()["status"] == "noop"
+
+        (jobs, index), = [c.args for c in update.call_args_list]
+        assert [(i, data["salary_min"]) for i, data in jobs] == [(job.id, 5000)]
+        assert index["collection"] == "jobs"
+        assert has_current_metadata(get_active_index())
+        reembed.assert_not_called()
+        bump.assert_called_once()
+
+
+class TestIndexRegistry:
+
+    def test_versioned_collection_name(self):
+        from app.services.index_registry import versioned_collection_name
+        name = versioned_collection_name("sentence-transformers/paraphrase-multilingual-mpnet-base-v2", 768)
+        assert name == "jobs__paraphrase-multilingual-mpnet-base-v2__768"
+        assert len(versioned_collection_name("x" * 200, 1024)) <= 63
+
+    def test_activate_and_rollback(self, db_factory):
+        from app.services import index_registry as registry
+
+        assert registry.get_active_index()["collection"] == registry.JOBS_COLLECTION
+        new = registry.make_index("modelo-novo", 384)
+        registry.set_shadow_index(new)
+        assert registry.get_shadow_index() == new
+
+        with patch("app.services.result_cache.bump_index_version") as bump:
+            registry.activate_index()
+            assert registry.get_active_index() == new
+            assert registry.get_shadow_index() is None
+            assert registry.get_previous_index()["collection"] == registry.JOBS_COLLECTION
+
+            registry.rollback_index()
+            assert registry.get_active_index()["collection"] == registry.JOBS_COLLECTION
+            assert registry.get_previous_index() == new
+        assert bump.call_count == 2
+
+    def test_writes_go_to_active_and_shadow(self, db_factory):
+        from app.services import embedder, index_registry as registry
+
+        registry.set_shadow_index(registry.make_index("modelo-novo", 384))
+        collection = MagicMock()
+        with patch.object(embedder, "bump_index_version"), \
+                patch.object(embedder.chroma_manager, "collection", return_value=collection) as get_coll, \
+                patch.object(embedder, "embed_batch", return_value=[[0.1, 0.2]]) as embed:
+            embedder.index_jobs_batch([(7, {"title": "Dev"})])
+        assert [c.args[0] for c in get_coll.call_args_list] == ["jobs", "jobs__modelo-novo__384"]
+        assert [c.kwargs["model_name"] for c in embed.call_args_list] == [
+            registry.default_index()["model"], "modelo-novo",
+        ]
+
+
+class TestChromaClientManager:
+
+    @pytest.fixture
+    def manager(self):
+        from app.core.chroma import ChromaClientManager
+        manager = ChromaClientManager("localhost", 8001, count_ttl=60)
+        manager._client = MagicMock()
+        return manager
+
+    def test_collection_handle_and_count_are_cached(self, manager):
+        collection = manager._client.get_or_create_collection.return_value
+        collection.count.return_value = 42
+
+        assert manager.count("jobs") == 42
+        assert manager.count("jobs") == 42
+        assert manager._client.get_or_create_collection.call_count == 1
+        assert collection.count.call_count == 1
+
+        manager.invalidate_count("jobs")
+        collection.count.return_value = 43
+        assert manager.count("jobs") == 43
+
+    def test_run_reconnects_once_on_failure(self, manager):
+        stale = MagicMock()
+        stale.query.side_effect = ConnectionError("conexão encerrada")
+        fresh_client = MagicMock()
+        fresh_client.get_or_create_collection.return_value.query.return_value = "ok"
+        manager._collections["jobs"] = stale
+
+        with patch("app.core.chroma.chromadb.HttpClient", return_value=fresh_client):
+            result = manager.run("jobs", None, lambda c: c.query())
+        assert result == "ok"
+        assert manager._client is fresh_client
+
+    def test_run_does_not_retry_query_errors(self, manager):
+        client = manager._client
+        collection = client.get_or_create_collection.return_value
+        collection.query.side_effect = ValueError("Embedding dimension 384 does not match 768")
+        manager._counts["jobs"] = (float("inf"), 10)
+
+        with pytest.raises(ValueError):
+            manager.run("jobs", None, lambda c: c.query())
+        assert collection.query.call_count == 1
+        assert manager._client is client and "jobs" in manager._counts
+
+
+class FakeRedis:
+    """Subconjunto mínimo da API do redis-py usado pelos caches."""
+
+    def __init__(self):
+        self.store, self.hashes, self.ttls = {}, {}, {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value.encode() if isinstance(value, str) else value
+        self.ttls[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1).encode()
+        return int(self.store[key])
+
+    def hincrby(self, key, field, amount=1):
+        h = self.hashes.setdefault(key, {})
+        h[field.encode()] = int(h.get(field.encode(), 0)) + amount
+
+    def hgetall(self, key):
+        return self.hashes.get(key, {})
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def rpush(self, key, *values):
+        self.store.setdefault(key, []).extend(v.encode() for v in values)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def lrange(self, key, start, end):
+        return self.store.get(key, [])[start:end + 1]
+
+    def execute(self):
+        return []
+
+
+class TestResultCache:
+
+    @pytest.fixture
+    def fake_redis(self):
+        fake = FakeRedis()
+        with patch("app.services.result_cache.get_redis", return_value=fake), \
+                patch("app.services.result_cache.get_active_index",
+                      return_value={"collection": "jobs", "model": "m"}):
+            yield fake
+
+    def _response(self):
+        from app.models.schemas import RecommendResponse
+        return RecommendResponse(session_id="s1", profile_summary="Python",
+                                 recommendations=[], total_jobs_searched=10)
+
+    def test_miss_store_hit(self, fake_redis):
+        from app.services import result_cache
+
+        filters = {"area": "dados", "seniority": None, "location": None}
+        cached, key = result_cache.get_cached_recommendations("s1", 10, filters)
+        assert cached is None
+        result_cache.store_recommendations(key, self._response())
+
+        cached, _ = result_cache.get_cached_recommendations("s1", 10, filters)
+        assert cached == self._response()
+        stats = result_cache.cache_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_index_version_bump_invalidates(self, fake_redis):
+        from app.services import result_cache
+
+        filters = {"area": None, "seniority": None, "location": None}
+        _, key = result_cache.get_cached_recommendations("s1", 5, filters)
+        result_cache.store_recommendations(key, self._response())
+        result_cache.bump_index_version()
+
+        cached, new_key = result_cache.get_cached_recommendations("s1", 5, filters)
+        assert cached is None
+        assert new_key != key
+
+    def test_key_depends_on_active_index(self, fake_redis):
+        from app.services import result_cache
+
+        filters = {"area": None}
+        _, key = result_cache.get_cached_recommendations("s1", 5, filters)
+        with patch("app.services.result_cache.get_active_index",
+                   return_value={"collection": "jobs__novo__384", "model": "novo"}):
+            _, other = result_cache.get_cached_recommendations("s1", 5, filters)
+        assert other != key
+
+    def test_stats_survive_redis_outage(self, fake_redis):
+        import redis
+        from app.services import result_cache
+
+        fake_redis.hgetall = MagicMock(side_effect=redis.ConnectionError("down"))
+        assert result_cache.cache_stats() == {"available": False}
+
+
+class TestProfileCache:
+
+    @pytest.fixture
+    def fake_redis(self):
+        from app.services import profile_cache
+        fake = FakeRedis()
+        profile_cache._local.clear()
+        with patch("app.services.profile_cache.get_redis", return_value=fake):
+            yield fake
+        profile_cache._local.clear()
+
+    def _row(self):
+        from types import SimpleNamespace
+        return SimpleNamespace(id=7, session_id="s1", query_text="Habilidades: Python",
+                               desired_area="dados", desired_seniority="senior",
+                               skills=["Python", "SQL"], languages=["Inglês"],
+                               adapted_embedding=None, adapted_embedding_model=None,
+                               feedback_ratings=None)
+
+    def test_db_read_once_then_cached(self, fake_redis):
+        from app.services import profile_cache
+
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = self._row()
+
+        first = profile_cache.get_profile(db, "s1")
+        second = profile_cache.get_profile(db, "s1")
+        assert first == second
+        assert first["id"] == 7
+        assert first["summary"].startswith("Habilidades: Python, SQL")
+        assert db.query.call_count == 1
+
+        # Outro processo (LRU local vazio) é servido pelo Redis
+        profile_cache._local.clear()
+        assert profile_cache.get_profile(db, "s1") == first
+        assert db.query.call_count == 1
+
+    def test_invalidate_profile(self, fake_redis):
+        from app.services import profile_cache
+
+        profile_cache.cache_profile(self._row())
+        profile_cache.invalidate_profile("s1")
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = None
+        assert profile_cache.get_profile(db, "s1") is None
+
+    def test_local_copy_checks_version_token(self, fake_redis):
+        from app.services import profile_cache
+
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = self._row()
+        first = profile_cache.get_profile(db, "s1")
+
+        # Outro processo regravou o perfil: o token muda e a cópia local é descartada
+        import json
+        rewritten = {**first, "skills": ["Go"], "cache_version": "other"}
+        fake_redis.set("profile:s1", json.dumps(rewritten))
+        fake_redis.set("profile:ver:s1", "other")
+        assert profile_cache.get_profile(db, "s1")["skills"] == ["Go"]
+
+        # Outro processo invalidou: sem token, volta ao banco
+        fake_redis.delete("profile:s1", "profile:ver:s1")
+        assert profile_cache.get_profile(db, "s1")["skills"] == ["Python", "SQL"]
+        assert db.query.call_count == 2
+
+    def test_ttl_cache_evicts_least_recently_used(self):
+        from app.services.profile_cache import TTLCache
+
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.get("a")
+        cache.set("c", {"v": 3})
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+
+
+class TestProfileRewrite:
+
+    def test_resubmitting_resume_invalidates_cached_profile(self, db_factory):
+        from app.services import profile_cache, recommender
+
+        fake = FakeRedis()
+        profile_cache._local.clear()
+        db = db_factory()
+        parsed = {"skills": ["Python"], "query_text": "Habilidades: Python"}
+        with patch("app.services.profile_cache.get_redis", return_value=fake), \
+                patch.object(recommender, "index_profiles"), \
+                patch.object(recommender, "ensure_query_embeddings", return_value={}):
+            profile = recommender._save_profile(db, parsed)
+            before = recommender.get_profile(db, profile.session_id)
+            assert before["skills"] == ["Python"]
+            profile.feedback_ratings = {"3": 1}
+            profile.adapted_embedding, profile.adapted_embedding_model = b"\0" * 8, "m"
+            db.commit()
+
+            with patch.object(profile_cache, "invalidate_profile",
+                              wraps=profile_cache.invalidate_profile) as invalidate, \
+                    patch.object(recommender, "invalidate_profile", invalidate):
+                recommender._save_profile(
+                    db, {"skills": ["Go"], "query_text": "Habilidades: Go"}, profile.session_id)
+            invalidate.assert_called_once_with(profile.session_id)
+            after = recommender.get_profile(db, profile.session_id)
+            assert after["skills"] == ["Go"]
+            # Notas ficam (vagas avaliadas continuam fora); vetor adaptado do texto antigo sai
+            assert after["rated_job_ids"] == [3] and after["adapted_embedding"] is None
+            # Nova versão do perfil: cache de respostas e top-N noturno não casam mais
+            assert after["profile_version"] != before["profile_version"]
+            with pytest.raises(ValueError):
+                recommender._save_profile(db, parsed, "nao-existe")
+        profile_cache._local.clear()
+
+
+class TestBatchRecommend:
+
+    def test_batch_matches_single_pipeline_and_yields_by_chunk(self, db_factory):
+        from app.models.db_models import Job, UserProfile
+        from app.services import recommender
+        from app.services.embedder import vector_to_bytes
+        from app.services.index_registry import embedding_space, get_active_index
+
+        db = db_factory()
+        space = embedding_space(get_active_index())
+        jobs = [Job(title=f"Vaga {i}", company="ACME", description="x" * 60) for i in range(3)]
+        db.add_all(jobs)
+        db.flush()
+        db.add_all([
+            UserProfile(session_id="s1", query_text="Python", skills=["Python"],
+                        adapted_embedding=vector_to_bytes([0.0, 1.0]),
+                        adapted_embedding_model=space, feedback_ratings={str(jobs[0].id): 1}),
+            UserProfile(session_id="s2", query_text="Go", skills=["Go"]),
+        ])
+        db.commit()
+        ranked = [{"job_id": job.id, "similarity_score": 0.9 - i / 10}
+                  for i, job in enumerate(jobs)]
+
+        with patch.object(recommender.settings, "batch_recommend_chunk_size", 1), \
+                patch.object(recommender, "ensure_query_embeddings",
+                             side_effect=lambda db, rows: {r.id: [1.0, 0.0] for r in rows}), \
+                patch.object(recommender, "search_similar_jobs_batch",
+                             side_effect=lambda queries, **kw: [ranked[:kw["n_results"]]] * len(queries)
+                             ) as search, \
+                patch.object(recommender, "count_indexed_jobs", return_value=3), \
+                patch.object(recommender, "skill_gaps", return_value={}):
+            stream = recommender.recommend_jobs_batch(
+                db, [{"session_id": "s1"}, {"session_id": "s2"}, {"session_id": "x"}],
+                n_results=2)
+            first = next(stream)
+            # Gerador: o 2º bloco ainda não foi buscado
+            assert search.call_count == 1
+            rest = list(stream)
+
+        # Vetor adaptado pelo feedback e vaga avaliada fora, como no /recommend
+        first_queries = search.call_args_list[0].args[0]
+        assert first_queries == [[0.0, 1.0]]
+        assert search.call_args_list[0].kwargs["n_results"] == 3
+        assert [r.job.id for r in first.recommendations] == [jobs[1].id, jobs[2].id]
+        assert [r.job.id for r in rest[0].recommendations] == [jobs[0].id, jobs[1].id]
+        assert rest[1].error == "Perfil não encontrado"
+
+
+class TestFeedbackWriteBehind:
+
+    def _event(self, event_id, job_id, rating=1):
+        import json
+        return {b"event": json.dumps({
+            "event_id": event_id, "profile_id": 1, "job_id": job_id,
+            "rating": rating, "rank_position": 2, "similarity_score": 0.8,
+        }).encode()}
+
+    def test_parse_event_rejects_bad_envelopes(self):
+        from app.services.feedback_stream import _parse_event
+        assert _parse_event(b"nao-e-json") is None
+        assert _parse_event(b'{"event_id": "x", "profile_id": 1, "job_id": 2, "rating": 5}') is None
+        assert _parse_event(self._event("e1", 3)[b"event"])["job_id"] == 3
+
+    def test_flush_bulk_inserts_idempotently(self, db_factory):
+        from app.models.db_models import Job, UserProfile, UserFeedback
+        from app.services import feedback_stream
+        from app.services.index_registry import get_active_index
+
+        db = db_factory()
+        db.add(UserProfile(id=1, session_id="s1"))
+        db.add(Job(id=10, title="Dev", company="ACME", description="x" * 60))
+        db.commit()
+        # Alias em cache: a sessão própria do registry fecharia a conexão única
+        # (StaticPool) no meio do lote e desfaria o insert
+        get_active_index()
+
+        messages = [
+            (b"1-0", self._event("e1", 10)),
+            (b"2-0", self._event("e1", 10)),          # reentrega
+            (b"3-0", self._event("e2", 10, rating=-1)),
+            (b"4-0", self._event("e3", 999)),          # vaga inexistente
+        ]
+        fake = MagicMock()
+        fake.xautoclaim.return_value = [b"0-0", [], []]
+        fake.xreadgroup.side_effect = [[[b"feedback:events", messages]], []]
+
+        with patch.object(feedback_stream, "get_redis", return_value=fake):
+            inserted = feedback_stream.flush_feedback_stream(db, consumer="w1")
+            # Reprocessar o mesmo lote (at-least-once) não duplica linhas
+            fake.xreadgroup.side_effect = [[[b"feedback:events", messages]], []]
+            assert feedback_stream.flush_feedback_stream(db, consumer="w1") == 0
+
+        assert inserted == 2
+        assert db.query(UserFeedback).count() == 2
+        acked = fake.xack.call_args_list[0].args[2:]
+        assert acked == (b"1-0", b"2-0", b"3-0", b"4-0")
+
+
+class TestEvaluation:
+
+    def test_compute_metrics_known_values(self):
+        import numpy as np
+        from app.services.evaluation import compute_metrics
+
+        # Perfil 1: relevantes nas posições 1 e 3; perfil 2: só a posição 2 (irrelevante)
+        metrics = compute_metrics(
+            profile_ids=np.array([1, 1, 1, 2]),
+            positions=np.array([1, 2, 3, 2]),
+            relevant=np.array([1, 0, 1, 0]),
+            ks=(3,),
+        )
+        assert list(metrics["profile_id"]) == [1, 2]
+        assert metrics["mrr"].tolist() == [1.0, 0.0]
+        assert metrics["precision@3"][0] == pytest.approx(2 / 3)
+        assert metrics["precision@3"][1] == 0.0
+        assert metrics["recall@3"][0] == 1.0
+        assert np.isnan(metrics["recall@3"][1])
+        ideal = 1 + 1 / np.log2(3)
+        assert metrics["ndcg@3"][0] == pytest.approx((1 + 1 / np.log2(4)) / ideal)
+
+    def test_evaluate_slices_by_model(self, db_factory):
+        from app.models.db_models import Job, UserProfile, UserFeedback
+        from app.services.evaluation import evaluate
+
+        db = db_factory()
+        db.add_all([UserProfile(id=1, session_id="s1"),
+                    Job(id=1, title="Dev", company="A", description="x" * 60)])
+        db.add_all([
+            UserFeedback(profile_id=1, job_id=1, rating=1, rank_position=1, embedding_model="a"),
+            UserFeedback(profile_id=1, job_id=1, rating=-1, rank_position=1, embedding_model="b"),
+            UserFeedback(profile_id=1, job_id=1, rating=1, rank_position=2, embedding_model="b"),
+        ])
+        db.commit()
+
+        report = {row["model"]: row for row in evaluate(db, ks=(5,), by_model=True)}
+        assert report["a"]["mrr"] == 1.0
+        assert report["b"]["mrr"] == 0.5
+        assert evaluate(db, ks=(5,))[0]["profiles"] == 1
+
+
+class TestPrecompute:
+
+    def test_streaming_topk_matches_brute_force(self):
+        import numpy as np
+        from app.services.precompute import streaming_topk
+
+        rng = np.random.default_rng(0)
+        queries = rng.standard_normal((7, 16)).astype(np.float32)
+        jobs = rng.standard_normal((1000, 16)).astype(np.float32)
+
+        index, scores = streaming_topk(queries, jobs, k=10, block=128)
+        expected = np.argsort(-(queries @ jobs.T), axis=1)[:, :10]
+        assert index.tolist() == expected.tolist()
+        assert np.all(np.diff(scores, axis=1) <= 0)
+
+    def test_get_precomputed_requires_full_list(self):
+        from app.services.precompute import get_precomputed
+
+        fake = MagicMock()
+        fake.zrevrange.return_value = [(b"42", 0.91), (b"7", 0.8)]
+        with patch("app.services.precompute.get_redis", return_value=fake), \
+             patch("app.services.precompute.get_active_index",
+                   return_value={"collection": "jobs__v1"}):
+            assert get_precomputed("s1", 2, "p1") == [
+                {"job_id": 42, "similarity_score": 0.91},
+                {"job_id": 7, "similarity_score": 0.8},
+            ]
+            fake.zrevrange.return_value = [(b"42", 0.91)]
+            assert get_precomputed("s1", 2, "p1") is None
+        fake.zrevrange.assert_called_with("reco:top:jobs__v1:s1:p1", 0, 1, withscores=True)
+
+    def test_profiles_with_feedback_use_adapted_vector(self):
+        import numpy as np
+        from types import SimpleNamespace
+        from app.services import precompute
+        from app.services.embedder import vector_to_bytes
+        from app.services.index_registry import embedding_space
+
+        index = {"collection": "jobs", "model": "m", "dimension": 2}
+        content = {"query_text": "Habilidades: Python", "skills": ["Python"],
+                   "desired_area": None, "desired_seniority": None}
+        rated = SimpleNamespace(
+            id=1, session_id="s1", adapted_embedding=vector_to_bytes([0.0, 1.0]),
+            adapted_embedding_model=embedding_space(index), feedback_ratings={"2": 1}, **content)
+        plain = SimpleNamespace(id=2, session_id="s2", adapted_embedding=None,
+                                adapted_embedding_model=None, feedback_ratings=None, **content)
+        db = MagicMock()
+        db.query.return_value.options.return_value.filter.return_value.order_by.return_value \
+            .limit.return_value.all.side_effect = [[rated, plain], []]
+        pipe = MagicMock()
+        with patch.object(precompute, "get_redis", return_value=MagicMock(pipeline=lambda **kw: pipe)), \
+                patch.object(precompute, "ensure_query_embeddings",
+                             return_value={1: [1.0, 0.0], 2: [1.0, 0.0]}):
+            written = precompute._precompute_profiles(
+                db, index, np.array([10, 20]), np.eye(2, dtype=np.float32), top_n=1)
+
+        assert written == 2
+        tops = {call.args[0]: list(call.args[1]) for call in pipe.zadd.call_args_list}
+        version = precompute.profile_version(rated)
+        feedback = precompute.feedback_version({"2": 1})
+        assert tops == {f"reco:top:jobs:s1:{version}:{feedback}": [20],
+                        f"reco:top:jobs:s2:{version}": [10]}
+
+    def test_spilled_matrix_uses_private_scratch_dir(self):
+        import os
+        from app.services import precompute
+
+        page = {"ids": ["j1", "j2"], "embeddings": [[1.0, 0.0], [0.0, 1.0]],
+                "metadatas": [{"job_id": 1}, {"job_id": 2}]}
+        seen = {}
+
+        def profiles(db, index, job_ids, job_matrix, top_n):
+            seen["path"] = job_matrix.filename
+            assert os.path.exists(seen["path"])
+            return len(job_ids)
+
+        # Teto zero força o memmap
+        with patch.object(precompute.settings, "precompute_memory_mb", 0), \
+             patch("app.services.precompute.get_active_index", return_value={"collection": "jobs"}), \
+             patch("app.services.precompute.count_indexed_jobs", return_value=2), \
+             patch("app.services.precompute._collection_count", return_value=2), \
+             patch("app.services.precompute._run_on_index", return_value=page), \
+             patch("app.services.precompute._precompute_profiles", side_effect=profiles):
+            assert precompute.precompute_recommendations(MagicMock()) == 2
+
+        assert os.path.basename(seen["path"]).startswith("precompute_jobs-")
+        assert not os.path.exists(os.path.dirname(seen["path"]))
+
+
+class TestFilterPlanner:
+
+    def _stats(self):
+        import numpy as np
+        return {
+            "total": 100_000,
+            "facets": {
+                "area": {"dados": 20_000, "design": 500},
+                "seniority": {"senior": 30_000},
+                "city": {"sao-paulo": 40_000, "recife": 1_000},
+                "remote": {"true": 30_000, "false": 70_000},
+            },
+            "skills": {"skill_python": 25_000, "skill_rust": 300},
+            "salaried": 50_000,
+            "salary_low": np.linspace(1_000, 20_000, 50_000),
+            "salary_high": np.linspace(2_000, 30_000, 50_000),
+        }
+
+    def test_selectivity_picks_strategy(self):
+        from app.services import filter_planner as fp
+
+        with patch.object(fp, "get_facet_stats", return_value=self._stats()):
+            assert fp.plan_search({"area": "dados"}, 10)["strategy"] == fp.ANN
+            overfetch = fp.plan_search({"area": "dados", "skills": ["Python"]}, 10)
+            assert overfetch["strategy"] == fp.ANN_OVERFETCH
+            assert overfetch["n_fetch"] == 200  # 10 / (0.2 * 0.25)
+            assert fp.plan_search({"skills": ["Rust"]}, 10)["strategy"] == fp.EXACT
+            assert fp.plan_search({"area": None}, 10)["strategy"] == fp.ANN
+
+    def test_stats_round_trip_through_redis(self):
+        import numpy as np
+        from app.services import filter_planner as fp
+
+        stats = {**self._stats(), "salary_low": np.linspace(1_000, 20_000, fp.SALARY_QUANTILES),
+                 "salary_high": np.linspace(2_000, 30_000, fp.SALARY_QUANTILES)}
+        fake = FakeRedis()
+        fp.invalidate_facet_stats()
+        with patch.object(fp, "get_redis", return_value=fake), \
+                patch.object(fp, "load_facet_stats", return_value=stats):
+            # Nada publicado: o planner não varre o banco no request
+            assert fp.plan_search({"skills": ["Rust"]}, 10)["strategy"] == fp.ANN
+            fp.publish_facet_stats()
+            assert fp.plan_search({"skills": ["Rust"]}, 10)["strategy"] == fp.EXACT
+            # Bools sobrevivem ao JSON: remoto continua com 30% das vagas
+            remote = fp.plan_search({"remote": True}, 10)
+            assert remote["strategy"] == fp.ANN and remote["selectivity"] == 0.3
+            assert fp.get_facet_stats()["facets"]["area"]["design"] == 500
+        fp.invalidate_facet_stats()
+
+    def test_where_includes_salary_and_skills(self):
+        from app.services.embedder import _build_where
+
+        where = _build_where(filter_salary_min=5000, filter_skills=["Node.js"])
+        assert where == {"$and": [
+            {"salary_max": {"$gte": 5000.0}},
+            {"skill_node_js": {"$eq": True}},
+        ]}
+
+    def test_legacy_collection_refuses_salary_and_skill_filters(self):
+        from app.services.embedder import _build_where
+
+        assert _build_where("dados", faceted=False) == {"area": {"$eq": "dados"}}
+        with pytest.raises(ValueError):
+            _build_where(filter_skills=["Python"], faceted=False)
+
+    def test_exact_search_pages_through_all_matches(self):
+        from app.services import embedder
+
+        pages = [
+            {"ids": ["job_1", "job_2"], "embeddings": [[1.0, 0.0], [0.8, 0.6]],
+             "metadatas": [{"job_id": "1"}, {"job_id": "2"}]},
+            {"ids": ["job_3"], "embeddings": [[0.0, 1.0]], "metadatas": [{"job_id": "3"}]},
+        ]
+        with patch.object(embedder.settings, "filter_exact_page_size", 2), \
+                patch.object(embedder, "_run_on_index", side_effect=pages) as get:
+            out = embedder._exact_search({}, [0.0, 1.0], 2, {"area": {"$eq": "dados"}})
+        assert [r["job_id"] for r in out] == [3, 2]
+        assert get.call_count == 2
+
+    def test_exact_search_ranks_filtered_subset(self):
+        from app.services import embedder
+
+        subset = {
+            "ids": ["job_1", "job_2", "job_3"],
+            "embeddings": [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]],
+            "metadatas": [{"job_id": "1"}, {"job_id": "2"}, {"job_id": "3"}],
+        }
+        with patch.object(embedder, "_run_on_index", return_value=subset):
+            out = embedder._exact_search({}, [0.0, 1.0], 2, {"area": {"$eq": "dados"}})
+        assert [r["job_id"] for r in out] == [2, 3]
+        assert out[0]["similarity_score"] == 1.0
+
+    def test_short_ann_page_falls_back_to_exact(self):
+        from app.services import embedder, filter_planner as fp
+
+        plan = {"strategy": fp.ANN, "selectivity": 0.3, "estimated_matches": 30_000, "n_fetch": 10}
+        with patch.object(embedder, "plan_search", return_value=plan), \
+                patch.object(embedder, "_query_index", return_value=[[{"job_id": 1}]]) as ann, \
+                patch.object(embedder, "_exact_search", return_value=["exact"]) as exact:
+            out = embedder._planned_search({}, [0.1], 10, {"area": "dados"})
+        assert out == ["exact"]
+        assert [c.args[2] for c in ann.call_args_list] == [10, 40, 160, 640, 1000]
+        exact.assert_called_once()
+
+
+class TestLocation:
+
+    def test_normalize_variants_to_same_facets(self):
+        from app.services.location import normalize_location
+
+        a = normalize_location("São Paulo, SP")
+        b = normalize_location("Sao Paulo - Brazil (Híbrido)")
+        assert (a["city"], a["state"], a["country"]) == ("sao-paulo", "sp", "br")
+        assert (b["city"], b["country"]) == ("sao-paulo", "br")
+        assert a["lat"] == pytest.approx(-23.55, abs=0.01)
+        assert normalize_location("Remoto - Brasil")["remote"] is True
+        assert normalize_location("Belo Horizonte, Minas Gerais")["state"] == "mg"
+
+    def test_geohash_known_value(self):
+        from app.services.location import geohash_encode
+        # Valor de referência clássico (Jutland, Dinamarca)
+        assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+    def test_radius_uses_geohash_cells_that_cover_neighbours(self):
+        from app.services.location import location_clauses, location_metadata
+
+        (clause,) = location_clauses("São Paulo, SP", radius_km=120)
+        (field, condition), = clause.items()
+        assert field == "geohash_3" and len(condition["$in"]) == 9
+        # Campinas fica a ~85 km: sua célula precisa estar entre as consultadas
+        assert location_metadata("Campinas, SP")[field] in condition["$in"]
+
+    def test_radius_beyond_coarsest_cell_is_rejected(self):
+        from pydantic import ValidationError
+        from app.models.schemas import RecommendRequest
+        from app.services.location import MAX_RADIUS_KM, location_clauses
+
+        with pytest.raises(ValueError):
+            location_clauses("São Paulo, SP", radius_km=MAX_RADIUS_KM + 1)
+        with pytest.raises(ValidationError):
+            RecommendRequest(session_id="s1", filter_location="Recife", filter_radius_km=900)
+
+    def test_legacy_collection_keeps_substring_location(self):
+        from app.services.embedder import _build_where
+
+        assert _build_where(filter_location="São Paulo", faceted=False) == {
+            "location": {"$contains": "São Paulo"}}
+        with pytest.raises(ValueError):
+            _build_where(filter_location="São Paulo", filter_radius_km=50, faceted=False)
+
+    def test_equality_clauses_without_radius(self):
+        from app.services.location import location_clauses
+
+        assert location_clauses("Recife - PE", remote=False) == [
+            {"remote": {"$eq": False}},
+            {"city": {"$eq": "recife"}},
+            {"state": {"$eq": "pe"}},
+            {"country": {"$eq": "br"}},
+        ]
+
+    def test_remote_only_location_filters_remote(self):
+        from app.services.location import location_clauses
+
+        for text in ("Remoto", "Remote", "Home office"):
+            assert location_clauses(text) == [{"remote": {"$eq": True}}]
+        # Filtro explícito de remoto prevalece
+        assert location_clauses("Remoto", remote=True) == [{"remote": {"$eq": True}}]
+
+
+class TestSharding:
+
+    @pytest.fixture
+    def area_shards(self):
+        from app.services import sharding
+        with patch.object(sharding.settings, "shard_mode", "area"), \
+                patch.object(sharding.settings, "shard_areas", ["dados", "design"]):
+            yield sharding
+
+    def test_area_filter_routes_to_single_shard(self, area_shards):
+        index = {"collection": "jobs__minilm__384", "model": "m", "dimension": 384}
+        assert [s["collection"] for s in area_shards.shards_for_area(index, "dados")] == [
+            "jobs__minilm__384__s-dados"]
+        assert area_shards.shard_key("Marketing", 1) == "outros"
+        assert len(area_shards.shards_for_area(index, None)) == 3
+
+    def test_unfiltered_query_fans_out_and_merges(self, area_shards):
+        from app.services import embedder
+
+        def fake_run(shard, fn):
+            name = shard["collection"].rsplit("-", 1)[-1]
+            distances = {"dados": [0.1, 0.5], "design": [0.2], "outros": [0.3, 0.4]}[name]
+            return {
+                "ids": [[f"{name}_{i}" for i in range(len(distances))]],
+                "distances": [distances],
+                "metadatas": [[{"job_id": str(int(d * 10))} for d in distances]],
+            }
+
+        active = {"collection": "jobs", "model": "m", "dimension": None}
+        with patch.object(embedder, "_collection_count", return_value=10), \
+                patch.object(embedder, "_run_on_index", side_effect=fake_run) as run:
+            out = embedder._query_index(active, [[0.1]], 3, None)
+        assert run.call_count == 3
+        assert [r["job_id"] for r in out[0]] == [1, 2, 3]
+
+    def test_upsert_removes_job_from_previous_shard(self, area_shards):
+        from app.services import embedder
+
+        collections = {name: MagicMock() for name in (
+            "jobs__s-dados", "jobs__s-design", "jobs__s-outros")}
+        for name, collection in collections.items():
+            # A vaga estava indexada em "design" antes de mudar de área
+            stored = ["job_1"] if name in ("jobs__s-dados", "jobs__s-design") else []
+            collection.get.return_value = {"ids": stored}
+
+        def fake_run(shard, fn):
+            return fn(collections[shard["collection"]])
+
+        with patch.object(embedder, "_run_on_index", side_effect=fake_run), \
+                patch.object(embedder, "bump_index_version"):
+            embedder._upsert(
+                {"collection": "jobs", "model": "m", "dimension": None},
+                ids=["job_1"], embeddings=[[0.1]], documents=["x"],
+                metadatas=[{"job_id": "1", "area": "dados"}],
+            )
+        collections["jobs__s-dados"].upsert.assert_called_once()
+        collections["jobs__s-design"].delete.assert_called_once_with(ids=["job_1"])
+        collections["jobs__s-dados"].delete.assert_not_called()
+        collections["jobs__s-outros"].delete.assert_not_called()
+
+    def test_layout_match_ignores_other_bases_sharing_a_prefix(self, area_shards):
+        sharding = area_shards
+        client = MagicMock()
+        client.get_collection.side_effect = lambda name: MagicMock(
+            metadata={"shard_of": "jobs__ab" if name.startswith("jobs__ab") else "jobs__a"})
+        known = {sharding.shard_index({"collection": "jobs__ab"}, k)["collection"]
+                 for k in sharding.shard_keys()}
+        with patch.object(sharding.chroma_manager, "client", return_value=client):
+            assert sharding._is_layout_of("jobs__ab__s-dados", "jobs__ab", known)
+            # Shard de uma área que saiu da configuração: reconhecido pelo metadado
+            assert sharding._is_layout_of("jobs__ab__s-legado", "jobs__ab", known)
+            # "jobs__a" é prefixo de "jobs__ab", mas o shard é de outra base
+            assert not sharding._is_layout_of("jobs__a__s-dados", "jobs__ab", known)
+
+
+class TestQuantizedIndex:
+
+    def _vectors(self, n=2000, dim=32):
+        import numpy as np
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_int8_rescoring_matches_exact_topk(self):
+        import numpy as np
+        from app.services.quantized_index import QuantizedIndex, quantize_int8
+
+        vectors = self._vectors()
+        codes, scales = quantize_int8(vectors)
+        assert codes.dtype == np.int8
+        assert np.abs(codes * scales - vectors).max() <= scales.max() / 2 + 1e-6
+
+        index = QuantizedIndex(codes, vectors, np.arange(100, 100 + len(vectors)), scales)
+        query = vectors[5]
+        expected = (np.argsort(-(vectors @ query))[:10] + 100).tolist()
+        found = index.search(query, 10, rescore_factor=4)
+        assert [job_id for job_id, _ in found] == expected
+        assert found[0] == (105, pytest.approx(1.0, abs=1e-5))
+
+    def test_build_and_load_roundtrip(self, tmp_path):
+        import numpy as np
+        from app.services import quantized_index
+
+        vectors = self._vectors(n=50)
+        active = {"collection": "jobs", "model": "m", "dimension": None}
+        with patch("app.services.precompute.load_job_matrix",
+                   return_value=(np.arange(50), vectors)):
+            manifest = quantized_index.build_quantized_index(
+                active, output_dir=str(tmp_path / "q"), mode="float16")
+        assert manifest["count"] == 50 and manifest["dimension"] == 32
+
+        with patch.object(quantized_index.settings, "quantized_index_enabled", True), \
+                patch.object(quantized_index.settings, "quantized_index_dir", str(tmp_path / "q")):
+            loaded = quantized_index.get_quantized_index(active)
+            assert loaded.codes.dtype == np.float16
+            assert loaded.search(vectors[3], 1)[0][0] == 3
+            assert quantized_index.get_quantized_index({**active, "collection": "outra"}) is None
+
+    def test_rebuild_swaps_pointer_and_tolerates_broken_build(self, tmp_path):
+        import os
+        import numpy as np
+        from app.services import quantized_index
+
+        root = str(tmp_path / "q")
+        active = {"collection": "jobs", "model": "m", "dimension": None}
+        builds = []
+        for n in (10, 20, 30):
+            with patch("app.services.precompute.load_job_matrix",
+                       return_value=(np.arange(n), self._vectors(n=n))):
+                quantized_index.build_quantized_index(active, output_dir=root, mode="int8")
+            builds.append(quantized_index.current_build_dir(root))
+        assert len(set(builds)) == 3
+        # Só os KEEP_BUILDS mais recentes ficam em disco
+        assert sorted(os.listdir(os.path.join(root, "builds"))) == sorted(
+            os.path.basename(b) for b in builds[-quantized_index.KEEP_BUILDS:])
+
+        with patch.object(quantized_index.settings, "quantized_index_enabled", True), \
+                patch.object(quantized_index.settings, "quantized_index_dir", root):
+            assert len(quantized_index.get_quantized_index(active).codes) == 30
+            os.remove(os.path.join(builds[-1], "codes.npy"))
+            quantized_index._loaded.clear()
+            assert quantized_index.get_quantized_index(active) is None
+
+    def test_jobs_indexed_after_build_are_merged(self):
+        from app.services import embedder
+
+        quantized = MagicMock(manifest={"built_at": "2026-01-01T00:00:00+00:00"})
+        quantized.search.return_value = [(1, 0.9), (2, 0.5), (3, 0.1)]
+        fresh = [{"embedding_id": "job_9", "job_id": 9, "similarity_score": 0.8,
+                  "title": "Nova", "company": "ACME"},
+                 {"embedding_id": "job_2", "job_id": 2, "similarity_score": 0.99,
+                  "title": "Editada", "company": "ACME"}]
+        with patch.object(embedder, "_exact_search", return_value=fresh) as exact:
+            out = embedder._quantized_search({"collection": "jobs"}, quantized, [0.1], 3)
+        assert [r["job_id"] for r in out] == [2, 1, 9]
+        (field, condition), = exact.call_args.args[3].items()
+        assert field == "indexed_at" and condition["$gt"] > 0
+
+    def test_build_task_skipped_when_disabled(self):
+        from app.services import tasks
+
+        with patch.object(tasks.settings, "quantized_index_enabled", False), \
+                patch("app.services.quantized_index.build_quantized_index") as build:
+            assert tasks.build_quantized_index_task()["status"] == "skipped"
+        build.assert_not_called()
+
+class TestProjection:
+
+    def _low_rank(self, n=600, dim=48, rank=8):
+        import numpy as np
+        rng = np.random.default_rng(3)
+        vectors = rng.standard_normal((n, rank)) @ rng.standard_normal((rank, dim))
+        vectors += 0.01 * rng.standard_normal((n, dim))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    def test_fit_apply_and_evaluate(self):
+        import numpy as np
+        from app.services.projection import apply_projection, evaluate_projection, fit_pca
+
+        vectors = self._low_rank()
+        fitted = fit_pca(vectors[:500], 8)
+        assert fitted["explained_variance"] > 0.99
+        reduced = apply_projection(vectors[:3], fitted)
+        assert reduced.shape == (3, 8)
+        assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+
+        report = evaluate_projection(vectors[500:], vectors[500:520], fitted, k=5)
+        assert report["recall@5"] >= 0.9 and report["dimension"] == 8
+        assert report["bytes_per_vector"] * 6 == report["full_bytes_per_vector"]
+
+    def test_save_load_roundtrip(self, tmp_path):
+        from app.services.projection import fit_pca, load_projection, save_projection
+
+        fitted = fit_pca(self._low_rank(), 4)
+        name = save_projection(fitted, "modelo-x", sample_size=600, directory=str(tmp_path))
+        assert name.startswith("pca4-")
+        loaded = load_projection(name, str(tmp_path))
+        assert loaded["model"] == "modelo-x" and loaded["dimension"] == 4
+        assert loaded["components"].shape == (4, 48)
+
+    def test_projection_changes_collection_and_space(self):
+        from app.services.index_registry import embedding_space, make_index
+
+        plain = make_index("org/modelo", 768)
+        projected = make_index("org/modelo", 256, "pca256-abcdef12")
+        assert "projection" not in plain
+        assert projected["collection"] != plain["collection"]
+        assert embedding_space(plain) == "org/modelo"
+        assert embedding_space(projected) == "org/modelo#pca256-abcdef12"
+
+
+class TestHybridSearch:
+
+    def _jobs(self, db):
+        from app.models.db_models import Job
+        jobs = [
+            Job(title="Desenvolvedor Kotlin", company="A", description="Apps Android",
+                area="engenharia", location="São Paulo, SP", skills=["Kotlin"]),
+            Job(title="SRE", company="B", description="Kubernetes e Kotlin em produção",
+                area="engenharia", location="Recife, PE", skills=["Kubernetes"]),
+            Job(title="Designer", company="C", description="Figma", area="design"),
+        ]
+        db.add_all(jobs)
+        db.commit()
+        return jobs
+
+    def test_reciprocal_rank_fusion(self):
+        from app.services.lexical import reciprocal_rank_fusion
+        fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+        assert [job_id for job_id, _ in fused] == [1, 3, 2]
+        assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+    def test_matches_where(self):
+        from app.services.lexical import matches_where
+        metadata = {"area": "dados", "salary_max": 9000.0, "geohash_3": "6gy"}
+        assert matches_where(metadata, {"$and": [
+            {"area": {"$eq": "dados"}}, {"salary_max": {"$gte": 5000.0}},
+            {"geohash_3": {"$in": ["6gy", "6gz"]}},
+        ]})
+        assert not matches_where(metadata, {"skill_kotlin": {"$eq": True}})
+
+    def test_keyword_search_title_first_with_filters(self, db_factory):
+        from app.services.lexical import keyword_search
+        db = db_factory()
+        kotlin, sre, _ = self._jobs(db)
+        hits = keyword_search(db, "kotlin", 10)
+        assert [h["job_id"] for h in hits] == [kotlin.id, sre.id]
+        filtered = keyword_search(db, "kotlin", 10, {"location": "Recife"})
+        assert [h["job_id"] for h in filtered] == [sre.id]
+
+    def test_hybrid_fuses_dense_and_lexical(self, db_factory):
+        from app.services import lexical
+        db = db_factory()
+        kotlin, sre, designer = self._jobs(db)
+        dense = [{"job_id": designer.id, "similarity_score": 0.9},
+                 {"job_id": kotlin.id, "similarity_score": 0.8}]
+        keywords = lexical.profile_keyword_query({"skills": ["Kotlin", "machine learning"]})
+        assert keywords == 'Kotlin or "machine learning"'
+        with patch.object(lexical, "search_similar_jobs", return_value=dense) as search:
+            results = lexical.hybrid_search(db, "texto", "Kotlin", 3, {"area": None})
+        assert search.call_args.kwargs == {"filter_area": None, "query_embedding": None}
+        assert [r["job_id"] for r in results] == [kotlin.id, designer.id, sre.id]
+        assert results[2]["similarity_score"] == 0.0 and results[0]["fusion_score"] > 0
+
+
+class TestSkillIndex:
+
+    def test_encode_and_popcount(self):
+        import numpy as np
+        from app.services.skill_index import WORDS, decode_rows, encode_skills, popcount
+
+        words = encode_skills(["python", "Kotlin", "SOLID", "Cobol"])
+        assert words.shape == (WORDS,) and words.dtype == np.uint64
+        assert popcount(words[None, :]).tolist() == [3]
+        assert decode_rows(words[None, :]) == [["Python", "Kotlin", "SOLID"]]
+        assert popcount(np.zeros((0, WORDS), dtype=np.uint64)).tolist() == []
+
+    def test_score_overlap_and_gaps(self):
+        from app.services.skill_index import SkillBitsetIndex, decode_rows
+
+        index = SkillBitsetIndex()
+        index.upsert(10, ["Python", "Django", "Docker"])
+        index.upsert(7, ["Figma"])
+        index.upsert(10, ["Python", "Django", "AWS"])  # atualização sobrescreve a linha
+        scores = index.score([10, 99, 7], ["Python", "Docker"])
+        assert scores["indexed"].tolist() == [True, False, True]
+        assert scores["overlap"].tolist() == [1, 0, 0]
+        assert scores["jaccard"][0] == pytest.approx(1 / 4)
+        assert decode_rows(scores["missing"])[0] == ["Django", "AWS"]
+
+    def test_refresh_is_incremental(self, db_factory):
+        from app.models.db_models import Job
+        from app.services.skill_index import SkillBitsetIndex
+
+        db = db_factory()
+        db.add(Job(title="A", company="X", description="d", skills=["Python"]))
+        db.commit()
+        index = SkillBitsetIndex()
+        assert index.refresh(db, force=True) == 1
+        db.add(Job(title="B", company="X", description="d", skills=["Go"]))
+        db.commit()
+        assert index.refresh(db, force=True) == 1 and len(index) == 2
+
+    def test_rerank_by_skills(self):
+        from app.services import skill_index as module
+
+        index = module.SkillBitsetIndex()
+        index.upsert(1, ["Java"])
+        index.upsert(2, ["Python", "SQL"])
+        similar = [{"job_id": 1, "similarity_score": 0.80},
+                   {"job_id": 2, "similarity_score": 0.75}]
+        with patch.object(module, "get_skill_index", return_value=index):
+            reranked = module.rerank_by_skills(None, similar, ["Python", "SQL"], weight=0.1)
+        assert [s["job_id"] for s in reranked] == [2, 1]
+
+    def test_hybrid_boost_keeps_fusion_order(self):
+        from app.services import skill_index as module
+
+        index = module.SkillBitsetIndex()
+        index.upsert(1, ["Java"])
+        index.upsert(2, ["Python"])
+        index.upsert(3, ["Python", "SQL"])
+        # Vaga 1 lidera pelo RRF (só textual); a similaridade densa diria o contrário
+        similar = [{"job_id": 1, "similarity_score": 0.0, "fusion_score": 0.032},
+                   {"job_id": 2, "similarity_score": 0.9, "fusion_score": 0.016},
+                   {"job_id": 3, "similarity_score": 0.5, "fusion_score": 0.030}]
+        with patch.object(module, "get_skill_index", return_value=index):
+            fused = module.rerank_by_skills(None, similar, ["Python", "SQL"], weight=0.1,
+                                            score_key="fusion_score")
+            dense = module.rerank_by_skills(None, similar, ["Python", "SQL"], weight=0.1)
+        assert [s["job_id"] for s in fused] == [3, 1, 2]
+        assert [s["job_id"] for s in dense] == [2, 3, 1]
+
+
+class TestReranker:
+
+    @pytest.fixture
+    def reranker(self):
+        from app.services import reranker
+        model = MagicMock()
+        # Score do cross-encoder = tamanho do texto da vaga
+        model.predict.side_effect = lambda pairs, **kw: [float(len(t)) for _, t in pairs]
+        fake = FakeRedis()
+        with patch.object(reranker, "get_cross_encoder", return_value=model), \
+                patch.object(reranker, "get_redis", return_value=fake), \
+                patch.object(reranker, "_ms_per_pair", 1.0):
+            yield reranker, model
+
+    def _candidates(self):
+        return [{"job_id": i, "similarity_score": 0.9 - i / 100} for i in range(4)]
+
+    def test_reorders_by_cross_encoder_and_caches(self, reranker):
+        module, model = reranker
+        texts = ["a", "aaa", "aa", "aaaa"]
+        ranked, stats = module.rerank("perfil", self._candidates(), texts, budget_ms=1000)
+        assert [c["job_id"] for c in ranked] == [3, 1, 2, 0]
+        assert stats["reranked"] == 4 and not stats["budget_exhausted"]
+
+        ranked, stats = module.rerank("perfil", self._candidates(), texts, budget_ms=1000)
+        assert stats["cached"] == 4 and stats["scored"] == 0
+        assert model.predict.call_count == 1
+
+    def test_budget_limits_reranked_prefix(self, reranker):
+        module, model = reranker
+        with patch.object(module, "_ms_per_pair", 400.0):
+            ranked, stats = module.rerank(
+                "perfil", self._candidates(), ["a", "aaa", "aa", "aaaa"], budget_ms=1000)
+        # Cabem 2 pares: só o prefixo [0, 1] é reordenado; o resto fica na ordem original
+        assert [c["job_id"] for c in ranked] == [1, 0, 2, 3]
+        assert stats["scored"] == 2 and stats["budget_exhausted"]
+        assert "rerank_score" not in ranked[2]
+
+    def test_warmup_loads_model_without_touching_the_cost_estimate(self, reranker):
+        module, model = reranker
+        module.warm_cross_encoder()
+        model.predict.assert_called_once()
+        assert module._ms_per_pair == 1.0
+
+
+class TestDiversity:
+
+    def test_mmr_skips_near_duplicates(self):
+        import numpy as np
+        from app.services.diversity import mmr
+
+        vectors = np.array([[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]], dtype=np.float32)
+        relevance = np.array([0.9, 0.89, 0.5], dtype=np.float32)
+        assert mmr(relevance, vectors, 2, lambda_=1.0) == [0, 1]
+        assert mmr(relevance, vectors, 2, lambda_=0.5) == [0, 2]
+
+    def test_company_cap(self):
+        import numpy as np
+        from app.services.diversity import diversify
+
+        candidates = [{"job_id": i, "similarity_score": 0.9 - i / 100} for i in range(4)]
+        vectors = {i: np.eye(4, dtype=np.float32)[i] for i in range(4)}
+        picked = diversify(candidates, vectors, 3, lambda_=1.0,
+                           companies=["ACME", "acme", "ACME", "Beta"], max_per_company=2)
+        assert [c["job_id"] for c in picked] == [0, 1, 3]
+
+    def test_rank_relevance_follows_previous_stage(self):
+        import numpy as np
+        from app.services.diversity import diversify
+
+        # Ordem do rerank: a vaga 2 subiu, apesar da menor similaridade densa
+        candidates = [{"job_id": 2, "similarity_score": 0.6},
+                      {"job_id": 0, "similarity_score": 0.9},
+                      {"job_id": 1, "similarity_score": 0.8}]
+        vectors = {i: np.eye(3, dtype=np.float32)[i] for i in range(3)}
+        by_rank = diversify(candidates, vectors, 3, lambda_=0.9, by_rank=True)
+        dense = diversify(candidates, vectors, 3, lambda_=0.9)
+        assert [c["job_id"] for c in by_rank] == [2, 0, 1]
+        assert [c["job_id"] for c in dense] == [0, 1, 2]
+
+    def test_200_candidates_is_fast(self):
+        import time
+        import numpy as np
+        from app.services.diversity import mmr
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((200, 768)).astype(np.float32)
+        started = time.perf_counter()
+        chosen = mmr(rng.random(200).astype(np.float32), vectors, 50, 0.7)
+        assert len(set(chosen)) == 50
+        assert time.perf_counter() - started < 0.05
+
+
+class TestPersonalization:
+
+    def _profile(self, db):
+        from app.models.db_models import UserProfile
+        from app.services.embedder import vector_to_bytes
+        profile = UserProfile(session_id="s-rocchio", query_text="Habilidades: Python",
+                              query_embedding=vector_to_bytes([1.0, 0.0, 0.0]),
+                              query_embedding_model="m")
+        db.add(profile)
+        db.commit()
+        return profile
+
+    def test_feedback_moves_vector_and_rerating_replaces(self, db_factory):
+        import numpy as np
+        from app.services import personalization
+        from app.services.embedder import bytes_to_vector
+        from app.services.profile_cache import profile_projection
+
+        db = db_factory()
+        profile = self._profile(db)
+        job_vectors = {1: np.array([0.0, 1.0, 0.0], dtype=np.float32),
+                       2: np.array([0.0, 0.0, 1.0], dtype=np.float32)}
+        with patch.object(personalization, "get_active_index",
+                          return_value={"collection": "jobs", "model": "m"}), \
+                patch("app.services.embedder.get_active_index",
+                      return_value={"collection": "jobs", "model": "m"}), \
+                patch.object(personalization, "get_job_embeddings",
+                             side_effect=lambda ids: {i: job_vectors[i] for i in ids}):
+            assert personalization.apply_feedback(db, profile.id, [(1, 1), (2, -1)]) == "s-rocchio"
+            adapted = bytes_to_vector(profile.adapted_embedding)
+            assert adapted[1] > 0 > adapted[2]
+            assert np.linalg.norm(adapted) == pytest.approx(1.0, abs=1e-5)
+
+            # Mudou de ideia sobre a vaga 2: a contribuição negativa sai
+            personalization.apply_feedback(db, profile.id, [(2, 0)])
+            adapted = bytes_to_vector(profile.adapted_embedding)
+            assert adapted[2] == pytest.approx(0.0, abs=1e-6)
+            projection = profile_projection(profile)
+            assert projection["rated_job_ids"] == [1, 2]
+            assert personalization.adapted_query(projection) == pytest.approx(adapted.tolist())
+            assert projection["feedback_version"]
+
+    def test_adapted_query_ignores_other_space(self):
+        from app.services import personalization
+        with patch.object(personalization, "get_active_index",
+                          return_value={"collection": "jobs", "model": "novo"}):
+            assert personalization.adapted_query(
+                {"adapted_embedding": "AACAPw==", "adapted_model": "velho"}) is None
+
+
+class TestPagination:
+
+    @pytest.fixture
+    def fake_redis(self):
+        fake = FakeRedis()
+        with patch("app.services.pagination.get_redis", return_value=fake):
+            yield fake
+
+    def _ranked(self, n):
+        return [{"job_id": i, "similarity_score": 1 - i / 100, "rerank_score": float(-i)}
+                for i in range(1, n + 1)]
+
+    def test_single_page_has_no_cursor(self, fake_redis):
+        from app.services import pagination
+        assert pagination.create_cursor("s1", self._ranked(3), 5) is None
+        assert fake_redis.store == {}
+
+    def test_pages_follow_stored_order(self, fake_redis):
+        from app.services import pagination
+        cursor = pagination.create_cursor("s1", self._ranked(7), 3)
+
+        meta, items, cursor = pagination.read_page(cursor)
+        assert meta["session_id"] == "s1" and meta["offset"] == 3
+        assert [i["job_id"] for i in items] == [4, 5, 6]
+        assert items[0]["rerank_score"] == -4.0 and items[0]["fusion_score"] is None
+
+        _, items, cursor = pagination.read_page(cursor)
+        assert [i["job_id"] for i in items] == [7]
+        assert cursor is None
+
+    def test_invalid_or_expired_cursor(self, fake_redis):
+        from app.services import pagination
+        with pytest.raises(ValueError):
+            pagination.read_page("%%%")
+        with pytest.raises(ValueError):
+            pagination.read_page(pagination.encode_cursor("sumiu", 10))
+
+    def test_recommend_page_hydrates_only_slice(self, db_factory, fake_redis):
+        from app.models.db_models import Job
+        from app.services import pagination, recommender
+
+        db = db_factory()
+        db.add_all([Job(id=i, title=f"Dev {i}", company="ACME", description="x" * 60)
+                    for i in range(1, 6)])
+        db.commit()
+        cursor = pagination.create_cursor("s1", self._ranked(5), 2)
+        profile = {"summary": "Python", "skills": ["Python"]}
+        with patch.object(recommender, "get_profile", return_value=profile), \
+                patch.object(recommender, "skill_gaps", return_value={}), \
+                patch.object(recommender, "count_indexed_jobs", return_value=5):
+            page = recommender.recommend_page(db, cursor)
+
+        assert [r.job.id for r in page.recommendations] == [3, 4]
+        assert [r.rank for r in page.recommendations] == [3, 4]
+        assert page.next_cursor is not None
+        assert "hydrate" in page.timings_ms
+
+
+class TestInstrumentation:
+
+    def test_stage_feeds_histogram_and_request_timings(self):
+        from prometheus_client import REGISTRY
+        from app.core import metrics
+
+        def count():
+            return REGISTRY.get_sample_value("reco_stage_seconds_count", {"stage": "teste"}) or 0
+
+        before = count()
+        timings = metrics.start_request()
+        for _ in range(2):
+            with metrics.stage("teste"):
+                pass
+        assert count() == before + 2
+        assert list(timings) == ["teste"]
+        header = metrics.server_timing({"embed": 0.0123}, 0.05)
+        assert header == "embed;dur=12.3, total;dur=50.0"
+
+    def test_cache_events_and_queue_depth(self):
+        from prometheus_client import REGISTRY
+        from app.core import metrics
+
+        fake = FakeRedis()
+        fake.llen = lambda key: 3
+        fake.xlen = lambda key: 7
+        labels = {"cache": "teste", "result": "hit"}
+        before = REGISTRY.get_sample_value("reco_cache_events_total", labels) or 0
+        metrics.record_cache("teste", "hit", 4)
+        metrics.record_cache("teste", "hit", 0)
+        assert REGISTRY.get_sample_value("reco_cache_events_total", labels) == before + 4
+
+        with patch.object(metrics, "get_redis", return_value=fake):
+            payload, _ = metrics.render_metrics()
+        assert b'reco_queue_depth{queue="feedback"} 7.0' in payload